@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RestaurantConfig(AppConfig):
@@ -8,4 +9,19 @@ class RestaurantConfig(AppConfig):
     def ready(self):
         # Import signal handlers to ensure they are registered
         # when the app is ready
+        import apps.restaurant.signals.handle_dish_changed  # noqa: F401
         import apps.restaurant.signals.handle_user_created  # noqa: F401
+        from apps.restaurant.fsm.instrumentation import transition_metrics
+        from apps.restaurant.fsm.routing import model_router
+
+        transition_metrics.configure(
+            getattr(settings, "RESTAURANT_FSM_METRICS_EXPORTERS", [])
+        )
+        router = getattr(settings, "RESTAURANT_MODEL_ROUTER", {})
+        model_router.configure(
+            router.get("CANDIDATES"),
+            max_failure_rate=router.get("MAX_FAILURE_RATE", 0.1),
+            window=router.get("WINDOW", 200),
+            min_samples=router.get("MIN_SAMPLES", 20),
+            explore_rate=router.get("EXPLORE_RATE", 0.05),
+        )
@@ -0,0 +1,73 @@
+import threading
+from collections import Counter
+from collections import defaultdict
+
+
+class AttemptCounters:
+    """Thread-safe per-state tally of how many generations a state needed."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._attempts: dict[str, Counter] = defaultdict(Counter)
+        self._exhausted: Counter = Counter()
+
+    def record(self, state: str, attempts: int, ok: bool) -> None:
+        with self._lock:
+            self._attempts[state][attempts] += 1
+            if not ok:
+                self._exhausted[state] += 1
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                state: {
+                    "attempts": dict(sorted(counter.items())),
+                    "exhausted": self._exhausted[state],
+                }
+                for state, counter in self._attempts.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._attempts.clear()
+            self._exhausted.clear()
+
+
+class PromptCacheCounters:
+    """Thread-safe per (state, model) tally of provider prompt-cache hits."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._totals: dict[tuple[str, str], Counter] = defaultdict(Counter)
+
+    def record(self, state: str, model: str, usage: dict | None) -> None:
+        if not usage:
+            return
+        details = usage.get("prompt_tokens_details") or {}
+        with self._lock:
+            totals = self._totals[(str(state), model)]
+            totals["calls"] += 1
+            totals["prompt_tokens"] += usage.get("prompt_tokens") or 0
+            totals["cached_tokens"] += details.get("cached_tokens") or 0
+
+    def snapshot(self) -> dict[tuple[str, str], dict]:
+        with self._lock:
+            return {
+                key: {
+                    **totals,
+                    "hit_rate": (
+                        totals["cached_tokens"] / totals["prompt_tokens"]
+                        if totals["prompt_tokens"]
+                        else 0.0
+                    ),
+                }
+                for key, totals in self._totals.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+attempt_counters = AttemptCounters()
+prompt_cache_counters = PromptCacheCounters()
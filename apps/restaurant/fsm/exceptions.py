@@ -0,0 +1,6 @@
+class DialogStateError(RuntimeError):
+    """Base error raised while driving a dialog session through the FSM."""
+
+
+class StateConflictError(DialogStateError):
+    """Raised when the compare-and-set on ``(id, state)`` updates no row."""
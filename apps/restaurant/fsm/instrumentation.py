@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Protocol
+from typing import TypedDict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from loguru import logger
+
+# Phases of a single FSM transition, in the order they happen
+PROMPT_BUILD = "prompt_build"
+LLM_CALL = "llm_call"
+VALIDATION = "validation"
+LOCK_WAIT = "lock_wait"
+PERSIST = "persist"
+PHASES = (PROMPT_BUILD, LLM_CALL, VALIDATION, LOCK_WAIT, PERSIST)
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    float("inf"),
+)
+
+
+class LatencySample(TypedDict):
+    phase: str
+    state: str
+    model: str
+    seconds: float
+    timestamp: float
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; callers hold the owner's lock."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS, self.counts, strict=True):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class MetricsExporter(Protocol):
+    def export(self, sample: LatencySample) -> None: ...
+
+
+class JsonLinesExporter:
+    """Append every sample as one JSON line, for ``fsm_latency_report``."""
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path or default_metrics_file())
+        self._lock = threading.Lock()
+
+    def export(self, sample: LatencySample) -> None:
+        line = json.dumps(sample)
+        with self._lock, self.path.open("a") as f:
+            f.write(line + "\n")
+
+
+class TransitionMetrics:
+    """In-process latency histograms labeled by (phase, state, model)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple[str, str, str], Histogram] = {}
+        self.exporters: list[MetricsExporter] = []
+
+    def observe(self, phase: str, state: str, model: str, seconds: float) -> None:
+        key = (phase, str(state), model or "")
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+        if not self.exporters:
+            return
+        sample = LatencySample(
+            phase=key[0],
+            state=key[1],
+            model=key[2],
+            seconds=seconds,
+            timestamp=time.time(),
+        )
+        for exporter in self.exporters:
+            try:
+                exporter.export(sample)
+            except Exception as e:
+                logger.warning(f"Metrics exporter failed with {exporter=} {e=}")
+
+    @contextmanager
+    def timer(self, phase: str, state: str, model: str = "") -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, state, model, time.perf_counter() - started)
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [
+                {"phase": phase, "state": state, "model": model, **h.summary()}
+                for (phase, state, model), h in sorted(self._histograms.items())
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def configure(self, exporter_paths: Iterable[str]) -> None:
+        self.exporters = [import_string(path)() for path in exporter_paths]
+
+
+def default_metrics_file() -> Path:
+    return Path(settings.LOG_DIR) / "fsm_latency.jsonl"
+
+
+def summarize(samples: Iterable[LatencySample]) -> list[dict]:
+    metrics = TransitionMetrics()
+    for sample in samples:
+        metrics.observe(
+            sample["phase"], sample["state"], sample["model"], sample["seconds"]
+        )
+    return metrics.snapshot()
+
+
+transition_metrics = TransitionMetrics()
@@ -1,106 +1,375 @@
+import asyncio
+from concurrent.futures import Future
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 from loguru import logger
-from transitions import Machine
 from transitions import MachineError
 
 from apps.restaurant.models.dialog_session import DialogSession
 
+from .exceptions import DialogStateError
+from .exceptions import StateConflictError
+from .instrumentation import PERSIST
+from .instrumentation import transition_metrics
+from .side_tasks import side_task_executor
+from .states import BaseState
 from .states import state_registry
 
 OrderState = DialogSession.CustomerOrderState
 
+TRANSITIONS = [
+    {
+        "trigger": "start_greeting",
+        "source": OrderState.INIT,
+        "dest": OrderState.GREETING,
+    },
+    {
+        "trigger": "receive_day_reply",
+        "source": OrderState.GREETING,
+        "dest": OrderState.DAY_REPLY,
+    },
+    {
+        "trigger": "proceed_to_ask_favorites",
+        "source": OrderState.DAY_REPLY,
+        "dest": OrderState.ASK_FAVORITES,
+    },
+    {
+        "trigger": "receive_favorites_reply",
+        "source": OrderState.ASK_FAVORITES,
+        "dest": OrderState.FAVORITES_REPLY,
+    },
+    {
+        "trigger": "proceed_to_ask_order",
+        "source": OrderState.FAVORITES_REPLY,
+        "dest": OrderState.ASK_ORDER,
+    },
+    {
+        "trigger": "receive_order_reply",
+        "source": OrderState.ASK_ORDER,
+        "dest": OrderState.ORDER_REPLY,
+    },
+    {
+        "trigger": "run_analysis",
+        "source": OrderState.ORDER_REPLY,
+        "dest": OrderState.ANALYZE,
+    },
+]
+
+
+class TransitionTable:
+    """Transition table compiled once and shared by every state machine.
+
+    Triggers are validated with a single dict lookup on ``(trigger, source)``
+    instead of building a ``transitions.Machine`` per session.
+    """
+
+    __slots__ = ("_dest", "_next", "triggers")
+
+    def __init__(self, transitions: list[dict]) -> None:
+        self._dest: dict[tuple[str, str], OrderState] = {
+            (t["trigger"], t["source"]): t["dest"] for t in transitions
+        }
+        self._next: dict[str, str] = {}
+        for t in transitions:
+            self._next.setdefault(t["source"], t["trigger"])
+        self.triggers: frozenset[str] = frozenset(t["trigger"] for t in transitions)
+
+    def next_trigger(self, source: str) -> str | None:
+        return self._next.get(source)
+
+    def may_trigger(self, trigger_name: str, source: str) -> bool:
+        return (trigger_name, source) in self._dest
+
+    def dest(self, trigger_name: str, source: str) -> OrderState:
+        try:
+            return self._dest[(trigger_name, source)]
+        except KeyError:
+            raise MachineError(
+                f'"Can\'t trigger event {trigger_name} from state {source}!"'
+            ) from None
+
+
+TRANSITION_TABLE = TransitionTable(TRANSITIONS)
+
 
 class DialogStateMachine:
+    """Drives a ``DialogSession`` through the ordering dialog.
+
+    By default each transition generates and persists inside one transaction.
+    With ``two_phase=True`` generation runs outside any transaction and the
+    result is committed with a short compare-and-set on ``(id, state)``, so no
+    connection or row lock is held across the LLM call.
+    """
+
+    __slots__ = (
+        "session",
+        "previous_state",
+        "state",
+        "two_phase",
+        "side_tasks_enabled",
+        "side_results",
+    )
+
     states = list(OrderState)
+    table = TRANSITION_TABLE
 
-    def __init__(self, session: DialogSession) -> None:
+    def __init__(self, session: DialogSession, *, two_phase: bool = False) -> None:
         self.session = session
         self.previous_state = None
         self.state = session.state
-        self.state_index = self.states.index(self.state)
-
-        transitions = [
-            {
-                "trigger": "start_greeting",
-                "source": OrderState.INIT,
-                "dest": OrderState.GREETING,
-            },
-            {
-                "trigger": "receive_day_reply",
-                "source": OrderState.GREETING,
-                "dest": OrderState.DAY_REPLY,
-            },
-            {
-                "trigger": "proceed_to_ask_favorites",
-                "source": OrderState.DAY_REPLY,
-                "dest": OrderState.ASK_FAVORITES,
-            },
-            {
-                "trigger": "receive_favorites_reply",
-                "source": OrderState.ASK_FAVORITES,
-                "dest": OrderState.FAVORITES_REPLY,
-            },
-            {
-                "trigger": "proceed_to_ask_order",
-                "source": OrderState.FAVORITES_REPLY,
-                "dest": OrderState.ASK_ORDER,
-            },
-            {
-                "trigger": "receive_order_reply",
-                "source": OrderState.ASK_ORDER,
-                "dest": OrderState.ORDER_REPLY,
-            },
-            {
-                "trigger": "run_analysis",
-                "source": OrderState.ORDER_REPLY,
-                "dest": OrderState.ANALYZE,
-            },
-        ]
-
-        self.machine = Machine(
-            model=self,
-            states=self.states,
-            transitions=transitions,
-            initial=self.state,
-            ignore_invalid_triggers=False,
-            before_state_change=self.on_enter_states,
-            after_state_change=self.after_states_changed,
-        )
+        self.two_phase = two_phase
+        self.side_tasks_enabled = getattr(settings, "RESTAURANT_FSM_SIDE_TASKS", False)
+        self.side_results: dict[str, tuple[Any, float | None]] = {}
+
+    @property
+    def state_index(self) -> int:
+        return self.states.index(self.state)
+
+    def trigger(self, trigger_name: str) -> bool:
+        dest = self.table.dest(trigger_name, self.state)
+        self.on_enter_states()
+        self.state = dest
+        try:
+            self.after_states_changed()
+        except Exception:
+            self.state = self.previous_state
+            raise
+        return True
+
+    async def atrigger(self, trigger_name: str) -> bool:
+        dest = self.table.dest(trigger_name, self.state)
+        self.on_enter_states()
+        self.state = dest
+        try:
+            await self.aafter_states_changed()
+        except Exception:
+            self.state = self.previous_state
+            raise
+        return True
+
+    def may_trigger(self, trigger_name: str) -> bool:
+        return self.table.may_trigger(trigger_name, self.state)
 
     def on_enter_states(self):
         self.previous_state = self.state
 
     def after_states_changed(self):
+        # Waiting on side tasks inside the transaction would hold its
+        # connection for as long as they take
+        partials = self.collect_partials(state_registry[self.state])
+        if self.two_phase:
+            state = self.load_state()
+            self.generate(state, partials)
+            self.commit(state)
+        else:
+            with transaction.atomic():
+                state = self.load_state()
+                self.generate(state, partials)
+                self.persist(state, lock=True)
+        state.apply_update()
+        self.start_side_tasks(state)
+
+    async def aafter_states_changed(self):
         state_class = state_registry[self.state]
+        session = await DialogSession.objects.filter(id=self.session.id).afirst()
+        if not session:
+            raise DialogStateError("Session not found")
+        state = state_class(session)
+        state.partials.update(await self.acollect_partials(state_class))
+        output, ok = await state.agenerate_validated()
+        self.check_output(output, ok)
+        # Django has no async transactions; only the short write hops threads
+        await sync_to_async(self.commit)(state)
+        state.apply_update()
+        self.astart_side_tasks(state)
+
+    def generate(self, state: BaseState, partials: dict[str, Any]) -> None:
+        state.partials.update(partials)
+        output, ok = state.generate_validated()
+        self.check_output(output, ok)
+
+    def start_side_tasks(self, state: BaseState) -> None:
+        if not self.side_tasks_enabled:
+            return
+        for task_class in state.side_tasks:
+            future = side_task_executor().submit(task_class(state.session).run)
+            self.side_results[task_class.name] = (future, task_class.timeout)
+
+    def astart_side_tasks(self, state: BaseState) -> None:
+        if not self.side_tasks_enabled:
+            return
+        for task_class in state.side_tasks:
+            task = asyncio.create_task(task_class(state.session).arun())
+            self.side_results[task_class.name] = (task, task_class.timeout)
+
+    def collect_partials(self, state_class: type[BaseState]) -> dict[str, Any]:
+        """Results of this machine's side tasks that ``state_class`` consumes."""
+        partials = {}
+        for name in state_class.consumes:
+            pending, timeout = self.side_results.pop(name, (None, None))
+            if not isinstance(pending, Future):
+                continue
+            try:
+                partials[name] = pending.result(timeout=timeout)
+            except Exception as e:
+                logger.warning(f"Side task {name} unavailable for {self.state=} {e=}")
+        return partials
+
+    async def acollect_partials(self, state_class: type[BaseState]) -> dict[str, Any]:
+        partials = {}
+        for name in state_class.consumes:
+            pending, timeout = self.side_results.pop(name, (None, None))
+            if pending is None:
+                continue
+            if isinstance(pending, Future):
+                pending = asyncio.wrap_future(pending)
+            try:
+                partials[name] = await asyncio.wait_for(pending, timeout)
+            except Exception as e:
+                logger.warning(f"Side task {name} unavailable for {self.state=} {e=}")
+        return partials
+
+    def load_state(self) -> BaseState:
+        session = DialogSession.objects.filter(id=self.session.id).first()
+        if not session:
+            raise DialogStateError("Session not found")
+        return state_registry[self.state](session)
+
+    def commit(self, state: BaseState) -> None:
         with transaction.atomic():
-            session = DialogSession.objects.filter(id=self.session.id).first()
-            if not session:
-                raise RuntimeError("Session not found")
-            state = state_class(session)
-            output, ok = state.generate()
-            if not ok:
-                logger.error(
-                    f"Failed to generate text with "
-                    f"{self.state=} {self.session.id=} {output=}"
+            self.persist(state, lock=not self.two_phase)
+
+    def persist(self, state: BaseState, *, lock: bool) -> None:
+        if not state.persist_state(self.previous_state, lock=lock):
+            logger.warning(
+                f"State conflict on commit with "
+                f"{self.state=} {self.previous_state=} {self.session.id=}"
+            )
+            raise StateConflictError(
+                f"Session {self.session.id} is no longer in {self.previous_state}"
+            )
+
+    @classmethod
+    def run_to_completion(
+        cls,
+        session: DialogSession,
+        *,
+        checkpoint: int | None = 1,
+        **kwargs,
+    ) -> "DialogStateMachine":
+        """Drive ``session`` from its current state to the terminal state.
+
+        The session is read once and kept in memory across states. Writes are
+        batched: ``checkpoint=1`` persists after every state, ``checkpoint=N``
+        after every N states and ``checkpoint=None`` only once at the end.
+        The final row matches what the step-by-step triggers produce.
+        """
+        machine = cls(session, **kwargs)
+        machine.run(checkpoint=checkpoint)
+        return machine
+
+    def run(self, *, checkpoint: int | None = 1) -> None:
+        if checkpoint is not None and checkpoint < 1:
+            raise ValueError("checkpoint must be a positive integer or None")
+        session = DialogSession.objects.filter(id=self.session.id).first()
+        if not session:
+            raise DialogStateError("Session not found")
+        self.state = session.state
+        persisted_state = reached_state = self.state
+        pending: list[BaseState] = []
+        try:
+            while (trigger_name := self.table.next_trigger(self.state)) is not None:
+                self.on_enter_states()
+                self.state = self.table.dest(trigger_name, self.state)
+                state_class = state_registry[self.state]
+                state = state_class(session)
+                self.generate(state, self.collect_partials(state_class))
+                state.apply_update()
+                self.start_side_tasks(state)
+                pending.append(state)
+                reached_state = self.state
+                if checkpoint is not None and len(pending) >= checkpoint:
+                    self.flush(session, persisted_state, pending)
+                    persisted_state, pending = self.state, []
+        except Exception:
+            # Keep the work done so far, as the step-by-step path would have
+            self.state = reached_state
+            self.flush(session, persisted_state, pending)
+            raise
+        self.flush(session, persisted_state, pending)
+        self.session = session
+
+    def flush(
+        self,
+        session: DialogSession,
+        persisted_state: str,
+        states: list[BaseState],
+    ) -> None:
+        if not states:
+            return
+        fields = {
+            field: getattr(session, field)
+            for state in states
+            for field in state.get_update_fields()
+        }
+        with (
+            transaction.atomic(),
+            transition_metrics.timer(PERSIST, self.state, states[-1].model or ""),
+        ):
+            updated = DialogSession.objects.filter(
+                id=session.id, state=persisted_state
+            ).update(**fields, resume_attempts=0, updated_at=timezone.now())
+            if not updated:
+                raise StateConflictError(
+                    f"Session {session.id} is no longer in {persisted_state}"
                 )
-                raise RuntimeError("Failed to generate text")
-            state.persist_state(self.previous_state)
+            for state in states:
+                state.after_persist()
+
+    def check_output(self, output, ok: bool) -> None:
+        if not ok:
+            logger.error(
+                f"Failed to generate text with "
+                f"{self.state=} {self.session.id=} {output=}"
+            )
+            raise DialogStateError("Failed to generate text")
 
     @property
     def current_state(self) -> str:
         return self.state
 
     @staticmethod
-    def from_session(session: DialogSession) -> "DialogStateMachine":
-        return DialogStateMachine(session=session)
+    def from_session(session: DialogSession, **kwargs) -> "DialogStateMachine":
+        return DialogStateMachine(session=session, **kwargs)
 
     def safe_trigger(self, trigger_name: str) -> bool:
+        if trigger_name not in self.table.triggers:
+            return False
         try:
-            trigger = getattr(self, trigger_name)
-        except AttributeError:
+            return self.trigger(trigger_name)
+        except MachineError:
+            return False
+
+    async def asafe_trigger(self, trigger_name: str) -> bool:
+        if trigger_name not in self.table.triggers:
             return False
         try:
-            trigger()
-            return True
+            return await self.atrigger(trigger_name)
         except MachineError:
             return False
+
+
+def _trigger_method(trigger_name: str):
+    def trigger(self: DialogStateMachine) -> bool:
+        return self.trigger(trigger_name)
+
+    trigger.__name__ = trigger_name
+    return trigger
+
+
+for _trigger_name in TRANSITION_TABLE.triggers:
+    setattr(DialogStateMachine, _trigger_name, _trigger_method(_trigger_name))
@@ -0,0 +1,73 @@
+import re
+import textwrap
+from functools import lru_cache
+from string import Formatter
+
+_TRAILING_SPACE = re.compile(r"[ \t]+$", re.MULTILINE)
+_BLANK_LINES = re.compile(r"\n{3,}")
+# Prompts are markdown with one "# Heading" per section
+_SECTION_BREAK = re.compile(r"\n\n(?=# )")
+
+
+@lru_cache(maxsize=256)
+def normalize_prompt(text: str) -> str:
+    """Drop the source-code indentation, trailing spaces and extra blank lines."""
+    text = textwrap.dedent(text.lstrip("\n"))
+    text = _TRAILING_SPACE.sub("", text)
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+class PromptTemplate:
+    """A ``str.format`` style prompt compiled once per state class.
+
+    The static text is normalized at compile time and split into literal
+    chunks and field names, so rendering is a single join. Substituted values
+    are normalized too (memoized, as personas and menus repeat), which lets a
+    multi-line value sit on its own line of the template.
+    """
+
+    __slots__ = ("source", "text", "fields", "_parts")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.text = normalize_prompt(source)
+        self._parts: list[tuple[str, str | None]] = []
+        for literal, field, spec, conversion in Formatter().parse(self.text):
+            if spec or conversion:
+                raise ValueError(f"Unsupported prompt field {{{field}}}")
+            self._parts.append((literal, field))
+        self.fields = frozenset(field for _, field in self._parts if field)
+
+    def prefix_first(self, shared_fields: frozenset[str]) -> "PromptTemplate":
+        """The same sections reordered for provider prefix caching.
+
+        Sections filled only from ``shared_fields`` (values that are identical
+        across sessions) come first, then fully static sections, then the
+        sections holding per-call values. The relative order within each
+        group is kept.
+        """
+
+        def rank(section: str) -> int:
+            fields = {field for _, field, _, _ in Formatter().parse(section) if field}
+            if not fields:
+                return 1
+            return 0 if fields <= shared_fields else 2
+
+        sections = _SECTION_BREAK.split(self.text)
+        return PromptTemplate("\n\n".join(sorted(sections, key=rank)))
+
+    def render(self, **values: str) -> str:
+        missing = self.fields - values.keys()
+        if missing:
+            raise KeyError(f"Missing prompt values: {sorted(missing)}")
+        chunks = []
+        for literal, field in self._parts:
+            chunks.append(literal)
+            if field:
+                chunks.append(normalize_prompt(str(values[field])))
+        # An empty value at either end would leave a dangling newline
+        return "".join(chunks).strip()
+
+    def render_source(self, **values: str) -> str:
+        """Render the original, un-normalized text (for token comparisons)."""
+        return self.source.format(**values)
@@ -0,0 +1,148 @@
+import math
+import random
+import threading
+from collections import deque
+
+# Candidate list key used for states without a list of their own
+ANY_STATE = "*"
+
+
+class RollingStats:
+    """Latency and validation outcome of the latest ``window`` calls; callers
+    hold the owner's lock.
+    """
+
+    __slots__ = ("samples",)
+
+    def __init__(self, window: int) -> None:
+        self.samples: deque[tuple[float, bool]] = deque(maxlen=window)
+
+    def add(self, seconds: float, ok: bool) -> None:
+        self.samples.append((seconds, ok))
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        latencies = sorted(seconds for seconds, _ in self.samples)
+        return latencies[max(0, math.ceil(q * len(latencies)) - 1)]
+
+    def failure_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(not ok for _, ok in self.samples) / len(self.samples)
+
+    def summary(self) -> dict:
+        return {
+            "count": len(self.samples),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "failure_rate": self.failure_rate(),
+        }
+
+
+class ModelRouter:
+    """Picks the model of each state's LLM calls from configured candidates.
+
+    Candidates are listed per state value, most preferred first, with
+    ``ANY_STATE`` covering the other states; a state without candidates uses
+    its role's model. Every call's latency and validation outcome feed a
+    rolling window per (state, model). Models are tried in order until one
+    has ``min_samples`` calls; from then on traffic goes to the model with
+    the lowest p50 (then p95) latency among those whose failure rate meets
+    ``max_failure_rate``, or to the least failing model when none does.
+    ``explore_rate`` of the calls go to another candidate, so the windows of
+    the models not chosen stay current.
+    """
+
+    def __init__(
+        self,
+        candidates: dict[str, list[str]] | None = None,
+        *,
+        max_failure_rate: float = 0.1,
+        window: int = 200,
+        min_samples: int = 20,
+        explore_rate: float = 0.05,
+        rng: random.Random | None = None,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._rng = rng or random.Random()
+        self.configure(
+            candidates,
+            max_failure_rate=max_failure_rate,
+            window=window,
+            min_samples=min_samples,
+            explore_rate=explore_rate,
+        )
+
+    def configure(
+        self,
+        candidates: dict[str, list[str]] | None,
+        *,
+        max_failure_rate: float = 0.1,
+        window: int = 200,
+        min_samples: int = 20,
+        explore_rate: float = 0.05,
+    ) -> None:
+        with self._lock:
+            self._candidates = {
+                str(state): list(models) for state, models in (candidates or {}).items()
+            }
+            self.max_failure_rate = max_failure_rate
+            self.window = window
+            self.min_samples = min(min_samples, window)
+            self.explore_rate = explore_rate
+            self._stats: dict[tuple[str, str], RollingStats] = {}
+
+    def candidates(self, state: str) -> list[str]:
+        candidates = self._candidates
+        return candidates.get(str(state), candidates.get(ANY_STATE, []))
+
+    def choose(self, state: str) -> str | None:
+        candidates = self.candidates(state)
+        if len(candidates) < 2:
+            return candidates[0] if candidates else None
+        with self._lock:
+            stats = {model: self._summary(state, model) for model in candidates}
+        warming = [m for m in candidates if stats[m]["count"] < self.min_samples]
+        meeting = [
+            m
+            for m in candidates
+            if m not in warming and stats[m]["failure_rate"] <= self.max_failure_rate
+        ]
+        if not meeting and warming:
+            return warming[0]
+        if meeting:
+            best = min(meeting, key=lambda m: (stats[m]["p50"], stats[m]["p95"]))
+        else:
+            best = min(candidates, key=lambda m: stats[m]["failure_rate"])
+        if self._rng.random() < self.explore_rate:
+            others = [m for m in warming or candidates if m != best]
+            if others:
+                return self._rng.choice(others)
+        return best
+
+    def observe(self, state: str, model: str, seconds: float, ok: bool) -> None:
+        key = (str(state), model)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = RollingStats(self.window)
+            stats.add(seconds, ok)
+
+    def _summary(self, state: str, model: str) -> dict:
+        stats = self._stats.get((str(state), model))
+        return stats.summary() if stats else RollingStats(1).summary()
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            return [
+                {"state": state, "model": model, **stats.summary()}
+                for (state, model), stats in sorted(self._stats.items())
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+model_router = ModelRouter()
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+
+from loguru import logger
+
+from apps.restaurant.models.dialog_session import DialogSession
+
+from .machine import DialogStateMachine
+
+
+@dataclass
+class SchedulerStats:
+    completed: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    transitions: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def dialogs_per_minute(self) -> float:
+        if not self.elapsed:
+            return 0.0
+        return self.completed * 60 / self.elapsed
+
+
+class DialogScheduler:
+    """Pipelines many dialog sessions through the FSM concurrently.
+
+    Sessions are grouped into one work queue per current ``OrderState``. Each
+    queue is drained by ``state_concurrency`` workers, every transition also
+    holds a slot of the global ``concurrency`` limit, and a session that
+    finishes a transition is fed straight into the next state's queue. Sessions
+    at different stages therefore overlap instead of running one state after
+    another.
+    """
+
+    def __init__(
+        self,
+        *,
+        concurrency: int = 16,
+        state_concurrency: int | dict[str, int] | None = None,
+        two_phase: bool = True,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+        self.state_concurrency = state_concurrency
+        self.two_phase = two_phase
+        self.sources = [
+            state
+            for state in DialogStateMachine.states
+            if DialogStateMachine.table.next_trigger(state) is not None
+        ]
+
+    def limit_for(self, state: str) -> int:
+        if isinstance(self.state_concurrency, dict):
+            return self.state_concurrency.get(state, self.concurrency)
+        return self.state_concurrency or self.concurrency
+
+    async def run(self, sessions: Iterable[DialogSession]) -> SchedulerStats:
+        stats = SchedulerStats()
+        queues: dict[str, asyncio.Queue[DialogStateMachine]] = {
+            state: asyncio.Queue() for state in self.sources
+        }
+        slots = asyncio.Semaphore(self.concurrency)
+        outstanding = 0
+        drained = asyncio.Event()
+
+        def finish(ok: bool) -> None:
+            nonlocal outstanding
+            if ok:
+                stats.completed += 1
+            else:
+                stats.failed += 1
+            outstanding -= 1
+            if outstanding == 0:
+                drained.set()
+
+        def enqueue(machine: DialogStateMachine) -> None:
+            queue = queues.get(machine.current_state)
+            if queue is None:
+                finish(ok=True)
+            else:
+                queue.put_nowait(machine)
+
+        async def worker(state: str) -> None:
+            queue = queues[state]
+            while True:
+                machine = await queue.get()
+                trigger_name = machine.table.next_trigger(state)
+                try:
+                    async with slots:
+                        ok = await machine.asafe_trigger(trigger_name)
+                except Exception as e:
+                    logger.error(
+                        f"Dialog transition failed with "
+                        f"{trigger_name=} {machine.session.id=} {e=}"
+                    )
+                    ok = False
+                finally:
+                    queue.task_done()
+                if not ok:
+                    finish(ok=False)
+                    continue
+                stats.transitions[state] = stats.transitions.get(state, 0) + 1
+                enqueue(machine)
+
+        started = time.perf_counter()
+        machines = [
+            DialogStateMachine(session, two_phase=self.two_phase)
+            for session in sessions
+        ]
+        outstanding = len(machines)
+        if outstanding == 0:
+            return stats
+        for machine in machines:
+            enqueue(machine)
+
+        workers = [
+            asyncio.create_task(worker(state))
+            for state in self.sources
+            for _ in range(self.limit_for(state))
+        ]
+        try:
+            await drained.wait()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            stats.elapsed = time.perf_counter() - started
+        return stats
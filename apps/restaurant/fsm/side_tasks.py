@@ -0,0 +1,105 @@
+# ruff: noqa: E501
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from rest_framework import serializers
+
+from apps.restaurant.models.dialog_session import DialogSession
+from apps.restaurant.roles.analyze import AnalyzeDialogRole
+from apps.restaurant.roles.base import RestaurantRole
+
+from .prompts import normalize_prompt
+
+
+class SideTask:
+    """Background work attached to a state.
+
+    Once the owning state is persisted the machine starts the task, and the
+    first later state listing ``name`` in its ``consumes`` receives the result
+    in ``state.partials``. A failed or missing result simply leaves the
+    consumer to do the full work itself.
+    """
+
+    name: str
+    # Seconds a consumer waits for the result before giving up on it
+    timeout: float | None = 60.0
+
+    def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
+        self.session = session
+        self.role = role
+
+    def run(self) -> Any:
+        raise NotImplementedError
+
+    async def arun(self) -> Any:
+        raise NotImplementedError
+
+
+class FavoriteDishesSerializer(serializers.Serializer):
+    favorite_dishes = serializers.ListField(
+        child=serializers.CharField(), allow_empty=True
+    )
+
+
+class FavoritesExtractionTask(SideTask):
+    """Extract ``favorite_dishes`` from the customer's favorites reply."""
+
+    name = "favorite_dishes"
+    prompt = normalize_prompt(
+        """
+        Find all phrases in the customer's text that refer to specific foods or dishes (e.g., "Thai green curry", "eggplant parmesan", "sushi").
+        Do not abbreviate them, e.g., write "Thai green curry" not "curry".
+        Respond with a minified JSON object: {"favorite_dishes": [...]}.
+        """
+    )
+
+    def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
+        super().__init__(session, role or AnalyzeDialogRole())
+
+    def build_chat_messages(self) -> list:
+        return self.role.build_messages(
+            self.prompt,
+            extra_messages=[
+                self.role.developer(
+                    f"Customer's Favorite: {self.session.customer_favorite_text}"
+                )
+            ],
+        )
+
+    def parse(self, text: str) -> list[str]:
+        serializer = FavoriteDishesSerializer(data=json.loads(text))
+        serializer.is_valid(raise_exception=True)
+        return list(serializer.validated_data["favorite_dishes"])
+
+    def run(self) -> list[str]:
+        text = self.role.chat(
+            messages=self.build_chat_messages(),
+            temperature=0,
+            response_format="json",
+        )
+        return self.parse(text)
+
+    async def arun(self) -> list[str]:
+        text = await self.role.achat(
+            messages=self.build_chat_messages(),
+            temperature=0,
+            response_format="json",
+        )
+        return self.parse(text)
+
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def side_task_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=8, thread_name_prefix="fsm-side-task"
+                )
+    return _executor
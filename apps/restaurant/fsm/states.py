@@ -1,34 +1,89 @@
 # ruff: noqa: E501
+import hashlib
 import json
 import random
+import time
 from typing import Any
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
 from apps.restaurant.constants import OrderState
 from apps.restaurant.roles.analyze import AnalyzeDialogRole
 from apps.restaurant.roles.base import DialogMessage
+from apps.restaurant.roles.base import GenerationAborted
 from apps.restaurant.roles.base import RestaurantRole
 from apps.restaurant.roles.customer import CustomerRole
 from apps.restaurant.roles.waiter import WaiterRole
 from apps.restaurant.serializers.output_validate import AnalyzeResultSerializer
+from apps.restaurant.serializers.output_validate import StreamGuard
 from apps.restaurant.serializers.output_validate import StringOutputSerializer
+from apps.restaurant.services.dietary import preclassify
+from apps.restaurant.services.greeting_pool import get_greeting_pool
+from apps.restaurant.services.menu import MenuSnapshot
+from apps.restaurant.services.menu import menu_cache
+from apps.restaurant.services.menu import menu_index
+from libs.clients.llm_client.interface import ChatMessage
 
-from ..models import Dish
 from ..models.dialog_session import DialogSession
+from .counters import attempt_counters
+from .counters import prompt_cache_counters
+from .instrumentation import LLM_CALL
+from .instrumentation import LOCK_WAIT
+from .instrumentation import PERSIST
+from .instrumentation import PROMPT_BUILD
+from .instrumentation import VALIDATION
+from .instrumentation import transition_metrics
+from .prompts import PromptTemplate
+from .routing import model_router
+from .side_tasks import FavoritesExtractionTask
+from .side_tasks import SideTask
 
 state_registry: dict[OrderState, type["BaseState"]] = {}
+# Prompt values that are the same for every session of a role
+SHARED_PROMPT_FIELDS = frozenset({"persona", "menu"})
+# Model label of analyses settled by the local dietary pre-classifier
+PRECLASSIFIER_MODEL = "preclassifier"
+# Model label of greetings served from the greeting pool
+POOLED_MODEL = "greeting-pool"
 
 
 class BaseState:
     state: OrderState
+    # Regeneration when the output fails validation: at most ``max_attempts``
+    # calls within ``attempt_budget`` seconds, raising the temperature by
+    # ``temperature_step`` on every retry when set.
+    max_attempts: int = 3
+    attempt_budget: float | None = 60.0
+    temperature_step: float | None = None
+    max_temperature: float = 2.0
+    # Background work started once this state is persisted, and the side task
+    # results (by ``SideTask.name``) this state merges instead of recomputing.
+    side_tasks: tuple[type[SideTask], ...] = ()
+    consumes: tuple[str, ...] = ()
+    # ``str.format`` style system prompt, compiled into ``compiled_prompt``
+    # once per class and rendered with ``prompt_context()``. ``prefix_prompt``
+    # is the "prefix" layout of the same prompt, see ``active_prompt``.
+    prompt_template: str = ""
+    compiled_prompt: PromptTemplate = PromptTemplate("")
+    prefix_prompt: PromptTemplate = PromptTemplate("")
 
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
+        if "prompt_template" in cls.__dict__:
+            cls.compiled_prompt = PromptTemplate(cls.prompt_template)
+            cls.prefix_prompt = cls.compiled_prompt.prefix_first(SHARED_PROMPT_FIELDS)
         state_registry[cls.state] = cls
 
     def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
         self.role = role
         self.session = session
         self.output: Any | None = None
+        # Model that produced ``output``, the label of the persist timings
+        self.model: str | None = None
+        self.attempts = 0
+        self.partials: dict[str, Any] = {}
 
     def validate_output(self, text: str, silent: bool = True) -> tuple[Any, bool]:
         serializer_class = self.get_serializer_class()
@@ -49,57 +104,319 @@ class BaseState:
             "forbid_wrapped_quotes": True,
         }
 
+    def prompt_context(self) -> dict[str, str]:
+        return {"persona": self.role.persona_messages}
+
+    def active_prompt(self) -> PromptTemplate:
+        """Prompt layout selected by ``RESTAURANT_PROMPT_LAYOUT``.
+
+        "inline" keeps each state's authored section order. "prefix" moves the
+        persona and menu sections to the front so that every session of a role
+        starts with the same bytes, which providers with automatic prefix
+        caching can reuse.
+        """
+        if settings.RESTAURANT_PROMPT_LAYOUT == "prefix":
+            return self.prefix_prompt
+        return self.compiled_prompt
+
     def system_prompt(self) -> str:
-        return ""
+        return self.active_prompt().render(**self.prompt_context())
+
+    async def asystem_prompt(self) -> str:
+        return self.system_prompt()
+
+    def build_chat_messages(self, system_prompt: str) -> list[ChatMessage]:
+        dialog_context: list[DialogMessage] | None = self.session.messages or []
+        return self.role.build_messages(
+            system_prompt,
+            extra_messages=[self.role.developer("Start your chat.")],
+            dialog_context=dialog_context,
+        )
+
+    def get_chat_options(self) -> dict:
+        return {}
 
     def generate(
         self,
         *,
         temperature: float | None = None,
         model: str | None = None,
-    ) -> tuple[str, bool]:
-        dialog_context: list[DialogMessage] | None = self.session.messages or []
-        messages = self.role.build_messages(
-            self.system_prompt(),
-            extra_messages=[self.role.developer("Start your chat.")],
-            dialog_context=dialog_context,
-        )
-        text = self.role.chat(
-            messages=messages,
-            temperature=temperature,
-            model=model,
-        )
-        validated_text, ok = self.validate_output(text)
-        self.output = validated_text
-        return validated_text, ok
+    ) -> tuple[Any, bool]:
+        model = model or self.route_model()
+        with transition_metrics.timer(PROMPT_BUILD, self.state, model):
+            messages = self.build_chat_messages(self.system_prompt())
+        started = time.perf_counter()
+        try:
+            with transition_metrics.timer(LLM_CALL, self.state, model):
+                text = self.role.chat(
+                    messages=messages,
+                    temperature=temperature,
+                    model=model,
+                    stream_guard=self.stream_guard(),
+                    **self.get_chat_options(),
+                )
+        except GenerationAborted as e:
+            self.observe_model(model, started, ok=False)
+            return self.abort_output(e, model)
+        except Exception:
+            self.observe_model(model, started, ok=False)
+            raise
+        elapsed = time.perf_counter() - started
+        self.record_usage(model)
+        output, ok = self.accept_output(text, model)
+        self.observe_model(model, started, ok, elapsed=elapsed)
+        return output, ok
+
+    async def agenerate(
+        self,
+        *,
+        temperature: float | None = None,
+        model: str | None = None,
+    ) -> tuple[Any, bool]:
+        model = model or self.route_model()
+        with transition_metrics.timer(PROMPT_BUILD, self.state, model):
+            messages = self.build_chat_messages(await self.asystem_prompt())
+        started = time.perf_counter()
+        try:
+            with transition_metrics.timer(LLM_CALL, self.state, model):
+                text = await self.role.achat(
+                    messages=messages,
+                    temperature=temperature,
+                    model=model,
+                    stream_guard=self.stream_guard(),
+                    **self.get_chat_options(),
+                )
+        except GenerationAborted as e:
+            self.observe_model(model, started, ok=False)
+            return self.abort_output(e, model)
+        except Exception:
+            self.observe_model(model, started, ok=False)
+            raise
+        elapsed = time.perf_counter() - started
+        self.record_usage(model)
+        output, ok = await self.aaccept_output(text, model)
+        self.observe_model(model, started, ok, elapsed=elapsed)
+        return output, ok
+
+    def route_model(self) -> str:
+        """Model picked by ``model_router``, or the role's when it has no
+        candidates for this state.
+        """
+        return model_router.choose(self.state) or self.role.default_model
+
+    def observe_model(
+        self, model: str, started: float, ok: bool, elapsed: float | None = None
+    ) -> None:
+        if not model_router.candidates(self.state):
+            return
+        if elapsed is None:
+            elapsed = time.perf_counter() - started
+        model_router.observe(self.state, model, elapsed, ok)
+
+    def stream_guard(self) -> StreamGuard | None:
+        """Early-abort checks for a streamed reply, see ``RESTAURANT_LLM_STREAMING``."""
+        if not settings.RESTAURANT_LLM_STREAMING:
+            return None
+        return StreamGuard.from_context(self.get_serializer_context())
+
+    def abort_output(self, aborted: GenerationAborted, model: str) -> tuple[Any, bool]:
+        # A cancelled reply counts as an attempt that failed validation
+        self.record_usage(model)
+        self.output = aborted.text
+        self.model = model
+        return aborted.text, False
+
+    def record_usage(self, model: str) -> None:
+        result = self.role.last_result
+        # Replayed results were counted with the call that produced them
+        if result is not None and not result.get("cached"):
+            prompt_cache_counters.record(self.state, model, result.get("usage"))
+
+    def accept_output(self, text: str, model: str) -> tuple[Any, bool]:
+        validated, ok = self.store_output(text, model)
+        if ok:
+            self.role.confirm_result()
+        return validated, ok
 
-    def persist_state(self, previous_state: OrderState) -> None:
+    async def aaccept_output(self, text: str, model: str) -> tuple[Any, bool]:
+        validated, ok = self.store_output(text, model)
+        if ok:
+            await self.role.aconfirm_result()
+        return validated, ok
+
+    def store_output(self, text: str, model: str) -> tuple[Any, bool]:
+        with transition_metrics.timer(VALIDATION, self.state, model):
+            validated, ok = self.validate_output(text)
+        self.output = validated
+        self.model = model
+        return validated, ok
+
+    def attempt_temperature(
+        self, temperature: float | None, attempt: int
+    ) -> float | None:
+        if not attempt or not self.temperature_step:
+            return temperature
+        if temperature is None:
+            # Provider default when neither the caller nor the role set one
+            temperature = self.role.default_temperature
+            temperature = 1.0 if temperature is None else temperature
+        return min(temperature + self.temperature_step * attempt, self.max_temperature)
+
+    def attempts_left(self, started: float) -> bool:
+        if self.attempts >= self.max_attempts:
+            return False
+        if self.attempts and self.attempt_budget is not None:
+            return time.monotonic() - started < self.attempt_budget
+        return True
+
+    def generate_validated(
+        self,
+        *,
+        temperature: float | None = None,
+        model: str | None = None,
+    ) -> tuple[Any, bool]:
+        """Generate until the output validates or the retry bounds run out."""
+        started = time.monotonic()
+        output, ok = None, False
+        self.attempts = 0
+        while not ok and self.attempts_left(started):
+            options = {"model": model}
+            attempt_temperature = self.attempt_temperature(temperature, self.attempts)
+            if attempt_temperature is not None:
+                options["temperature"] = attempt_temperature
+            self.attempts += 1
+            output, ok = self.generate(**options)
+        attempt_counters.record(self.state, self.attempts, ok)
+        return output, ok
+
+    async def agenerate_validated(
+        self,
+        *,
+        temperature: float | None = None,
+        model: str | None = None,
+    ) -> tuple[Any, bool]:
+        started = time.monotonic()
+        output, ok = None, False
+        self.attempts = 0
+        while not ok and self.attempts_left(started):
+            options = {"model": model}
+            attempt_temperature = self.attempt_temperature(temperature, self.attempts)
+            if attempt_temperature is not None:
+                options["temperature"] = attempt_temperature
+            self.attempts += 1
+            output, ok = await self.agenerate(**options)
+        attempt_counters.record(self.state, self.attempts, ok)
+        return output, ok
+
+    def get_update_fields(self) -> dict:
+        return {"state": self.state}
+
+    def apply_update(self) -> dict:
+        """Apply this state's writes to the in-memory session and return them."""
+        fields = self.get_update_fields()
+        for field, value in fields.items():
+            setattr(self.session, field, value)
+        return fields
+
+    def persist_state(self, previous_state: OrderState, *, lock: bool = True) -> int:
+        """Write this state's fields if the row is still in ``previous_state``.
+
+        The ``(id, state)`` filter makes the update a compare-and-set; the
+        returned row count is 0 when another writer moved the session first.
+        """
+        queryset = DialogSession.objects.filter(
+            id=self.session.id, state=previous_state
+        )
+        model = self.model or ""
+        if lock:
+            # Take the row lock on its own so its wait is measured apart
+            with transition_metrics.timer(LOCK_WAIT, self.state, model):
+                list(queryset.select_for_update().values_list("id", flat=True))
+        with transition_metrics.timer(PERSIST, self.state, model):
+            updated = queryset.update(
+                **self.get_update_fields(),
+                resume_attempts=0,
+                updated_at=timezone.now(),
+            )
+        if updated:
+            self.after_persist()
+        return updated
+
+    def after_persist(self) -> None:
         pass
 
 
 class GreetingState(BaseState):
     state: str = OrderState.GREETING
-
-    def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
+    prompt_template = """
+    # Role
+    {persona}
+
+    # Task
+    **Greeting new customers**:
+    1. Start with a unique welcome phrase.
+    2. After welcoming, ask the customer how their day has been.
+    3. 3-4 sentences total, with natural flow between welcome and question.
+
+    # Strict Rules
+    1. Use only English.
+    2. Include ONLY conversation content (no extra explanations, labels, or metadata).
+    3. Format as a single line with no line breaks.
+    4. Do NOT enclose the response in quotation marks.
+    """
+
+    def __init__(
+        self,
+        session: DialogSession,
+        role: RestaurantRole = None,
+        *,
+        use_pool: bool = True,
+    ) -> None:
         super().__init__(session, role or WaiterRole())
+        self.pool = get_greeting_pool() if use_pool else None
+
+    @classmethod
+    def live(cls) -> "GreetingState":
+        """A greeting state for pool refills: always calls the LLM."""
+        return cls(DialogSession(messages=[]), use_pool=False)
+
+    def prompt_key(self) -> str:
+        return hashlib.sha256(self.system_prompt().encode()).hexdigest()
+
+    def take_pooled(self) -> tuple[str, bool] | None:
+        if self.pool is None:
+            return None
+        prompt_key = self.prompt_key()
+        text = self.pool.pop(prompt_key)
+        self.pool.maybe_refill(prompt_key, self.live)
+        if text is None:
+            return None
+        validated, ok = self.validate_output(text)
+        if not ok:
+            return None
+        self.output = validated
+        self.model = POOLED_MODEL
+        return validated, ok
 
-    def system_prompt(self) -> str:
-        return f"""
-        # Role
-        {self.role.persona_messages}
-
-        # Task
-        **Greeting new customers**:
-        1. Start with a unique welcome phrase.
-        2. After welcoming, ask the customer how their day has been.
-        3. 3-4 sentences total, with natural flow between welcome and question.
-
-        # Strict Rules
-        1. Use only English.
-        2. Include ONLY conversation content (no extra explanations, labels, or metadata).
-        3. Format as a single line with no line breaks.
-        4. Do NOT enclose the response in quotation marks.
-        """
+    def generate(
+        self,
+        *,
+        temperature: float | None = None,
+        model: str | None = None,
+    ) -> tuple[str, bool]:
+        return self.take_pooled() or super().generate(
+            temperature=temperature, model=model
+        )
+
+    async def agenerate(
+        self,
+        *,
+        temperature: float | None = None,
+        model: str | None = None,
+    ) -> tuple[str, bool]:
+        return await sync_to_async(self.take_pooled)() or await super().agenerate(
+            temperature=temperature, model=model
+        )
 
     def get_serializer_context(self) -> dict:
         return {
@@ -108,48 +425,49 @@ class GreetingState(BaseState):
             "require_question_mark": True,
         }
 
-    def persist_state(self, previous_state: OrderState) -> None:
+    def get_update_fields(self) -> dict:
         messages = list(self.session.messages or [])
         messages.append({"role": "waiter", "content": self.output or ""})
-        DialogSession.objects.select_for_update().filter(
-            id=self.session.id, state=previous_state
-        ).update(
-            messages=messages,
-            state=self.state,
-        )
+        return {
+            "messages": messages,
+            "state": self.state,
+        }
 
 
 class ReplyGreetingState(BaseState):
     state: str = OrderState.DAY_REPLY
+    prompt_template = """
+    # Role
+    {persona}
+
+    # Task
+    **Respond to waiter's Greeting**:
+    1. {day_status}
+    2. Briefly and politely describe your day in 4-5 sentences.
+    3. Keep the response in one line with no line breaks.
+    4. Do NOT ask any questions.
+
+    # Strict Rules
+    1. Use only English.
+    2. Include only conversation content (no explanations).
+    3. Do NOT use quotation marks.
+    4. THIS RULE TAKES PRECEDENCE OVER ALL OTHERS: No questions of any kind in the response.
+    """
 
     def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
         super().__init__(session, role or CustomerRole())
 
-    def system_prompt(self) -> str:
+    def prompt_context(self) -> dict[str, str]:
         day_status_choices = [
             "You are having a wonderful/great/lovely day.",
             "You are having a tough/rough/bad/exhausted day—something minor went wrong",
             "You are having an average/uneventful day—nothing particularly good or bad happened.",
         ]
         weights = [0.4, 0.3, 0.3]
-        customer_day_status = random.choices(day_status_choices, weights=weights)[0]
-        return f"""
-        # Role
-        {self.role.persona_messages}
-
-        # Task
-        **Respond to waiter's Greeting**:
-        1. {customer_day_status}
-        2. Briefly and politely describe your day in 4-5 sentences.
-        3. Keep the response in one line with no line breaks.
-        4. Do NOT ask any questions.
-
-        # Strict Rules
-        1. Use only English.
-        2. Include only conversation content (no explanations).
-        3. Do NOT use quotation marks.
-        4. THIS RULE TAKES PRECEDENCE OVER ALL OTHERS: No questions of any kind in the response.
-        """
+        return {
+            **super().prompt_context(),
+            "day_status": random.choices(day_status_choices, weights=weights)[0],
+        }
 
     def get_serializer_context(self) -> dict:
         return {
@@ -158,44 +476,40 @@ class ReplyGreetingState(BaseState):
             "forbid_question_mark": True,
         }
 
-    def persist_state(self, previous_state: OrderState) -> None:
+    def get_update_fields(self) -> dict:
         messages = list(self.session.messages or [])
         messages.append({"role": "customer", "content": self.output or ""})
-        DialogSession.objects.select_for_update().filter(
-            id=self.session.id, state=previous_state
-        ).update(
-            messages=messages,
-            state=self.state,
-        )
+        return {
+            "messages": messages,
+            "state": self.state,
+        }
 
 
 class AskFavoritesState(BaseState):
     state: str = OrderState.ASK_FAVORITES
+    prompt_template = """
+    # Role
+    {persona}
+
+    # Task
+    **Ask about the customer's top 3 favorite foods**:
+    1. Reference the customer's previous response about their day when relevant to keep the conversation natural.
+    2. Clearly ask for their top 3 favorite foods.
+    3. Add a brief, positive note to encourage them.
+    4. 3-5 sentences total, with a smooth and friendly flow.
+    5. DO NOT ask any questions back.
+
+    # Strict Rules
+    1. Use only English.
+    2. Include ONLY conversation content (no extra explanations).
+    3. Format as a single line with no line breaks.
+    4. Do NOT enclose the response in quotation marks.
+    5. Explicitly request "top 3" foods.
+    """
 
     def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
         super().__init__(session, role or WaiterRole())
 
-    def system_prompt(self) -> str:
-        return f"""
-        # Role
-        {self.role.persona_messages}
-
-        # Task
-        **Ask about the customer's top 3 favorite foods**:
-        1. Reference the customer's previous response about their day when relevant to keep the conversation natural.
-        2. Clearly ask for their top 3 favorite foods.
-        3. Add a brief, positive note to encourage them.
-        4. 3-5 sentences total, with a smooth and friendly flow.
-        5. DO NOT ask any questions back.
-
-        # Strict Rules
-        1. Use only English.
-        2. Include ONLY conversation content (no extra explanations).
-        3. Format as a single line with no line breaks.
-        4. Do NOT enclose the response in quotation marks.
-        5. Explicitly request "top 3" foods.
-        """
-
     def get_serializer_context(self) -> dict:
         return {
             "forbid_newline": True,
@@ -203,44 +517,41 @@ class AskFavoritesState(BaseState):
             # "require_question_mark": True,
         }
 
-    def persist_state(self, previous_state: OrderState) -> None:
+    def get_update_fields(self) -> dict:
         messages = list(self.session.messages or [])
         messages.append({"role": "waiter", "content": self.output or ""})
-        DialogSession.objects.select_for_update().filter(
-            id=self.session.id, state=previous_state
-        ).update(
-            messages=messages,
-            state=self.state,
-        )
+        return {
+            "messages": messages,
+            "state": self.state,
+        }
 
 
 class AnswerFavoritesState(BaseState):
     state: str = OrderState.FAVORITES_REPLY
+    side_tasks = (FavoritesExtractionTask,)
+    prompt_template = """
+    # Role
+    {persona}
+
+    # Task
+    **Share your top 3 favorite foods**:
+    1. Randomly select 3 distinct foods from a diverse range (e.g., Italian, Asian, American, vegetarian options—avoid repeating the same cuisine type).
+    2. For each food, add a brief, unique reason why you like it (e.g., "sushi because it's fresh and light" or "pasta because of the rich sauces").
+    3. Present them in a natural, conversational flow (not numbered lists), in 3-4 sentences total.
+    4. Ensure the combination of foods is different from typical responses (avoid overused trios like "pizza, burgers, fries").
+
+    # Strict Rules
+    1. Use only English.
+    2. Include ONLY conversation content (no explanations or labels).
+    3. Format as a single line with no line breaks.
+    4. Do NOT enclose in quotation marks.
+    5. Never list fewer or more than 3 foods—exactly 3 must be mentioned.
+    6. Do NOT ask any questions.
+    """
 
     def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
         super().__init__(session, role or CustomerRole())
 
-    def system_prompt(self) -> str:
-        return f"""
-        # Role
-        {self.role.persona_messages}
-
-        # Task
-        **Share your top 3 favorite foods**:
-        1. Randomly select 3 distinct foods from a diverse range (e.g., Italian, Asian, American, vegetarian options—avoid repeating the same cuisine type).
-        2. For each food, add a brief, unique reason why you like it (e.g., "sushi because it's fresh and light" or "pasta because of the rich sauces").
-        3. Present them in a natural, conversational flow (not numbered lists), in 3-4 sentences total.
-        4. Ensure the combination of foods is different from typical responses (avoid overused trios like "pizza, burgers, fries").
-
-        # Strict Rules
-        1. Use only English.
-        2. Include ONLY conversation content (no explanations or labels).
-        3. Format as a single line with no line breaks.
-        4. Do NOT enclose in quotation marks.
-        5. Never list fewer or more than 3 foods—exactly 3 must be mentioned.
-        6. Do NOT ask any questions.
-        """
-
     def get_serializer_context(self) -> dict:
         return {
             "forbid_newline": True,
@@ -248,42 +559,38 @@ class AnswerFavoritesState(BaseState):
             "forbid_question_mark": True,
         }
 
-    def persist_state(self, previous_state: OrderState) -> None:
+    def get_update_fields(self) -> dict:
         messages = list(self.session.messages or [])
         messages.append({"role": "customer", "content": self.output or ""})
-        DialogSession.objects.select_for_update().filter(
-            id=self.session.id, state=previous_state
-        ).update(
-            messages=messages,
-            customer_favorite_text=(self.output or ""),
-            state=self.state,
-        )
+        return {
+            "messages": messages,
+            "customer_favorite_text": self.output or "",
+            "state": self.state,
+        }
 
 
 class AskOrderState(BaseState):
     state: str = OrderState.ASK_ORDER
+    prompt_template = """
+    # Role
+    {persona}
+
+    # Task
+    **Ask the customer what they'd like to order today**:
+    1. Invite them to order, using an open and helpful tone (e.g., "feel free to choose from our menu" or "we can prepare something special based on your favorites").
+    2. 2-3 sentences, flowing smoothly from their food preferences.
+    3. DO NOT ask customers if they need recommendations.
+
+    # Strict Rules
+    1. Use only English.
+    2. Include ONLY conversation content (no extra explanations).
+    3. Format as a single line with no line breaks.
+    4. Do NOT enclose in quotation marks.
+    """
 
     def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
         super().__init__(session, role or WaiterRole())
 
-    def system_prompt(self) -> str:
-        return f"""
-        # Role
-        {self.role.persona_messages}
-
-        # Task
-        **Ask the customer what they'd like to order today**:
-        1. Invite them to order, using an open and helpful tone (e.g., "feel free to choose from our menu" or "we can prepare something special based on your favorites").
-        2. 2-3 sentences, flowing smoothly from their food preferences.
-        3. DO NOT ask customers if they need recommendations.
-
-        # Strict Rules
-        1. Use only English.
-        2. Include ONLY conversation content (no extra explanations).
-        3. Format as a single line with no line breaks.
-        4. Do NOT enclose in quotation marks.
-        """
-
     def get_serializer_context(self) -> dict:
         return {
             "forbid_newline": True,
@@ -291,55 +598,54 @@ class AskOrderState(BaseState):
             # "require_question_mark": True,
         }
 
-    def persist_state(self, previous_state: OrderState) -> None:
+    def get_update_fields(self) -> dict:
         messages = list(self.session.messages or [])
         messages.append({"role": "waiter", "content": self.output or ""})
-        DialogSession.objects.select_for_update().filter(
-            id=self.session.id, state=previous_state
-        ).update(
-            messages=messages,
-            state=self.state,
-        )
+        return {
+            "messages": messages,
+            "state": self.state,
+        }
 
 
 class ReplyOrderState(BaseState):
     state: str = OrderState.ORDER_REPLY
+    # ``MenuSnapshot`` field substituted for ``{menu}``
+    menu_variant = "order_menu"
+    prompt_template = """
+    # Role
+    {persona}
+
+    # Task
+    **Respond with your order**:
+    1. Choose 2-3 specific dishes in the restaurant menu.
+    2. dish should be in the restaurant menu
+    3. Do not order same type of dishes (e.g. Grilled Tofu Salad and Fresh Fruit Salad are both salad)
+    4. Briefly explain why you chose these dishes.
+    5. Keep the response natural and conversational: 4-6 sentences, flowing from the waiter's question.
+
+    # Restaurant Menu
+    {menu}
+
+    # Strict Rules
+    1. Use only English.
+    2. Include ONLY conversation content (no explanations or labels).
+    3. Format as a single line with no line breaks.
+    4. Do NOT enclose in quotation marks.
+    5. Ensure the order connects logically to your previously mentioned favorite foods.
+    6. Order foods directly from the menu, do not ask for recommendations. DO NOT ask any questions.
+    """
 
     def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
         super().__init__(session, role or CustomerRole())
 
-    def system_prompt(self) -> str:
-        dishes = (
-            Dish.objects.all()
-            .only("name", "description")
-            .values_list("name", "description")
-            .order_by("id")
-        )
-        menu = "\n".join([f"- {name}: {description}" for name, description in dishes])
-
-        return f"""
-        # Role
-        {self.role.persona_messages}
-
-        # Task
-        **Respond with your order**:
-        1. Choose 2-3 specific dishes in the restaurant menu.
-        2. dish should be in the restaurant menu
-        3. Do not order same type of dishes (e.g. Grilled Tofu Salad and Fresh Fruit Salad are both salad)
-        4. Briefly explain why you chose these dishes.
-        5. Keep the response natural and conversational: 4-6 sentences, flowing from the waiter's question.
-
-        # Restaurant Menu
-        {menu}
-
-        # Strict Rules
-        1. Use only English.
-        2. Include ONLY conversation content (no explanations or labels).
-        3. Format as a single line with no line breaks.
-        4. Do NOT enclose in quotation marks.
-        5. Ensure the order connects logically to your previously mentioned favorite foods.
-        6. Order foods directly from the menu, do not ask for recommendations. DO NOT ask any questions.
-        """
+    def system_prompt(self, menu: str | None = None) -> str:
+        if menu is None:
+            menu = getattr(menu_cache.get(), self.menu_variant)
+        return self.active_prompt().render(**self.prompt_context(), menu=menu)
+
+    async def asystem_prompt(self) -> str:
+        snapshot = await menu_cache.aget()
+        return self.system_prompt(menu=getattr(snapshot, self.menu_variant))
 
     def get_serializer_context(self) -> dict:
         return {
@@ -348,82 +654,139 @@ class ReplyOrderState(BaseState):
             # "forbid_question_mark": True,
         }
 
-    def persist_state(self, previous_state: OrderState) -> None:
+    def get_update_fields(self) -> dict:
         messages = list(self.session.messages or [])
         messages.append({"role": "customer", "content": self.output or ""})
-        DialogSession.objects.select_for_update().filter(
-            id=self.session.id, state=previous_state
-        ).update(
-            messages=messages,
-            customer_order_text=(self.output or ""),
-            state=self.state,
-        )
+        return {
+            "messages": messages,
+            "customer_order_text": self.output or "",
+            "state": self.state,
+        }
 
 
 class AnalyzeState(BaseState):
     state: str = OrderState.ANALYZE
+    consumes = (FavoritesExtractionTask.name,)
+    menu_variant = "analysis_menu"
+    prompt_template = """
+    # Role
+    {persona}
+
+    # Task
+    Determine the customer's dietary preference using ONLY the customer's messages (lines starting with "Customer:") and the restaurant menu and its ingredients.
+
+    # Definitions (use these strictly)
+    - vegan: excludes all animal products: meat, poultry, fish, seafood, dairy, eggs, honey, gelatin.
+    - vegetarian: excludes meat, poultry, fish, seafood; may include dairy and/or eggs and/or honey.
+    - non-vegetarian: includes any meat, poultry, fish, or seafood.
+    - unknown: insufficient or conflicting evidences.
+
+    # Strict Rules
+    {favorites_rule}
+    2. Extract "ordered_dishes":
+        a. Locate the line starting with "Customer's Order:".
+        b. Extract dishes that are EXACTLY in the restaurant menu (e.g., "Roasted Seasonal Veggies" is in the menu, so include it).
+    3. Check Customer's favorite dishes according to their description and how the dishes are categorized. Cross-check ordered_dishes with the provided menu and its ingredients and descriptions.
+        The preference detection steps is as follows:
+        a. First check non-vegetarian (highest priority).
+            - If favorite_dishes contains meat or seafood dishes→ "non-vegetarian".
+            - Check if ordered_dishes contains meat or seafood dishes.
+        b. If non-vegetarian is not detected, check vegetarian.
+        c. If vegetarian is detected, check vegan.
+        d. otherwise, check unknown:
+            - If favorite_dishes and ordered_dishes contains all kinds of foods and you cannot tell the customer's dietary preference → "non-vegetarian".
+            - If favorite_dishes is empty AND ordered_dishes is empty → "unknown".
+            - If evidence conflicts (e.g., says "vegan" but orders dairy) → "unknown".
+    4. Response must be a valid JSON object with exactly these keys:
+        - "dietary_preference": one of ["vegetarian", "vegan", "non-vegetarian", "unknown"]
+        - "confidence_percent": integer 0-100. 100 if Step 1/2 has clear evidence (meat/ingredient match), else 0-90 depends on the evidences
+        - "evidence": brief clues you used to determine the customer's dietary preference (e.g., mentions of cheese or fish).
+            a. If the result is non-vegetarian, the evidence should include the meat clue (e.g. Roast Duck -> non-vegetarian).
+            b. If the result is vegetarian, the evidence should include the non-vegan clue (e.g. Vegetable Omelette -> not vegan).
+            c. If the result is unknown, the evidence should include the conflict clue (e.g. Roast Duck + vegan statements -> unknown).
+        - "ordered_dishes": list that step 2 extracted
+        - "favorite_dishes": list that step 1 extracted
+    5. JSON must be minified (no line breaks, extra spaces). Do not include any content outside the JSON object.
+
+    # Restaurant Menu (format: - name, description, ingredients list)
+    {menu}
+    """
 
     def __init__(self, session: DialogSession, role: RestaurantRole = None) -> None:
         super().__init__(session, role or AnalyzeDialogRole())
+        # Menu the current generation is checked against, set by (a)generate
+        self.menu_snapshot: MenuSnapshot | None = None
+
+    def system_prompt(self, menu: str | None = None) -> str:
+        if menu is None:
+            snapshot = self.menu_snapshot or menu_cache.get()
+            menu = getattr(snapshot, self.menu_variant)
+        return self.active_prompt().render(**self.prompt_context(), menu=menu)
+
+    def prompt_context(self) -> dict[str, str]:
+        return {**super().prompt_context(), "favorites_rule": self.favorites_rule()}
+
+    async def asystem_prompt(self) -> str:
+        snapshot = self.menu_snapshot or await menu_cache.aget()
+        return self.system_prompt(menu=getattr(snapshot, self.menu_variant))
+
+    @property
+    def extracted_favorites(self) -> list[str] | None:
+        return self.partials.get(FavoritesExtractionTask.name)
+
+    def favorites_rule(self) -> str:
+        if self.extracted_favorites is not None:
+            return """1. "favorite_dishes" is already extracted: copy the list on the line starting with "Customer's Favorite Dishes:" as-is."""
+        return """
+        1. Extract "favorite_dishes":
+            a. Locate the line starting with "Customer's Favorite:".
+            b. Read the entire line, find all phrases that refer to specific foods/dishes (e.g., "Thai green curry", "eggplant parmesan", "sushi").
+            c. List these phrases as strings in "favorite_dishes" (do not abbreviate, e.g., write "Thai green curry" not "curry").
+        """
 
-    def system_prompt(self) -> str:
-        dishes = (
-            Dish.objects.all()
-            .values("name", "description", "ingredients")
-            .order_by("id")
-        )
-        menu = "\n".join(
-            [
-                f"- {dish['name']}, {dish['description']}, {dish['ingredients']}"
-                for dish in dishes
-            ]
+    def build_chat_messages(self, system_prompt: str) -> list[ChatMessage]:
+        if self.extracted_favorites is not None:
+            favorites = (
+                f"Customer's Favorite Dishes: {json.dumps(self.extracted_favorites)}"
+            )
+        else:
+            favorites = f"Customer's Favorite: {self.session.customer_favorite_text}"
+        return self.role.build_messages(
+            system_prompt,
+            extra_messages=[
+                self.role.developer(
+                    f"{favorites}\nCustomer's Order: {self.session.customer_order_text}"
+                )
+            ],
         )
-        return f"""
-        # Role
-        You are an assistant specialized in detecting a customer's dietary preference from conversation.
 
-        # Task
-        Determine the customer's dietary preference using ONLY the customer's messages (lines starting with "Customer:") and the restaurant menu and its ingredients.
+    def get_chat_options(self) -> dict:
+        return {"response_format": "json"}
 
-        # Definitions (use these strictly)
-        - vegan: excludes all animal products: meat, poultry, fish, seafood, dairy, eggs, honey, gelatin.
-        - vegetarian: excludes meat, poultry, fish, seafood; may include dairy and/or eggs and/or honey.
-        - non-vegetarian: includes any meat, poultry, fish, or seafood.
-        - unknown: insufficient or conflicting evidences.
+    def take_preclassified(self, snapshot: MenuSnapshot) -> tuple[dict, bool] | None:
+        """Result of the local rule-based classifier, when it is confident.
 
-        # Strict Rules
-        1. Extract "favorite_dishes":
-            a. Locate the line starting with "Customer's Favorite:".
-            b. Read the entire line, find all phrases that refer to specific foods/dishes (e.g., "Thai green curry", "eggplant parmesan", "sushi").
-            c. List these phrases as strings in "favorite_dishes" (do not abbreviate, e.g., write "Thai green curry" not "curry").
-        2. Extract "ordered_dishes":
-            a. Locate the line starting with "Customer's Order:".
-            b. Extract dishes that are EXACTLY in the restaurant menu (e.g., "Roasted Seasonal Veggies" is in the menu, so include it).
-        3. Check Customer's favorite dishes according to their description and how the dishes are categorized. Cross-check ordered_dishes with the provided menu and its ingredients and descriptions.
-            The preference detection steps is as follows:
-            a. First check non-vegetarian (highest priority).
-                - If favorite_dishes contains meat or seafood dishes→ "non-vegetarian".
-                - Check if ordered_dishes contains meat or seafood dishes.
-            b. If non-vegetarian is not detected, check vegetarian.
-            c. If vegetarian is detected, check vegan.
-            d. otherwise, check unknown:
-                - If favorite_dishes and ordered_dishes contains all kinds of foods and you cannot tell the customer's dietary preference → "non-vegetarian".
-                - If favorite_dishes is empty AND ordered_dishes is empty → "unknown".
-                - If evidence conflicts (e.g., says "vegan" but orders dairy) → "unknown".
-        4. Response must be a valid JSON object with exactly these keys:
-            - "dietary_preference": one of ["vegetarian", "vegan", "non-vegetarian", "unknown"]
-            - "confidence_percent": integer 0-100. 100 if Step 1/2 has clear evidence (meat/ingredient match), else 0-90 depends on the evidences
-            - "evidence": brief clues you used to determine the customer's dietary preference (e.g., mentions of cheese or fish).
-                a. If the result is non-vegetarian, the evidence should include the meat clue (e.g. Roast Duck -> non-vegetarian).
-                b. If the result is vegetarian, the evidence should include the non-vegan clue (e.g. Vegetable Omelette -> not vegan).
-                c. If the result is unknown, the evidence should include the conflict clue (e.g. Roast Duck + vegan statements -> unknown).
-            - "ordered_dishes": list that step 2 extracted
-            - "favorite_dishes": list that step 1 extracted
-        5. JSON must be minified (no line breaks, extra spaces). Do not include any content outside the JSON object.
-
-        # Restaurant Menu (format: - name, description, ingredients list)
-        {menu}
+        Only used once the favorites side task has extracted
+        ``favorite_dishes``, which the rules cannot do themselves.
         """
+        config = settings.RESTAURANT_DIETARY_PRECLASSIFIER
+        if not config.get("ENABLED", False) or self.extracted_favorites is None:
+            return None
+        with transition_metrics.timer(LLM_CALL, self.state, PRECLASSIFIER_MODEL):
+            result = preclassify(
+                snapshot,
+                favorite_text=self.session.customer_favorite_text,
+                order_text=self.session.customer_order_text,
+                favorite_dishes=self.extracted_favorites,
+            )
+        if result is None or result["confidence_percent"] < config["MIN_CONFIDENCE"]:
+            return None
+        serializer = self.get_serializer_class()(data=result)
+        if not serializer.is_valid():
+            return None
+        self.output = {**serializer.validated_data}
+        self.model = PRECLASSIFIER_MODEL
+        return self.output, True
 
     def generate(
         self,
@@ -431,24 +794,21 @@ class AnalyzeState(BaseState):
         temperature: float | None = 0,
         model: str | None = None,
     ) -> tuple[dict, bool]:
-        messages = self.role.build_messages(
-            self.system_prompt(),
-            extra_messages=[
-                self.role.developer(f"""
-                Customer's Favorite: {self.session.customer_favorite_text}
-                Customer's Order: {self.session.customer_order_text}
-                """)
-            ],
+        self.menu_snapshot = menu_cache.get()
+        return self.take_preclassified(self.menu_snapshot) or super().generate(
+            temperature=temperature, model=model
         )
-        text = self.role.chat(
-            messages=messages,
-            temperature=temperature,
-            model=model,
-            response_format="json",
+
+    async def agenerate(
+        self,
+        *,
+        temperature: float | None = 0,
+        model: str | None = None,
+    ) -> tuple[dict, bool]:
+        self.menu_snapshot = await menu_cache.aget()
+        return self.take_preclassified(self.menu_snapshot) or await super().agenerate(
+            temperature=temperature, model=model
         )
-        validated, ok = self.validate_output(text)
-        self.output = validated
-        return validated, ok
 
     def validate_output(self, text: str, silent: bool = True) -> tuple[dict, bool]:
         try:
@@ -457,23 +817,34 @@ class AnalyzeState(BaseState):
             if not silent:
                 raise e
             return {}, False
-        serializer = self.get_serializer_class()(data=data)
+        serializer = self.get_serializer_class()(
+            data=data, context=self.get_serializer_context()
+        )
         ok = serializer.is_valid(raise_exception=not silent)
         if ok:
-            return {**serializer.validated_data}, True
+            result = {**serializer.validated_data}
+            if self.extracted_favorites is not None:
+                result["favorite_dishes"] = list(self.extracted_favorites)
+            return result, True
         return {}, False
 
     def get_serializer_class(self):
         return AnalyzeResultSerializer
 
-    def persist_state(self, previous_state: OrderState) -> None:
+    def get_serializer_context(self) -> dict:
+        if self.menu_snapshot is None:
+            return {}
+        return {"menu_index": menu_index(self.menu_snapshot)}
+
+    def get_update_fields(self) -> dict:
+        result = self.output if isinstance(self.output, dict) else {}
+        return {
+            "analysis_result": result,
+            "state": self.state,
+        }
+
+    def after_persist(self) -> None:
         result = self.output if isinstance(self.output, dict) else {}
-        DialogSession.objects.select_for_update().filter(
-            id=self.session.id, state=previous_state
-        ).update(
-            analysis_result=result,
-            state=self.state,
-        )
         self.session.customer.dietary_preference = result.get(
             "dietary_preference", "unknown"
         )
@@ -0,0 +1,79 @@
+from django.core.management.base import BaseCommand
+
+from apps.restaurant.models import DialogSession
+from apps.restaurant.services.batch_analysis import ANALYZABLE_STATES
+from apps.restaurant.services.batch_analysis import analyzable_sessions
+from apps.restaurant.services.batch_analysis import analyze_sessions
+from apps.restaurant.services.llm_pool import get_llm_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-analyze dialog sessions through the provider's batch API, at batch "
+        "pricing and outside the live rate limit."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--session",
+            type=int,
+            action="append",
+            dest="sessions",
+            help="Session id to analyze; repeat for several. Default: all.",
+        )
+        parser.add_argument(
+            "--state",
+            choices=[str(state) for state in ANALYZABLE_STATES],
+            default=None,
+            help="Only analyze sessions in this state.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Maximum number of sessions to analyze.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Sessions per batch job (RESTAURANT_LLM_BATCH MAX_REQUESTS).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=None,
+            help="Seconds between batch job status checks.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many sessions would be analyzed.",
+        )
+
+    def handle(self, *args, **options):
+        queryset = DialogSession.objects.all()
+        if options["sessions"]:
+            queryset = queryset.filter(id__in=options["sessions"])
+        if options["state"]:
+            queryset = queryset.filter(state=options["state"])
+        sessions = analyzable_sessions(queryset)
+        if options["limit"] is not None:
+            sessions = sessions[: options["limit"]]
+        if options["dry_run"]:
+            self.stdout.write(f"sessions to analyze: {sessions.count()}")
+            return
+
+        stats = analyze_sessions(
+            sessions,
+            get_llm_client(),
+            batch_size=options["batch_size"],
+            poll_interval=options["poll_interval"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"batch analysis: submitted={stats.submitted} "
+                f"analyzed={stats.analyzed} invalid={stats.invalid} "
+                f"failed={stats.failed} skipped={stats.skipped}"
+            )
+        )
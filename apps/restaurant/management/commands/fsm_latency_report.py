@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from apps.restaurant.fsm.instrumentation import default_metrics_file
+from apps.restaurant.fsm.instrumentation import summarize
+
+EXPORTER_PATH = "apps.restaurant.fsm.instrumentation.JsonLinesExporter"
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize FSM transition latencies exported by JsonLinesExporter. "
+        "Samples are only written when RESTAURANT_FSM_METRICS_EXPORTERS lists "
+        f"{EXPORTER_PATH}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--file",
+            default=None,
+            help="JSON lines file to read (defaults to logs/fsm_latency.jsonl).",
+        )
+        parser.add_argument("--state", default=None, help="Only report this state.")
+        parser.add_argument("--phase", default=None, help="Only report this phase.")
+
+    def handle(self, *args, **options):
+        path = options["file"] or default_metrics_file()
+        try:
+            with open(path) as f:
+                samples = [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            raise CommandError(
+                f"No latency samples found at {path}. Add {EXPORTER_PATH} to "
+                "RESTAURANT_FSM_METRICS_EXPORTERS to record them."
+            ) from None
+
+        samples = [
+            sample
+            for sample in samples
+            if options["state"] in (None, sample["state"])
+            and options["phase"] in (None, sample["phase"])
+        ]
+        header = (
+            f"{'state':<16} {'phase':<13} {'model':<14} {'count':>7} "
+            f"{'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+        )
+        self.stdout.write(header)
+        for row in sorted(summarize(samples), key=lambda r: (r["state"], r["phase"])):
+            self.stdout.write(
+                f"{row['state']:<16} {row['phase']:<13} {row['model']:<14} "
+                f"{row['count']:>7} {row['mean'] * 1000:>9.1f} "
+                f"{row['p50'] * 1000:>9.1f} {row['p95'] * 1000:>9.1f} "
+                f"{row['p99'] * 1000:>9.1f} {row['max'] * 1000:>9.1f}"
+            )
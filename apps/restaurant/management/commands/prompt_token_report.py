@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from apps.restaurant.fsm.states import state_registry
+from apps.restaurant.models import DialogSession
+from apps.restaurant.services.menu import menu_cache
+from libs.clients.llm_client.tokens import count_message_tokens
+from libs.clients.llm_client.tokens import count_tokens
+
+
+class Command(BaseCommand):
+    help = "Report system prompt token counts for every dialog state."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            default="",
+            help="Model whose tokenizer to use (exact counts need tiktoken).",
+        )
+
+    def handle(self, *args, **options):
+        model = options["model"]
+        session = DialogSession(customer_id=0, messages=[])
+        snapshot = menu_cache.get()
+
+        self.stdout.write(
+            f"{'state':<16} {'role':<18} {'source':>7} {'compiled':>9} "
+            f"{'saved':>7} {'request':>8}"
+        )
+        for state_class in state_registry.values():
+            state = state_class(session)
+            template = state.active_prompt()
+            context = state.prompt_context()
+            if "menu" in template.fields:
+                context["menu"] = getattr(snapshot, state.menu_variant)
+            prompt = template.render(**context)
+            source_tokens = count_tokens(
+                state.compiled_prompt.render_source(**context), model
+            )
+            prompt_tokens = count_tokens(prompt, model)
+            request_tokens = count_message_tokens(
+                state.build_chat_messages(prompt), model
+            )
+            saved = 1 - prompt_tokens / source_tokens if source_tokens else 0.0
+            self.stdout.write(
+                f"{state.state:<16} {type(state.role).__name__:<18} "
+                f"{source_tokens:>7} {prompt_tokens:>9} {saved:>7.1%} "
+                f"{request_tokens:>8}"
+            )
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from apps.restaurant.fsm.states import GreetingState
+from apps.restaurant.services.greeting_pool import get_greeting_pool
+
+
+class Command(BaseCommand):
+    help = "Fill the pre-generated greeting pool up to its high watermark."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and top the pool up whenever it runs low.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=30.0,
+            help="Seconds between pool checks in --loop mode.",
+        )
+
+    def handle(self, *args, **options):
+        pool = get_greeting_pool()
+        if pool is None:
+            raise CommandError("The greeting pool is disabled in settings.")
+
+        prompt_key = GreetingState.live().prompt_key()
+        while True:
+            size = pool.size(prompt_key)
+            if size < pool.low_watermark or not options["loop"]:
+                added = pool.refill(GreetingState.live)
+                self.stdout.write(f"greeting pool: size={size} added={added}")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
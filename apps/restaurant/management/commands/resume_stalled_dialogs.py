@@ -0,0 +1,60 @@
+import asyncio
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.restaurant.services.recovery import abandoned_sessions
+from apps.restaurant.services.recovery import claim_stalled_sessions
+from apps.restaurant.services.recovery import resume_sessions
+from apps.restaurant.services.recovery import stalled_sessions
+
+
+class Command(BaseCommand):
+    help = "Claim dialog sessions stuck in a non-terminal state and resume them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=600,
+            help="Seconds without progress before a session counts as stalled.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Maximum number of sessions to claim in this sweep.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=5,
+            help="Maximum number of in-flight transitions.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report stalled sessions without claiming them.",
+        )
+
+    def handle(self, *args, **options):
+        older_than = timedelta(seconds=options["older_than"])
+        if options["dry_run"]:
+            count = stalled_sessions(older_than).count()
+            self.stdout.write(f"stalled sessions: {count}")
+            abandoned = abandoned_sessions().count()
+            self.stdout.write(f"sessions past the resume limit: {abandoned}")
+            return
+
+        sessions = claim_stalled_sessions(older_than, options["limit"])
+        self.stdout.write(f"claimed sessions: {len(sessions)}")
+        if not sessions:
+            return
+        stats = asyncio.run(
+            resume_sessions(sessions, concurrency=options["concurrency"])
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"resumed sessions: completed={stats.completed} failed={stats.failed}"
+            )
+        )
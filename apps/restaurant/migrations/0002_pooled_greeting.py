@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PooledGreeting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When this record was created', verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When this record was last updated', verbose_name='Updated at')),
+                ('prompt_key', models.CharField(db_index=True, max_length=64, verbose_name='prompt key')),
+                ('content', models.TextField(verbose_name='content')),
+            ],
+            options={
+                'db_table': 'restaurant_pooled_greeting',
+            },
+        ),
+    ]
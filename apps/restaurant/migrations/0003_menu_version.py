@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0002_pooled_greeting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='When this record was created', verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='When this record was last updated', verbose_name='Updated at')),
+                ('token', models.CharField(max_length=32, verbose_name='token')),
+            ],
+            options={
+                'db_table': 'restaurant_menu_version',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurant', '0003_menu_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dialogsession',
+            name='resume_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='resume attempts'),
+        ),
+    ]
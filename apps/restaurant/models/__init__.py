@@ -1,9 +1,13 @@
 from .customer import CustomerProfile
 from .dialog_session import DialogSession
 from .dish import Dish
+from .greeting import PooledGreeting
+from .menu import MenuVersion
 
 __all__ = [
     "Dish",
     "CustomerProfile",
     "DialogSession",
+    "PooledGreeting",
+    "MenuVersion",
 ]
@@ -26,6 +26,8 @@ class DialogSession(BaseModel):
     analysis_result = models.JSONField(_("analysis result"), default=dict)
     customer_favorite_text = models.TextField(_("customer favorite text"), default="")
     customer_order_text = models.TextField(_("customer order text"), default="")
+    # Stalled-session resumes since the dialog last made progress
+    resume_attempts = models.PositiveSmallIntegerField(_("resume attempts"), default=0)
     customer = models.ForeignKey(
         "restaurant.CustomerProfile",
         related_name="dialogs",
@@ -0,0 +1,14 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from core.db.models import BaseModel
+
+
+class PooledGreeting(BaseModel):
+    """Pre-generated waiter greeting waiting to be handed to a new dialog."""
+
+    prompt_key = models.CharField(_("prompt key"), max_length=64, db_index=True)
+    content = models.TextField(_("content"))
+
+    class Meta:
+        db_table = "restaurant_pooled_greeting"
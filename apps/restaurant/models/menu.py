@@ -0,0 +1,13 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from core.db.models import BaseModel
+
+
+class MenuVersion(BaseModel):
+    """Single row whose token changes whenever the ``Dish`` table changes."""
+
+    token = models.CharField(_("token"), max_length=32)
+
+    class Meta:
+        db_table = "restaurant_menu_version"
@@ -1,8 +1,17 @@
 # ruff: noqa: E501
+from typing import Any
+
 from apps.restaurant.roles.base import RestaurantRole
+from apps.restaurant.services.llm_cache import get_cached_client
+from libs.clients.llm_client.interface import LLMClient
 
 
 class AnalyzeDialogRole(RestaurantRole):
+    """Analysis runs at temperature 0, so it shares the response cache."""
+
+    def __init__(self, *, client: LLMClient | None = None, **kwargs: Any) -> None:
+        super().__init__(client=client or get_cached_client(), **kwargs)
+
     @property
     def persona_messages(self) -> str:
         return """
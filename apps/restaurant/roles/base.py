@@ -2,9 +2,14 @@ from typing import Any
 from typing import Literal
 from typing import TypedDict
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from apps.restaurant.serializers.output_validate import StreamGuard
+from apps.restaurant.services.llm_pool import get_llm_client
 from libs.clients.llm_client.interface import ChatMessage
+from libs.clients.llm_client.interface import ChatResult
 from libs.clients.llm_client.interface import LLMClient
-from libs.clients.llm_client.providers.openai_client import OpenAIClient
 
 
 class DialogMessage(TypedDict):
@@ -12,11 +17,30 @@ class DialogMessage(TypedDict):
     content: str
 
 
+class GenerationAborted(Exception):
+    """A streamed reply was cancelled because it broke the output contract.
+
+    ``text`` is the reply received up to and including the violation.
+    """
+
+    def __init__(self, reason: str, text: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.text = text
+
+
 class RestaurantRole:
     """Base role for restaurant conversation agents.
 
     Provides minimal helpers to construct chat messages and perform
     non-streaming chat completions through a pluggable LLM client.
+    ``achat`` awaits the client's native ``achat`` when it has one. The
+    latest ``ChatResult`` is kept in ``last_result`` for usage accounting,
+    and handed to a caching client by ``confirm_result`` once it validated.
+
+    Given a ``stream_guard``, clients that can stream are read incrementally
+    and the request is cancelled with ``GenerationAborted`` as soon as the
+    guard reports a violation.
     """
 
     def __init__(
@@ -25,10 +49,18 @@ class RestaurantRole:
         client: LLMClient | None = None,
         model: str = "gpt-4o",
         temperature: float | None = None,
+        context_tokens: int | None = None,
     ) -> None:
-        self._client = client or OpenAIClient()
+        # Roles share the process-wide pooled client unless given one
+        self._client = client or get_llm_client()
+        # Token budget for replayed dialog turns, see ``DialogContextBuilder``
+        self.context_tokens = context_tokens or getattr(
+            settings, "RESTAURANT_DIALOG_CONTEXT_TOKENS", None
+        )
         self._model = model
         self._temperature = temperature
+        self.last_result: ChatResult | None = None
+        self.last_kwargs: dict[str, Any] = {}
 
     @classmethod
     def system(cls, content: str) -> ChatMessage:
@@ -50,6 +82,14 @@ class RestaurantRole:
     def persona_messages(self) -> str:
         return ""
 
+    @property
+    def default_model(self) -> str:
+        return self._model
+
+    @property
+    def default_temperature(self) -> float | None:
+        return self._temperature
+
     def build_context(
         self,
         extra_messages: list[ChatMessage] = None,
@@ -78,12 +118,90 @@ class RestaurantRole:
         response_format: str | None = None,
         extra: dict[str, Any] | None = None,
         model: str | None = None,
+        stream_guard: StreamGuard | None = None,
     ) -> str:
-        result = self._client.chat(
-            model=model or self._model,
-            messages=messages,
-            temperature=self._temperature if temperature is None else temperature,
-            response_format=response_format,  # "json" or None
-            extra=extra,
+        kwargs = self.last_kwargs = self.chat_kwargs(
+            messages, temperature, response_format, extra, model
         )
+        stream_chat = getattr(self._client, "stream_chat", None)
+        if stream_guard is not None and stream_chat is not None:
+            stream = stream_chat(**kwargs)
+            try:
+                for text in stream:
+                    self.check_stream(stream_guard, text, stream)
+            finally:
+                stream.close()
+            result = stream.result()
+        else:
+            result = self._client.chat(**kwargs)
+        self.last_result = result
         return result["content"]
+
+    async def achat(
+        self,
+        *,
+        messages: list[ChatMessage],
+        temperature: float | None = None,
+        response_format: str | None = None,
+        extra: dict[str, Any] | None = None,
+        model: str | None = None,
+        stream_guard: StreamGuard | None = None,
+    ) -> str:
+        kwargs = self.last_kwargs = self.chat_kwargs(
+            messages, temperature, response_format, extra, model
+        )
+        astream_chat = getattr(self._client, "astream_chat", None)
+        achat = getattr(self._client, "achat", None)
+        if stream_guard is not None and astream_chat is not None:
+            stream = await astream_chat(**kwargs)
+            try:
+                async for text in stream:
+                    self.check_stream(stream_guard, text, stream)
+            finally:
+                await stream.aclose()
+            result = stream.result()
+        elif achat is not None:
+            result = await achat(**kwargs)
+        else:
+            # Sync-only clients fall back to a worker thread
+            result = await sync_to_async(self._client.chat, thread_sensitive=False)(
+                **kwargs
+            )
+        self.last_result = result
+        return result["content"]
+
+    def chat_kwargs(
+        self,
+        messages: list[ChatMessage],
+        temperature: float | None,
+        response_format: str | None,
+        extra: dict[str, Any] | None,
+        model: str | None,
+    ) -> dict[str, Any]:
+        return {
+            "model": model or self._model,
+            "messages": messages,
+            "temperature": self._temperature if temperature is None else temperature,
+            "response_format": response_format,  # "json" or None
+            "extra": extra,
+        }
+
+    def confirm_result(self) -> None:
+        """Tell a caching client that ``last_result`` passed validation."""
+        confirm = getattr(self._client, "confirm", None)
+        if confirm is not None and self.last_result is not None:
+            confirm(self.last_result, **self.last_kwargs)
+
+    async def aconfirm_result(self) -> None:
+        aconfirm = getattr(self._client, "aconfirm", None)
+        if aconfirm is None:
+            self.confirm_result()
+        elif self.last_result is not None:
+            await aconfirm(self.last_result, **self.last_kwargs)
+
+    def check_stream(self, guard: StreamGuard, text: str, stream: Any) -> None:
+        reason = guard.feed(text)
+        if reason is not None:
+            # Keep the partial result (and any usage) of the cancelled call
+            self.last_result = stream.result()
+            raise GenerationAborted(reason, self.last_result["content"])
@@ -0,0 +1,141 @@
+import re
+from dataclasses import dataclass
+
+from libs.clients.llm_client.tokens import MESSAGE_OVERHEAD
+from libs.clients.llm_client.tokens import count_tokens
+
+from .base import DialogMessage
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Whole words only: "today" in "What would you like to order today?" is not
+# a question about the customer's day
+_ASKS_FAVORITES = re.compile(r"\bfavou?rites?\b")
+_ASKS_DAY = re.compile(r"\bday\b")
+
+GOOD_DAY_WORDS = ("wonderful", "great", "lovely", "good", "fantastic", "enjoy")
+BAD_DAY_WORDS = ("tough", "rough", "bad", "exhausted", "tired", "wrong", "stress")
+# Prefix of facts kept from turns that answer no known question
+REMARK = "Customer said: "
+
+
+def first_sentences(text: str, max_tokens: int) -> str:
+    """Leading whole sentences of ``text`` that fit in ``max_tokens``."""
+    kept: list[str] = []
+    used = 0
+    for sentence in _SENTENCE_END.split(text.strip()):
+        tokens = count_tokens(sentence)
+        if kept and used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept)
+
+
+def day_mood(text: str) -> str:
+    lowered = text.lower()
+    good = sum(lowered.count(word) for word in GOOD_DAY_WORDS)
+    bad = sum(lowered.count(word) for word in BAD_DAY_WORDS)
+    if good > bad:
+        return "good"
+    if bad > good:
+        return "bad"
+    return "average"
+
+
+def extract_facts(dialog: list[DialogMessage], fact_tokens: int = 60) -> list[str]:
+    """Short facts carried over from turns dropped from the context.
+
+    A customer turn is labeled by the waiter question it answers: replies
+    about the customer's day become their mood, replies about favorites keep
+    their leading sentences, and anything else keeps its first sentence.
+    Waiter turns only provide that label.
+    """
+    facts: list[str] = []
+    asked = ""
+    for message in dialog:
+        if message["role"] == "waiter":
+            asked = message["content"].lower()
+            continue
+        content = message["content"]
+        if _ASKS_FAVORITES.search(asked):
+            facts.append(
+                f"Customer's favorite foods: {first_sentences(content, fact_tokens)}"
+            )
+        elif _ASKS_DAY.search(asked):
+            facts.append(f"Customer's day: {day_mood(content)}")
+        else:
+            facts.append(f"{REMARK}{first_sentences(content, fact_tokens // 2)}")
+        asked = ""
+    return facts
+
+
+@dataclass(frozen=True, slots=True)
+class CompactedDialog:
+    # Facts from the older turns, oldest first
+    facts: list[str]
+    # Most recent turns, verbatim
+    recent: list[DialogMessage]
+
+
+class DialogContextBuilder:
+    """Fits a dialog into ``token_budget`` estimated tokens.
+
+    Budgets count message overhead as ``count_message_tokens`` does. Turns are
+    kept verbatim from the newest backwards while they fit in
+    ``recent_share`` of the budget, and at least ``keep_recent`` of them
+    always are. Everything older is replaced by ``extract_facts``, dropping
+    the oldest plain remarks (then the oldest facts) if they overflow, so the
+    context stops growing with the number of turns.
+    """
+
+    def __init__(
+        self, token_budget: int, keep_recent: int = 2, recent_share: float = 0.75
+    ) -> None:
+        if token_budget < 1:
+            raise ValueError("token_budget must be positive")
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        # Verbatim turns beyond ``keep_recent`` leave the rest to the facts
+        self.recent_budget = int(token_budget * recent_share)
+
+    def compact(self, dialog: list[DialogMessage]) -> CompactedDialog:
+        costs = [
+            MESSAGE_OVERHEAD + count_tokens(message["content"]) for message in dialog
+        ]
+        if sum(costs) <= self.token_budget:
+            return CompactedDialog(facts=[], recent=list(dialog))
+
+        used = 0
+        split = len(dialog)
+        while split > 0:
+            cost = costs[split - 1]
+            if (
+                len(dialog) - split >= self.keep_recent
+                and used + cost > self.recent_budget
+            ):
+                break
+            used += cost
+            split -= 1
+
+        facts = extract_facts(dialog[:split])
+        while facts and used + self.facts_cost(facts) > self.token_budget:
+            # Plain remarks go before the mood and favorites facts
+            remarks = [i for i, fact in enumerate(facts) if fact.startswith(REMARK)]
+            facts.pop(remarks[0] if remarks else 0)
+        return CompactedDialog(facts=facts, recent=list(dialog[split:]))
+
+    @staticmethod
+    def facts_cost(facts: list[str]) -> int:
+        return MESSAGE_OVERHEAD + count_tokens(render_facts(facts))
+
+
+def compact_dialog(
+    dialog: list[DialogMessage], token_budget: int | None
+) -> CompactedDialog:
+    if token_budget is None:
+        return CompactedDialog(facts=[], recent=list(dialog))
+    return DialogContextBuilder(token_budget).compact(dialog)
+
+
+def render_facts(facts: list[str]) -> str:
+    return "Earlier in this conversation:\n" + "\n".join(f"- {fact}" for fact in facts)
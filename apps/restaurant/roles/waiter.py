@@ -2,6 +2,8 @@ from libs.clients.llm_client.interface import ChatMessage
 
 from .base import DialogMessage
 from .base import RestaurantRole
+from .context import compact_dialog
+from .context import render_facts
 
 
 class WaiterRole(RestaurantRole):
@@ -19,8 +21,11 @@ class WaiterRole(RestaurantRole):
     ) -> list[ChatMessage]:
         if dialog_context is None:
             return super().build_context(extra_messages, dialog_context)
-        messages = []
-        for d_msg in dialog_context:
+        compacted = compact_dialog(dialog_context, self.context_tokens)
+        messages: list[ChatMessage] = []
+        if compacted.facts:
+            messages.append(self.developer(render_facts(compacted.facts)))
+        for d_msg in compacted.recent:
             if d_msg["role"] == "customer":
                 messages.append(self.user(d_msg["content"]))
             elif d_msg["role"] == "waiter":
@@ -0,0 +1,45 @@
+import time
+
+from transitions import Machine
+
+from apps.restaurant.fsm.machine import TRANSITIONS
+from apps.restaurant.fsm.machine import DialogStateMachine
+from apps.restaurant.models import DialogSession
+
+OrderState = DialogSession.CustomerOrderState
+
+
+class LegacyDialogStateMachine:
+    """Per-instance ``transitions.Machine``, as built before the shared table."""
+
+    states = list(OrderState)
+
+    def __init__(self, session: DialogSession) -> None:
+        self.session = session
+        self.state = session.state
+        self.machine = Machine(
+            model=self,
+            states=self.states,
+            transitions=TRANSITIONS,
+            initial=self.state,
+            ignore_invalid_triggers=False,
+        )
+
+
+def measure(machine_class, count: int) -> float:
+    sessions = [DialogSession(id=i, customer_id=0) for i in range(count)]
+    started = time.perf_counter()
+    for session in sessions:
+        machine_class(session)
+    elapsed = time.perf_counter() - started
+    return count / elapsed if elapsed else float("inf")
+
+
+def run(*args):
+    count = int(args[0]) if args else 2000
+    legacy = measure(LegacyDialogStateMachine, count)
+    shared = measure(DialogStateMachine, count)
+    print(f"sessions={count}")
+    print(f"transitions.Machine per session: {legacy:,.0f} sessions/s")
+    print(f"shared transition table:         {shared:,.0f} sessions/s")
+    print(f"speedup: {shared / legacy:.1f}x")
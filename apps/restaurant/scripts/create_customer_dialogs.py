@@ -3,22 +3,25 @@ import asyncio
 from asgiref.sync import sync_to_async
 
 from apps.restaurant.fsm.machine import DialogStateMachine
+from apps.restaurant.fsm.scheduler import DialogScheduler
 from apps.restaurant.models import CustomerProfile
 from apps.restaurant.models import DialogSession
 from core.auth.utils.factories import UserFactory
 
 
-async def run_one():
+async def create_session() -> DialogSession:
     user = await sync_to_async(UserFactory.create)()
     customer = await CustomerProfile.objects.aget(user=user)
-    session = await DialogSession.objects.acreate(
+    return await DialogSession.objects.acreate(
         messages=[],
         analysis_result={},
         customer=customer,
     )
-    print(
-        f"session created: id={session.id}  customer_id={getattr(customer, 'id', None)}"
-    )
+
+
+async def run_one():
+    session = await create_session()
+    print(f"session created: id={session.id}  customer_id={session.customer_id}")
     machine = DialogStateMachine.from_session(session)
     triggers = [
         "start_greeting",
@@ -31,7 +34,7 @@ async def run_one():
     ]
     for t in triggers:
         print(f"trigger start: {t} session={session.id}")
-        ok = await asyncio.to_thread(machine.safe_trigger, t)
+        ok = await machine.asafe_trigger(t)
         if not ok:
             print(
                 f"trigger failed: {t} from_state={machine.current_state} session={session.id}"
@@ -44,20 +47,20 @@ async def run_one():
     return session
 
 
-async def run_many(count: int):
-    print(f"run_many start: count={count}")
-    sem = asyncio.Semaphore(5)
-
-    async def _runner():
-        async with sem:
-            return await run_one()
-
-    tasks = [asyncio.create_task(_runner()) for _ in range(count)]
-    sessions = await asyncio.gather(*tasks)
-    print(f"run_many done: count={count}")
+async def run_many(count: int, concurrency: int = 5):
+    print(f"run_many start: count={count} concurrency={concurrency}")
+    sessions = [await create_session() for _ in range(count)]
+    scheduler = DialogScheduler(concurrency=concurrency)
+    stats = await scheduler.run(sessions)
+    print(
+        f"run_many done: completed={stats.completed} failed={stats.failed} "
+        f"elapsed={stats.elapsed:.1f}s "
+        f"throughput={stats.dialogs_per_minute:.1f} dialogs/min"
+    )
     return sessions
 
 
 def run(*args):
     count = int(args[0]) if args else 1
-    asyncio.run(run_many(count))
+    concurrency = int(args[1]) if len(args) > 1 else 5
+    asyncio.run(run_many(count, concurrency))
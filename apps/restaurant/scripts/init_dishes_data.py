@@ -2,6 +2,7 @@
 from django.db import transaction
 
 from ..models import Dish
+from ..services.menu import bump_menu_version
 
 dishes = [
     {
@@ -377,4 +378,6 @@ def run(*args):
     with transaction.atomic():
         Dish.objects.all().delete()
         Dish.objects.bulk_create(create_dishes)
+        # bulk_create sends no post_save signals
+        bump_menu_version()
     print("Dishes data initialized successfully.")
@@ -39,6 +39,51 @@ class StringOutputSerializer(serializers.Serializer):
         return value
 
 
+class StreamGuard:
+    """Incremental check of the ``StringOutputSerializer`` rules that a
+    partial reply can already break for certain.
+
+    ``feed`` takes the reply chunk by chunk and returns the validation error
+    as soon as no continuation could make the text valid: any "?" under
+    ``forbid_question_mark``, or under ``forbid_newline`` a line break
+    between two non-whitespace characters (surrounding whitespace is
+    trimmed before validation). The other rules need the whole text and are
+    left to the serializer.
+    """
+
+    def __init__(
+        self, *, forbid_newline: bool = False, forbid_question_mark: bool = False
+    ) -> None:
+        self.forbid_newline = forbid_newline
+        self.forbid_question_mark = forbid_question_mark
+        self._started = False
+        self._line_break = False
+
+    @classmethod
+    def from_context(cls, context: dict) -> "StreamGuard | None":
+        guard = cls(
+            forbid_newline=context.get("forbid_newline", False),
+            forbid_question_mark=context.get("forbid_question_mark", False),
+        )
+        if not (guard.forbid_newline or guard.forbid_question_mark):
+            return None
+        return guard
+
+    def feed(self, text: str) -> str | None:
+        for char in text:
+            if char == "?" and self.forbid_question_mark:
+                return "text should not contain question marks"
+            if char.isspace():
+                if char == "\n" and self._started:
+                    self._line_break = True
+                continue
+            if self._line_break and self.forbid_newline:
+                return "text should be single line"
+            self._started = True
+            self._line_break = False
+        return None
+
+
 class AnalyzeResultSerializer(serializers.Serializer):
     dietary_preference = serializers.ChoiceField(
         choices=CustomerProfile.DietaryPreference.choices
@@ -51,3 +96,11 @@ class AnalyzeResultSerializer(serializers.Serializer):
     favorite_dishes = serializers.ListField(
         child=serializers.CharField(), allow_empty=True
     )
+
+    def validate_ordered_dishes(self, value):
+        # With a menu in the context, keep only real dishes in the menu's
+        # spelling
+        menu_index = self.context.get("menu_index")
+        if menu_index is None or not len(menu_index):
+            return value
+        return menu_index.reconcile(value)
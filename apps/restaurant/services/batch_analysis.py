@@ -0,0 +1,121 @@
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from loguru import logger
+
+from apps.restaurant.fsm.states import AnalyzeState
+from apps.restaurant.models import DialogSession
+from apps.restaurant.roles.analyze import AnalyzeDialogRole
+from apps.restaurant.services.menu import menu_cache
+from libs.clients.llm_client.interface import BatchLLMClient
+from libs.clients.llm_client.interface import BatchRequest
+
+OrderState = DialogSession.CustomerOrderState
+
+# States in which a session holds the whole dialog the analysis reads
+ANALYZABLE_STATES = [OrderState.ORDER_REPLY, OrderState.ANALYZE]
+
+
+@dataclass(slots=True)
+class BatchAnalysisStats:
+    submitted: int = 0
+    analyzed: int = 0
+    # Outputs that failed validation; the session is left as it was
+    invalid: int = 0
+    # Requests the job returned an error for, or no result at all
+    failed: int = 0
+    # Sessions another writer moved on while the job ran
+    skipped: int = 0
+
+
+def analyzable_sessions(
+    queryset: QuerySet[DialogSession] | None = None,
+) -> QuerySet[DialogSession]:
+    if queryset is None:
+        queryset = DialogSession.objects.all()
+    return (
+        queryset.filter(state__in=ANALYZABLE_STATES)
+        .select_related("customer")
+        .order_by("id")
+    )
+
+
+def analysis_request(state: AnalyzeState) -> BatchRequest:
+    """The chat request ``AnalyzeState.generate`` would send, as a batch line."""
+    messages = state.build_chat_messages(state.system_prompt())
+    return BatchRequest(
+        custom_id=f"session-{state.session.id}",
+        chat_kwargs=state.role.chat_kwargs(
+            messages, temperature=0, extra=None, model=None, **state.get_chat_options()
+        ),
+    )
+
+
+def analyze_sessions(
+    sessions: Iterable[DialogSession],
+    client: BatchLLMClient,
+    *,
+    batch_size: int | None = None,
+    poll_interval: float | None = None,
+    timeout: float | None = None,
+) -> BatchAnalysisStats:
+    """Run ``AnalyzeState`` for ``sessions`` through provider batch jobs.
+
+    Each job of up to ``batch_size`` sessions is billed at batch pricing and
+    counted against the provider's batch quota, so a backfill leaves the
+    interactive rate limit to live dialogs. Valid results are persisted
+    with the live state's compare-and-set; a session that moved on while
+    its job ran keeps the newer data.
+    """
+    config = getattr(settings, "RESTAURANT_LLM_BATCH", {})
+    if batch_size is None:
+        batch_size = config.get("MAX_REQUESTS", 50_000)
+    if poll_interval is None:
+        poll_interval = config.get("POLL_INTERVAL", 30.0)
+    if timeout is None:
+        timeout = config.get("TIMEOUT", 24 * 3600.0)
+    sessions = list(sessions)
+    stats = BatchAnalysisStats()
+    snapshot = menu_cache.get()
+    for start in range(0, len(sessions), batch_size):
+        states = {}
+        for session in sessions[start : start + batch_size]:
+            state = AnalyzeState(session, AnalyzeDialogRole(client=client))
+            state.menu_snapshot = snapshot
+            states[f"session-{session.id}"] = state
+        requests = [analysis_request(state) for state in states.values()]
+        stats.submitted += len(requests)
+        results = client.chat_batch(
+            requests, poll_interval=poll_interval, timeout=timeout
+        )
+        for custom_id, state in states.items():
+            apply_result(state, results.get(custom_id), stats)
+    return stats
+
+
+def apply_result(
+    state: AnalyzeState, result: dict | Exception | None, stats: BatchAnalysisStats
+) -> None:
+    if result is None or isinstance(result, Exception):
+        stats.failed += 1
+        logger.warning(
+            f"Batch analysis of session {state.session.id} failed: "
+            f"{result or 'no result'}"
+        )
+        return
+    model = result.get("model") or state.role.default_model
+    state.role.last_result = result
+    state.record_usage(model)
+    _, ok = state.accept_output(result["content"], model)
+    if not ok:
+        stats.invalid += 1
+        return
+    with transaction.atomic():
+        updated = state.persist_state(state.session.state)
+    if updated:
+        stats.analyzed += 1
+    else:
+        stats.skipped += 1
@@ -0,0 +1,317 @@
+import re
+import threading
+from dataclasses import dataclass
+
+from apps.restaurant.models import CustomerProfile
+from apps.restaurant.services.menu import MenuSnapshot
+from apps.restaurant.services.menu import menu_index
+from libs.text import normalize_phrase
+
+DietaryPreference = CustomerProfile.DietaryPreference
+
+MEAT_WORDS = frozenset(
+    {
+        "anchovy",
+        "bacon",
+        "beef",
+        "brisket",
+        "burger",
+        "cheeseburger",
+        "chicken",
+        "chorizo",
+        "clam",
+        "crab",
+        "duck",
+        "fish",
+        "ham",
+        "hamburger",
+        "lamb",
+        "lobster",
+        "meat",
+        "meatball",
+        "mussel",
+        "octopus",
+        "oyster",
+        "pancetta",
+        "pepperoni",
+        "pork",
+        "prawn",
+        "prosciutto",
+        "ribs",
+        "salami",
+        "salmon",
+        "sausage",
+        "scallop",
+        "seafood",
+        "shrimp",
+        "squid",
+        "steak",
+        "tuna",
+        "turkey",
+        "veal",
+        "venison",
+        "wings",
+    }
+)
+# Animal products a vegetarian may eat but a vegan may not
+ANIMAL_PRODUCT_WORDS = frozenset(
+    {
+        "butter",
+        "cheddar",
+        "cheese",
+        "cream",
+        "dairy",
+        "egg",
+        "feta",
+        "gelatin",
+        "ghee",
+        "honey",
+        "mayo",
+        "milk",
+        "mozzarella",
+        "omelette",
+        "parmesan",
+        "ranch",
+        "ricotta",
+        "yogurt",
+    }
+)
+# Ingredients that are often, but not always, made with animal products
+MAYBE_ANIMAL_WORDS = frozenset(
+    {"bread", "bun", "croutons", "muffin", "pasta", "pastry", "pizza"}
+)
+# A leading word that turns a meat or dairy word into a plant-based food,
+# e.g. "vegan mayo", "coconut milk", "portobello steak"
+PLANT_QUALIFIERS = frozenset(
+    {
+        "almond",
+        "beyond",
+        "cauliflower",
+        "coconut",
+        "fake",
+        "faux",
+        "impossible",
+        "jackfruit",
+        "meatless",
+        "mock",
+        "mushroom",
+        "oat",
+        "plant-based",
+        "portobello",
+        "seitan",
+        "soy",
+        "tempeh",
+        "tofu",
+        "vegan",
+        "vegetarian",
+        "veggie",
+    }
+)
+
+_WORD = re.compile(r"[a-z]+(?:-[a-z]+)*")
+_DECLARED = re.compile(
+    r"\b(?:i am|i'm|i’m|im)\s+(?:a\s+)?(?:strict\s+|committed\s+|lifelong\s+)?"
+    r"(vegan|vegetarian)\b"
+)
+_NO_MEAT = re.compile(r"\bi (?:don't|do not|never) eat (?:any )?meat\b")
+# Foods after one of these in the same clause are ones the customer avoids
+# ("I never eat fish", "no fish sauce", "allergic to eggs")
+_NEGATION = re.compile(
+    r"\b(?:no|not|nor|never|without|avoid|allergic|cannot"
+    r"|(?:do|does|did|ca|wo)n['’]?t)\b"
+)
+_CLAUSE_BREAK = re.compile(r"[.,;:!?\n]|\bbut\b")
+
+
+_FOOD_WORDS = MEAT_WORDS | ANIMAL_PRODUCT_WORDS
+
+
+def singular(word: str) -> str:
+    if word.endswith("s") and word[:-1] in _FOOD_WORDS:
+        return word[:-1]
+    return word
+
+
+@dataclass(frozen=True, slots=True)
+class FoodMentions:
+    meat: list[str]
+    animal_products: list[str]
+    # Meat or dairy words preceded by a plant qualifier ("vegan cheese")
+    qualified: list[str]
+    # Meat or dairy words in a negated clause ("I never eat fish")
+    negated: list[str]
+
+
+def find_food_words(text: str) -> FoodMentions:
+    meat, animal, qualified, negated = [], [], [], []
+    for clause in _CLAUSE_BREAK.split(text.lower()):
+        negation = _NEGATION.search(clause)
+        negated_from = negation.end() if negation else len(clause)
+        words = [(m.start(), singular(m.group())) for m in _WORD.finditer(clause)]
+        for i, (start, word) in enumerate(words):
+            if word not in _FOOD_WORDS:
+                continue
+            if start >= negated_from:
+                negated.append(word)
+            elif any(
+                previous in PLANT_QUALIFIERS for _, previous in words[max(0, i - 2) : i]
+            ):
+                qualified.append(word)
+            elif word in MEAT_WORDS:
+                meat.append(word)
+            else:
+                animal.append(word)
+    return FoodMentions(
+        meat=meat, animal_products=animal, qualified=qualified, negated=negated
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class DishDiet:
+    name: str
+    meat: tuple[str, ...]
+    animal_products: tuple[str, ...]
+    maybe_animal: tuple[str, ...]
+
+
+def classify_dish(name: str, ingredients: tuple[str, ...]) -> DishDiet:
+    meat, animal, maybe = [], [], []
+    for ingredient in ingredients:
+        words = _WORD.findall(ingredient.lower())
+        if not words or words[0] in PLANT_QUALIFIERS:
+            continue
+        words = [singular(word) for word in words]
+        if any(word in MEAT_WORDS for word in words):
+            meat.append(ingredient)
+        elif any(word in ANIMAL_PRODUCT_WORDS for word in words):
+            animal.append(ingredient)
+        elif any(word in MAYBE_ANIMAL_WORDS for word in words):
+            maybe.append(ingredient)
+    return DishDiet(name, tuple(meat), tuple(animal), tuple(maybe))
+
+
+class MenuDietIndex:
+    """Diet of every menu dish, derived from its ingredients."""
+
+    def __init__(self, snapshot: MenuSnapshot) -> None:
+        self.version = snapshot.version
+        self.names = menu_index(snapshot)
+        self.dishes = {
+            name: classify_dish(name, ingredients)
+            for name, ingredients in snapshot.dishes
+        }
+
+    def find_ordered(self, text: str) -> tuple[list[DishDiet], str]:
+        """Menu dishes named in ``text``, and the normalized ``text`` without
+        those names.
+        """
+        rest = list(normalize_phrase(text))
+        ordered: dict[str, DishDiet] = {}
+        for match in self.names.matcher.find_all(text):
+            ordered.setdefault(match.value, self.dishes[match.value])
+            rest[match.start : match.end] = " " * (match.end - match.start)
+        return list(ordered.values()), "".join(rest)
+
+    def find_negated(self, text: str) -> list[str]:
+        """Menu dishes named after a negation in their clause ("I don't want
+        the Roast Duck").
+        """
+        negated: dict[str, None] = {}
+        for clause in _CLAUSE_BREAK.split(text.lower()):
+            negation = _NEGATION.search(clause)
+            if negation is None:
+                continue
+            for match in self.names.matcher.find_all(clause[negation.end() :]):
+                negated.setdefault(match.value)
+        return list(negated)
+
+
+_index: MenuDietIndex | None = None
+_index_lock = threading.Lock()
+
+
+def menu_diet_index(snapshot: MenuSnapshot) -> MenuDietIndex:
+    global _index
+    index = _index
+    if index is None or index.version != snapshot.version:
+        with _index_lock:
+            index = _index
+            if index is None or index.version != snapshot.version:
+                index = _index = MenuDietIndex(snapshot)
+    return index
+
+
+def preclassify(
+    snapshot: MenuSnapshot,
+    *,
+    favorite_text: str,
+    order_text: str,
+    favorite_dishes: list[str],
+) -> dict | None:
+    """Classify unambiguous dialogs without the LLM.
+
+    Returns an ``AnalyzeResultSerializer`` payload, or ``None`` whenever the
+    rules are not clear-cut: conflicting evidence, plant-qualified meat or
+    dairy words ("vegan cheese"), negated foods or dishes ("no fish sauce",
+    "I don't want the Roast Duck"), or no evidence at all. The rules mirror
+    the analysis prompt: meat anywhere means non-vegetarian, otherwise only
+    an explicit "I'm vegan/vegetarian" settles the preference.
+    """
+    index = menu_diet_index(snapshot)
+    if index.find_negated(order_text):
+        return None
+    ordered, order_rest = index.find_ordered(order_text)
+    texts = find_food_words(f"{favorite_text}\n{order_rest}")
+    if texts.qualified:
+        return None
+
+    conversation = f"{favorite_text}\n{order_text}".lower()
+    declared = _DECLARED.search(conversation)
+    declared_diet = declared.group(1) if declared else None
+    no_meat = _NO_MEAT.search(conversation) is not None
+    if declared_diet is None and no_meat:
+        declared_diet = DietaryPreference.VEGETARIAN
+    # Avoided foods are not evidence either way, except the "meat" of an
+    # explicit "I don't eat meat"
+    if [word for word in texts.negated if not (no_meat and word == "meat")]:
+        return None
+
+    meat_dishes = [dish for dish in ordered if dish.meat]
+    ordered_names = [dish.name for dish in ordered]
+
+    def result(preference: str, confidence: int, evidence: str) -> dict:
+        return {
+            "dietary_preference": preference,
+            "confidence_percent": confidence,
+            "evidence": evidence,
+            "ordered_dishes": ordered_names,
+            "favorite_dishes": list(favorite_dishes),
+        }
+
+    if meat_dishes or texts.meat:
+        if declared_diet is not None:
+            return None
+        if meat_dishes:
+            dish = meat_dishes[0]
+            return result(
+                DietaryPreference.NON_VEGETARIAN,
+                100,
+                f"{dish.name} ({', '.join(dish.meat)}) -> non-vegetarian",
+            )
+        # A mention alone is weaker than an ordered dish: below the default
+        # MIN_CONFIDENCE, so it only settles the dialog when configured to
+        return result(
+            DietaryPreference.NON_VEGETARIAN,
+            85,
+            f"mentions {', '.join(dict.fromkeys(texts.meat))} -> non-vegetarian",
+        )
+
+    if declared_diet == DietaryPreference.VEGAN:
+        if texts.animal_products or any(
+            dish.animal_products or dish.maybe_animal for dish in ordered
+        ):
+            return None
+        return result(DietaryPreference.VEGAN, 90, "states they are vegan")
+    if declared_diet == DietaryPreference.VEGETARIAN:
+        return result(DietaryPreference.VEGETARIAN, 90, "states they are vegetarian")
+    return None
@@ -0,0 +1,162 @@
+import fcntl
+import os
+import tempfile
+import threading
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+from django.db import connections
+from loguru import logger
+
+from apps.restaurant.models import PooledGreeting
+
+
+class GreetingPool:
+    """Database-backed pool of pre-generated, validated waiter greetings.
+
+    Greetings are grouped by ``prompt_key`` (a hash of the greeting prompt) so
+    a prompt or persona change never serves stale text. ``pop`` deletes the
+    row it hands out, so a greeting is never reused. ``refill`` tops the pool
+    up to ``high_watermark``, usually from the ``refill_greeting_pool``
+    command. With ``background_refill``, a pop that leaves fewer than
+    ``low_watermark`` greetings starts a refill thread; an exclusive lock on
+    ``lock_path`` keeps it to one such thread per host.
+    """
+
+    # Rows another worker deletes first are skipped; give up after a few races
+    max_pop_races = 3
+
+    def __init__(
+        self,
+        *,
+        low_watermark: int = 20,
+        high_watermark: int = 100,
+        background_refill: bool = False,
+        lock_path: str | Path | None = None,
+    ) -> None:
+        if not 0 <= low_watermark <= high_watermark:
+            raise ValueError("low_watermark must be between 0 and high_watermark")
+        self.low_watermark = low_watermark
+        self.high_watermark = high_watermark
+        self.background_refill = background_refill
+        self.lock_path = str(
+            lock_path or Path(tempfile.gettempdir()) / "restaurant-greeting-refill"
+        )
+
+    @classmethod
+    def from_settings(cls) -> "GreetingPool | None":
+        config = getattr(settings, "RESTAURANT_GREETING_POOL", {})
+        if not config.get("ENABLED", False):
+            return None
+        return cls(
+            low_watermark=config.get("LOW_WATERMARK", 20),
+            high_watermark=config.get("HIGH_WATERMARK", 100),
+            background_refill=config.get("BACKGROUND_REFILL", False),
+            lock_path=config.get("LOCK_PATH") or None,
+        )
+
+    def size(self, prompt_key: str) -> int:
+        return PooledGreeting.objects.filter(prompt_key=prompt_key).count()
+
+    def is_low(self, prompt_key: str) -> bool:
+        """Whether fewer than ``low_watermark`` greetings are left; reads at
+        most one row instead of counting the pool.
+        """
+        if not self.low_watermark:
+            return False
+        return not (
+            PooledGreeting.objects.filter(prompt_key=prompt_key)
+            .order_by("id")[self.low_watermark - 1 :]
+            .exists()
+        )
+
+    def push(self, prompt_key: str, contents: list[str]) -> None:
+        PooledGreeting.objects.bulk_create(
+            [PooledGreeting(prompt_key=prompt_key, content=c) for c in contents]
+        )
+
+    def pop(self, prompt_key: str) -> str | None:
+        for _ in range(self.max_pop_races):
+            greeting = (
+                PooledGreeting.objects.filter(prompt_key=prompt_key)
+                .order_by("id")
+                .only("id", "content")
+                .first()
+            )
+            if greeting is None:
+                return None
+            deleted, _ = PooledGreeting.objects.filter(id=greeting.id).delete()
+            if deleted:
+                return greeting.content
+        return None
+
+    def refill(self, state_factory: Callable[[], Any]) -> int:
+        """Generate greetings until the pool reaches ``high_watermark``.
+
+        ``state_factory`` returns a greeting state that generates live, i.e.
+        without popping from this pool.
+        """
+        state = state_factory()
+        prompt_key = state.prompt_key()
+        missing = self.high_watermark - self.size(prompt_key)
+        contents = []
+        for _ in range(max(missing, 0)):
+            output, ok = state_factory().generate_validated()
+            if ok:
+                contents.append(output)
+        # Another refill may have topped the pool up meanwhile
+        contents = contents[: max(self.high_watermark - self.size(prompt_key), 0)]
+        if contents:
+            self.push(prompt_key, contents)
+        return len(contents)
+
+    def maybe_refill(self, prompt_key: str, state_factory: Callable[[], Any]) -> None:
+        if not self.background_refill or not self.is_low(prompt_key):
+            return
+        lock = self._try_lock()
+        if lock is None:
+            # Another thread or worker on this host is already refilling
+            return
+        threading.Thread(
+            target=self._refill_in_background,
+            args=(state_factory, lock),
+            name="greeting-pool-refill",
+            daemon=True,
+        ).start()
+
+    def _try_lock(self) -> int | None:
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        return fd
+
+    def _refill_in_background(
+        self, state_factory: Callable[[], Any], lock: int
+    ) -> None:
+        try:
+            added = self.refill(state_factory)
+            logger.info(f"Greeting pool refilled with {added} greetings")
+        except Exception as e:
+            logger.error(f"Greeting pool refill failed with {e=}")
+        finally:
+            connections.close_all()
+            # Closing the descriptor releases the lock
+            os.close(lock)
+
+
+_greeting_pool: GreetingPool | None = None
+_greeting_pool_lock = threading.Lock()
+
+
+def get_greeting_pool() -> GreetingPool | None:
+    global _greeting_pool
+    if _greeting_pool is None:
+        with _greeting_pool_lock:
+            if _greeting_pool is None:
+                _greeting_pool = GreetingPool.from_settings()
+    return _greeting_pool
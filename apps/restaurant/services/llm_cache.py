@@ -0,0 +1,41 @@
+import threading
+
+from django.conf import settings
+
+from apps.restaurant.services.llm_pool import get_llm_client
+from libs.clients.llm_client.caching import CachingLLMClient
+from libs.clients.llm_client.caching import SQLiteCacheStore
+from libs.clients.llm_client.coalescing import CoalescingLLMClient
+from libs.clients.llm_client.interface import LLMClient
+
+_cached_client: LLMClient | None = None
+_cached_client_lock = threading.Lock()
+
+
+def build_cached_client() -> LLMClient:
+    config = getattr(settings, "RESTAURANT_LLM_CACHE", {})
+    client = get_llm_client()
+    if getattr(settings, "RESTAURANT_LLM_COALESCE", False):
+        # Under the cache, so concurrent misses of one key make one call
+        client = CoalescingLLMClient(client)
+    if not config.get("ENABLED", False):
+        return client
+    path = config.get("PATH")
+    return CachingLLMClient(
+        client,
+        max_entries=config.get("MAX_ENTRIES", 1024),
+        ttl=config.get("TTL", 3600.0),
+        store=SQLiteCacheStore(path) if path else None,
+        # Only outputs the state validated, see ``RestaurantRole.confirm_result``
+        validated_only=True,
+    )
+
+
+def get_cached_client() -> LLMClient:
+    """Process-wide client for deterministic calls (e.g. dialog analysis)."""
+    global _cached_client
+    if _cached_client is None:
+        with _cached_client_lock:
+            if _cached_client is None:
+                _cached_client = build_cached_client()
+    return _cached_client
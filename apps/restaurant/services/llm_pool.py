@@ -0,0 +1,89 @@
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any
+
+import httpx
+from django.conf import settings
+
+from libs.clients.llm_client.providers.openai_client import RETRYABLE_ERRORS
+from libs.clients.llm_client.providers.openai_client import OpenAIClient
+from libs.clients.llm_client.rate_limit import FileBucketStore
+from libs.clients.llm_client.rate_limit import RateLimiter
+from libs.clients.llm_client.registry import client_registry
+from libs.clients.llm_client.retry import CircuitBreaker
+from libs.clients.llm_client.retry import RetryPolicy
+
+_rate_limiter: RateLimiter | None = None
+_rate_limiter_lock = threading.Lock()
+
+
+def build_rate_limiter() -> RateLimiter | None:
+    config = getattr(settings, "RESTAURANT_LLM_RATE_LIMIT", {})
+    requests = config.get("REQUESTS_PER_MINUTE", 0)
+    tokens = config.get("TOKENS_PER_MINUTE", 0)
+    if not requests and not tokens:
+        return None
+    path = config.get("PATH") or Path(tempfile.gettempdir()) / "restaurant-llm-quota"
+    return RateLimiter(
+        requests_per_minute=requests,
+        tokens_per_minute=tokens,
+        burst_seconds=config.get("BURST_SECONDS", 10.0),
+        store=FileBucketStore(path),
+    )
+
+
+def get_rate_limiter() -> RateLimiter | None:
+    """Host-wide LLM quota limiter, or ``None`` when no limit is set."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = build_rate_limiter()
+    return _rate_limiter
+
+
+def build_retry_policy() -> RetryPolicy:
+    config = getattr(settings, "RESTAURANT_LLM_RETRY", {})
+    return RetryPolicy(
+        max_attempts=config.get("MAX_ATTEMPTS", 3),
+        base_delay=config.get("BASE_DELAY", 0.5),
+        max_delay=config.get("MAX_DELAY", 20.0),
+        deadline=config.get("DEADLINE", 60.0),
+        retry_on=RETRYABLE_ERRORS,
+    )
+
+
+def build_circuit_breaker() -> CircuitBreaker | None:
+    config = getattr(settings, "RESTAURANT_LLM_CIRCUIT_BREAKER", {})
+    if not config.get("ENABLED", False):
+        return None
+    return CircuitBreaker(
+        failure_threshold=config.get("FAILURE_THRESHOLD", 5),
+        reset_timeout=config.get("RESET_TIMEOUT", 30.0),
+    )
+
+
+def build_client_options() -> dict[str, Any]:
+    config = getattr(settings, "RESTAURANT_LLM_POOL", {})
+    return {
+        "limits": httpx.Limits(
+            max_connections=config.get("MAX_CONNECTIONS", 100),
+            max_keepalive_connections=config.get("MAX_KEEPALIVE_CONNECTIONS", 20),
+            keepalive_expiry=config.get("KEEPALIVE_EXPIRY", 30.0),
+        ),
+        "rate_limiter": get_rate_limiter(),
+        "retry_policy": build_retry_policy(),
+        "circuit_breaker": build_circuit_breaker(),
+    }
+
+
+def get_llm_client() -> OpenAIClient:
+    """Process-wide provider client, pooled as ``RESTAURANT_LLM_POOL`` says,
+    admitted by ``get_rate_limiter()`` and retried per ``RESTAURANT_LLM_RETRY``.
+    The options are only built when the shared client is created.
+    """
+    config = getattr(settings, "RESTAURANT_LLM_POOL", {})
+    return client_registry.openai(
+        timeout=config.get("TIMEOUT"), build_options=build_client_options
+    )
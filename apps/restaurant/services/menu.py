@@ -0,0 +1,161 @@
+import threading
+import uuid
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+
+from apps.restaurant.models import Dish
+from apps.restaurant.models import MenuVersion
+from libs.text import AhoCorasick
+from libs.text import normalize_phrase
+
+MENU_VERSION_ID = 1
+
+
+@dataclass(frozen=True, slots=True)
+class MenuSnapshot:
+    version: str
+    # "- name: description" lines, shown to the customer when ordering
+    order_menu: str
+    # "- name, description, ingredients" lines, used for the dialog analysis
+    analysis_menu: str
+    # (name, ingredients) of every dish, in menu order
+    dishes: tuple[tuple[str, tuple[str, ...]], ...] = ()
+
+
+def current_menu_version() -> str:
+    return (
+        MenuVersion.objects.filter(id=MENU_VERSION_ID)
+        .values_list("token", flat=True)
+        .first()
+        or ""
+    )
+
+
+def bump_menu_version() -> str:
+    """Give the menu a new version so every worker rebuilds its snapshot.
+
+    A random token rather than a counter keeps a rolled back or restored row
+    from ever matching a snapshot built from other data.
+    """
+    token = uuid.uuid4().hex
+    MenuVersion.objects.update_or_create(id=MENU_VERSION_ID, defaults={"token": token})
+    return token
+
+
+def render_order_menu(dishes) -> str:
+    return "\n".join([f"- {name}: {description}" for name, description in dishes])
+
+
+def render_analysis_menu(dishes) -> str:
+    return "\n".join(
+        [
+            f"- {name}, {description}, {ingredients}"
+            for name, description, ingredients in dishes
+        ]
+    )
+
+
+class MenuCache:
+    """Per-process cache of the rendered menu strings.
+
+    ``get`` costs one primary-key lookup of the menu version while the
+    snapshot is fresh; the ``Dish`` table is only read again after the
+    version changes.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._snapshot: MenuSnapshot | None = None
+
+    def get(self) -> MenuSnapshot:
+        version = current_menu_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._snapshot = self.build(version)
+        return snapshot
+
+    async def aget(self) -> MenuSnapshot:
+        return await sync_to_async(self.get)()
+
+    @staticmethod
+    def build(version: str) -> MenuSnapshot:
+        # Tagged with the version read before the dishes, so a change landing
+        # in between only causes one extra rebuild on the next call
+        dishes = list(
+            Dish.objects.order_by("id").values_list(
+                "name", "description", "ingredients"
+            )
+        )
+        return MenuSnapshot(
+            version=version,
+            order_menu=render_order_menu(
+                (name, description) for name, description, _ in dishes
+            ),
+            analysis_menu=render_analysis_menu(dishes),
+            dishes=tuple(
+                (name, tuple(ingredients or ())) for name, _, ingredients in dishes
+            ),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+
+menu_cache = MenuCache()
+
+
+class MenuIndex:
+    """Dish-name matcher for one menu version.
+
+    Matching is case-, accent- and punctuation-insensitive and linear in the
+    text length regardless of menu size (see ``AhoCorasick``).
+    """
+
+    def __init__(self, snapshot: MenuSnapshot) -> None:
+        self.version = snapshot.version
+        names = [name for name, _ in snapshot.dishes]
+        self.matcher = AhoCorasick((name, name) for name in names)
+        self._by_key = {normalize_phrase(name): name for name in names}
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def canonical(self, name: str) -> str | None:
+        return self._by_key.get(normalize_phrase(name))
+
+    def extract(self, text: str) -> list[str]:
+        """Menu dishes named in ``text``, in order of first mention."""
+        return list(dict.fromkeys(m.value for m in self.matcher.find_all(text)))
+
+    def reconcile(self, names: list[str]) -> list[str]:
+        """Correct an LLM-extracted dish list against the menu.
+
+        Listed names that are on the menu are kept in their canonical
+        spelling and original order; names not on the menu and repeats are
+        dropped. Dishes the order text merely mentions are not added, since
+        the customer may have named them only to turn them down.
+        """
+        listed = (self.canonical(name) for name in names)
+        return list(dict.fromkeys(name for name in listed if name is not None))
+
+
+_menu_index: MenuIndex | None = None
+_menu_index_lock = threading.Lock()
+
+
+def menu_index(snapshot: MenuSnapshot) -> MenuIndex:
+    """``MenuIndex`` of ``snapshot``, rebuilt once per menu version."""
+    global _menu_index
+    index = _menu_index
+    if index is None or index.version != snapshot.version:
+        with _menu_index_lock:
+            index = _menu_index
+            if index is None or index.version != snapshot.version:
+                index = _menu_index = MenuIndex(snapshot)
+    return index
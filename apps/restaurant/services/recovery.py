@@ -0,0 +1,126 @@
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models import QuerySet
+from django.utils import timezone
+from loguru import logger
+
+from apps.restaurant.fsm.machine import DialogStateMachine
+from apps.restaurant.fsm.scheduler import DialogScheduler
+from apps.restaurant.fsm.scheduler import SchedulerStats
+from apps.restaurant.models import DialogSession
+
+OrderState = DialogSession.CustomerOrderState
+
+# Non-terminal states a dialog only reaches once it has made progress; INIT
+# sessions may still be queued for a scheduler run, so they are never claimed
+ACTIVE_STATES = [
+    state
+    for state in OrderState
+    if state != OrderState.INIT
+    and DialogStateMachine.table.next_trigger(state) is not None
+]
+
+
+def max_resume_attempts() -> int:
+    return getattr(settings, "RESTAURANT_DIALOG_MAX_RESUME_ATTEMPTS", 3)
+
+
+def stalled_sessions(older_than: timedelta) -> QuerySet[DialogSession]:
+    """Sessions left in one of ``ACTIVE_STATES`` without progress for
+    ``older_than``.
+
+    Sessions already resumed ``RESTAURANT_DIALOG_MAX_RESUME_ATTEMPTS`` times
+    without progress are left out; see ``abandoned_sessions``.
+    """
+    return DialogSession.objects.filter(
+        state__in=ACTIVE_STATES,
+        updated_at__lt=timezone.now() - older_than,
+        resume_attempts__lt=max_resume_attempts(),
+    ).order_by("updated_at")
+
+
+def abandoned_sessions() -> QuerySet[DialogSession]:
+    """Non-terminal sessions recovery gave up on after repeated failed resumes."""
+    return DialogSession.objects.filter(
+        state__in=ACTIVE_STATES,
+        resume_attempts__gte=max_resume_attempts(),
+    )
+
+
+def claim_session(session: DialogSession) -> bool:
+    """Claim a stalled session for this worker.
+
+    The claim is a compare-and-set on ``(id, state, updated_at)`` that bumps
+    ``updated_at``, so a concurrent sweeper that read the same row loses the
+    race and the session stops looking stalled until the threshold passes
+    again.
+    """
+    return bool(
+        DialogSession.objects.filter(
+            id=session.id,
+            state=session.state,
+            updated_at=session.updated_at,
+        ).update(updated_at=timezone.now(), resume_attempts=F("resume_attempts") + 1)
+    )
+
+
+def claim_stalled_sessions(
+    older_than: timedelta, limit: int | None = None
+) -> list[DialogSession]:
+    """Claim up to ``limit`` stalled sessions with a single UPDATE.
+
+    Candidate rows are locked with ``SKIP LOCKED`` where the database
+    supports it, so concurrent sweepers pick disjoint batches. The UPDATE
+    re-applies the stalled filter and stamps the rows with this sweep's
+    ``updated_at``, which is how the claimed rows are read back: a row
+    another sweeper claimed first no longer matches either.
+    """
+    claimed_at = timezone.now()
+    with transaction.atomic():
+        candidates = stalled_sessions(older_than).select_for_update(skip_locked=True)
+        if limit is not None:
+            candidates = candidates[:limit]
+        ids = list(candidates.values_list("id", flat=True))
+        if not ids:
+            return []
+        stalled_sessions(older_than).filter(id__in=ids).update(
+            updated_at=claimed_at, resume_attempts=F("resume_attempts") + 1
+        )
+    return list(
+        DialogSession.objects.filter(id__in=ids, updated_at=claimed_at).order_by("id")
+    )
+
+
+async def resume_sessions(
+    sessions: list[DialogSession], concurrency: int = 5
+) -> SchedulerStats:
+    """Re-drive claimed sessions from their persisted state."""
+    scheduler = DialogScheduler(concurrency=concurrency)
+    return await scheduler.run(sessions)
+
+
+async def asweep_stalled_sessions(
+    older_than: timedelta,
+    *,
+    limit: int | None = None,
+    concurrency: int = 5,
+) -> SchedulerStats:
+    sessions = await sync_to_async(claim_stalled_sessions)(older_than, limit)
+    logger.info(f"Claimed {len(sessions)} stalled dialog sessions")
+    return await resume_sessions(sessions, concurrency=concurrency)
+
+
+def sweep_stalled_sessions(
+    older_than: timedelta,
+    *,
+    limit: int | None = None,
+    concurrency: int = 5,
+) -> SchedulerStats:
+    return asyncio.run(
+        asweep_stalled_sessions(older_than, limit=limit, concurrency=concurrency)
+    )
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from apps.restaurant.models import Dish
+from apps.restaurant.services.menu import bump_menu_version
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+def invalidate_menu_snapshot(sender, instance, **kwargs):
+    bump_menu_version()
@@ -0,0 +1,98 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.management import CommandError
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.restaurant.fsm.instrumentation import LLM_CALL
+from apps.restaurant.fsm.instrumentation import LOCK_WAIT
+from apps.restaurant.fsm.instrumentation import PERSIST
+from apps.restaurant.fsm.instrumentation import PROMPT_BUILD
+from apps.restaurant.fsm.instrumentation import VALIDATION
+from apps.restaurant.fsm.instrumentation import Histogram
+from apps.restaurant.fsm.instrumentation import JsonLinesExporter
+from apps.restaurant.fsm.instrumentation import transition_metrics
+from apps.restaurant.fsm.machine import DialogStateMachine
+from apps.restaurant.fsm.routing import model_router
+from apps.restaurant.fsm.states import GreetingState
+from apps.restaurant.models.dialog_session import DialogSession
+from apps.restaurant.roles.base import RestaurantRole
+
+
+class TestTransitionMetrics(TestCase):
+    def setUp(self):
+        transition_metrics.reset()
+        self.addCleanup(transition_metrics.reset)
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram()
+        for seconds in [0.002] * 90 + [0.3] * 9 + [4.0]:
+            histogram.observe(seconds)
+
+        assert histogram.quantile(0.5) == 0.005
+        assert histogram.quantile(0.95) == 0.5
+        assert histogram.quantile(0.99) == 0.5
+        assert histogram.summary()["max"] == 4.0
+
+    def test_transition_records_every_phase(self):
+        with patch.object(
+            RestaurantRole, "chat", return_value="Welcome to Cosmos! How are you?"
+        ):
+            session = DialogSession.objects.create(customer_id=0)
+            assert DialogStateMachine(session).safe_trigger("start_greeting")
+
+        rows = {row["phase"]: row for row in transition_metrics.snapshot()}
+        assert set(rows) == {PROMPT_BUILD, LLM_CALL, VALIDATION, LOCK_WAIT, PERSIST}
+        assert all(row["state"] == "greeting" for row in rows.values())
+        assert all(row["count"] == 1 for row in rows.values())
+        assert rows[LLM_CALL]["model"]
+
+    def test_persist_timings_carry_the_generation_model(self):
+        session = DialogSession.objects.create(customer_id=0)
+        with (
+            patch.object(model_router, "choose", return_value="routed-model"),
+            patch.object(
+                RestaurantRole, "chat", return_value="Welcome to Cosmos! How are you?"
+            ),
+        ):
+            assert DialogStateMachine(session).safe_trigger("start_greeting")
+
+        rows = transition_metrics.snapshot()
+        assert {row["phase"] for row in rows} >= {LOCK_WAIT, PERSIST}
+        assert {row["model"] for row in rows} == {"routed-model"}
+
+    def test_batched_flush_carries_the_generation_model(self):
+        session = DialogSession.objects.create(customer_id=0)
+        state = GreetingState(session, use_pool=False)
+        state.model = "routed-model"
+
+        DialogStateMachine(session).flush(session, session.state, [state])
+
+        (row,) = transition_metrics.snapshot()
+        assert (row["phase"], row["model"]) == (PERSIST, "routed-model")
+
+    def test_exported_samples_feed_latency_report(self):
+        path = Path(tempfile.mkdtemp()) / "latency.jsonl"
+        exporter = JsonLinesExporter(path)
+        with patch.object(transition_metrics, "exporters", [exporter]):
+            transition_metrics.observe(LLM_CALL, "greeting", "gpt", 0.2)
+            transition_metrics.observe(LLM_CALL, "greeting", "gpt", 0.4)
+
+        samples = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [s["seconds"] for s in samples] == [0.2, 0.4]
+
+        out = StringIO()
+        call_command("fsm_latency_report", file=str(path), stdout=out)
+        lines = out.getvalue().splitlines()
+        assert len(lines) == 2
+        assert lines[1].split()[:4] == ["greeting", LLM_CALL, "gpt", "2"]
+
+    def test_latency_report_names_the_exporter_when_there_are_no_samples(self):
+        path = Path(tempfile.mkdtemp()) / "missing.jsonl"
+
+        with self.assertRaisesMessage(CommandError, "JsonLinesExporter"):
+            call_command("fsm_latency_report", file=str(path))
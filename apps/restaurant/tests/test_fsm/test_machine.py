@@ -1,13 +1,36 @@
 # ruff: noqa: E501
+from unittest.mock import AsyncMock
 from unittest.mock import patch
 
+from asgiref.sync import sync_to_async
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from apps.restaurant.fsm.exceptions import StateConflictError
 from apps.restaurant.fsm.machine import DialogStateMachine
 from apps.restaurant.models.dialog_session import DialogSession
 from apps.restaurant.roles.base import RestaurantRole
 from core.auth.utils.factories import UserFactory
 
+DIALOG_OUTPUTS = [
+    "Welcome to Cosmos! How has your day been?",
+    "I'm doing well today and enjoyed some time reading in the afternoon.",
+    "Could you share your top 3 favorite foods?",
+    "I love sushi for freshness, pasta for rich sauces, and falafel because it's hearty.",
+    "What would you like to order today from our menu?",
+    "I'll have Roasted Seasonal Veggies and Mushroom Risotto because they sound delicious.",
+    '{"dietary_preference":"vegetarian","confidence_percent":80,"evidence":"mentions of veggies and no meat","ordered_dishes":["Roasted Seasonal Veggies","Mushroom Risotto"],"favorite_dishes":["sushi","pasta","falafel"]}',
+]
+
+ROW_FIELDS = [
+    "state",
+    "messages",
+    "analysis_result",
+    "customer_favorite_text",
+    "customer_order_text",
+]
+
 
 class TestDialogStateMachine(TestCase):
     def test_machine_greeting(self):
@@ -208,3 +231,151 @@ class TestDialogStateMachine(TestCase):
                 "unknown",
             }
             assert mock_chat.call_count == 7
+
+    def test_machine_rejects_invalid_trigger(self):
+        with patch.object(RestaurantRole, "chat") as mock_chat:
+            session = DialogSession.objects.create(customer_id=0)
+            machine = DialogStateMachine.from_session(session)
+
+            assert not machine.safe_trigger("receive_day_reply")
+            assert not machine.safe_trigger("unknown_trigger")
+            assert not machine.may_trigger("run_analysis")
+            assert machine.may_trigger("start_greeting")
+
+            session.refresh_from_db()
+            assert machine.current_state == DialogSession.CustomerOrderState.INIT
+            assert session.state == DialogSession.CustomerOrderState.INIT
+            mock_chat.assert_not_called()
+
+    def test_machines_share_transition_table(self):
+        first = DialogStateMachine(DialogSession(customer_id=0))
+        second = DialogStateMachine(DialogSession(customer_id=0))
+
+        assert first.table is second.table
+        assert first.state_index == 0
+
+    async def test_machine_async_dialog(self):
+        outputs = DIALOG_OUTPUTS
+
+        with (
+            patch.object(
+                RestaurantRole, "achat", new_callable=AsyncMock, side_effect=outputs
+            ) as mock_achat,
+            patch.object(RestaurantRole, "chat") as mock_chat,
+        ):
+            user = await sync_to_async(UserFactory)()
+            customer_id = await sync_to_async(lambda: user.customer.id)()
+            session = await DialogSession.objects.acreate(customer_id=customer_id)
+            machine = DialogStateMachine.from_session(session)
+
+            for trigger in [
+                "start_greeting",
+                "receive_day_reply",
+                "proceed_to_ask_favorites",
+                "receive_favorites_reply",
+                "proceed_to_ask_order",
+                "receive_order_reply",
+                "run_analysis",
+            ]:
+                assert await machine.asafe_trigger(trigger)
+            assert not await machine.asafe_trigger("run_analysis")
+
+            await session.arefresh_from_db()
+            assert session.state == DialogSession.CustomerOrderState.ANALYZE
+            assert len(session.messages) == 6
+            assert session.customer_order_text == outputs[5]
+            assert session.analysis_result["dietary_preference"] == "vegetarian"
+            assert mock_achat.await_count == 7
+            mock_chat.assert_not_called()
+
+    def test_machine_two_phase_commit(self):
+        outputs = [
+            "Welcome to Cosmos! How has your day been?",
+            "I'm doing well today and enjoyed some time reading in the afternoon.",
+        ]
+
+        with patch.object(RestaurantRole, "chat", side_effect=outputs):
+            session = DialogSession.objects.create(customer_id=0)
+            machine = DialogStateMachine.from_session(session, two_phase=True)
+
+            assert machine.safe_trigger("start_greeting")
+            assert machine.safe_trigger("receive_day_reply")
+
+            session.refresh_from_db()
+            assert session.state == DialogSession.CustomerOrderState.DAY_REPLY
+            assert [m["content"] for m in session.messages] == outputs
+
+    def test_machine_two_phase_conflict(self):
+        session = DialogSession.objects.create(customer_id=0)
+
+        def concurrent_writer(**kwargs):
+            DialogSession.objects.filter(id=session.id).update(
+                state=DialogSession.CustomerOrderState.GREETING,
+                messages=[{"role": "waiter", "content": "Hello from elsewhere?"}],
+            )
+            return "Welcome to Cosmos! How has your day been?"
+
+        with patch.object(RestaurantRole, "chat", side_effect=concurrent_writer):
+            machine = DialogStateMachine.from_session(session, two_phase=True)
+
+            with self.assertRaises(StateConflictError):
+                machine.safe_trigger("start_greeting")
+
+            assert machine.current_state == DialogSession.CustomerOrderState.INIT
+            session.refresh_from_db()
+            assert session.messages[0]["content"] == "Hello from elsewhere?"
+
+    def _session_updates(self, queries) -> int:
+        return sum(
+            1
+            for query in queries
+            if query["sql"].startswith('UPDATE "restaurant_conversation_session"')
+        )
+
+    def test_run_to_completion_matches_step_by_step(self):
+        user = UserFactory()
+        with patch.object(RestaurantRole, "chat", side_effect=DIALOG_OUTPUTS):
+            stepped = DialogSession.objects.create(customer_id=user.customer.id)
+            machine = DialogStateMachine.from_session(stepped)
+            while (trigger := machine.table.next_trigger(machine.state)) is not None:
+                assert machine.safe_trigger(trigger)
+
+        with patch.object(RestaurantRole, "chat", side_effect=DIALOG_OUTPUTS):
+            batched = DialogSession.objects.create(customer_id=user.customer.id)
+            with CaptureQueriesContext(connection) as ctx:
+                machine = DialogStateMachine.run_to_completion(batched, checkpoint=None)
+
+        stepped.refresh_from_db()
+        batched.refresh_from_db()
+        assert machine.current_state == DialogSession.CustomerOrderState.ANALYZE
+        for field in ROW_FIELDS:
+            assert getattr(batched, field) == getattr(stepped, field), field
+        assert self._session_updates(ctx.captured_queries) == 1
+        user.customer.refresh_from_db()
+        assert user.customer.dietary_preference == "vegetarian"
+
+    def test_run_to_completion_checkpoints(self):
+        user = UserFactory()
+        with patch.object(RestaurantRole, "chat", side_effect=DIALOG_OUTPUTS):
+            session = DialogSession.objects.create(customer_id=user.customer.id)
+            with CaptureQueriesContext(connection) as ctx:
+                DialogStateMachine.run_to_completion(session, checkpoint=3)
+
+        session.refresh_from_db()
+        assert session.state == DialogSession.CustomerOrderState.ANALYZE
+        assert len(session.messages) == 6
+        assert self._session_updates(ctx.captured_queries) == 3
+
+    def test_run_to_completion_keeps_progress_on_failure(self):
+        outputs = [*DIALOG_OUTPUTS[:2], *["Line one\nline two"] * 3]
+        with patch.object(RestaurantRole, "chat", side_effect=outputs):
+            session = DialogSession.objects.create(customer_id=0)
+            machine = DialogStateMachine(session)
+
+            with self.assertRaises(RuntimeError):
+                machine.run(checkpoint=None)
+
+        session.refresh_from_db()
+        assert machine.current_state == DialogSession.CustomerOrderState.DAY_REPLY
+        assert session.state == DialogSession.CustomerOrderState.DAY_REPLY
+        assert [m["content"] for m in session.messages] == DIALOG_OUTPUTS[:2]
@@ -0,0 +1,122 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.restaurant.fsm.counters import prompt_cache_counters
+from apps.restaurant.fsm.prompts import PromptTemplate
+from apps.restaurant.fsm.states import AnalyzeState
+from apps.restaurant.fsm.states import AnswerFavoritesState
+from apps.restaurant.fsm.states import GreetingState
+from apps.restaurant.fsm.states import ReplyGreetingState
+from apps.restaurant.fsm.states import ReplyOrderState
+from apps.restaurant.fsm.states import state_registry
+from apps.restaurant.models import DialogSession
+from apps.restaurant.roles.customer import CustomerRole
+
+
+class TestPromptTemplate(TestCase):
+    def test_static_text_is_normalized_at_compile_time(self):
+        template = PromptTemplate(
+            """
+            # Role
+            {persona}\t\t
+
+            # Task
+                1. Nested item.
+
+
+
+            Done.
+            """
+        )
+
+        assert (
+            template.text == "# Role\n{persona}\n\n# Task\n    1. Nested item.\n\nDone."
+        )
+        assert template.fields == {"persona"}
+        assert template.render(persona="\n    A waiter.\n    Warm.\n") == (
+            "# Role\nA waiter.\nWarm.\n\n# Task\n    1. Nested item.\n\nDone."
+        )
+
+    def test_missing_value_raises(self):
+        with self.assertRaises(KeyError):
+            PromptTemplate("{menu}").render()
+
+    def test_states_compile_once_per_class(self):
+        session = DialogSession(customer_id=0, messages=[])
+
+        assert GreetingState(session).compiled_prompt is GreetingState.compiled_prompt
+        for state_class in state_registry.values():
+            prompt = state_class(session).system_prompt()
+            assert prompt == prompt.strip()
+            assert "\n# Strict Rules\n1. " in prompt
+
+    def test_analyze_prompt_keeps_rule_indentation(self):
+        prompt = AnalyzeState(DialogSession(customer_id=0)).system_prompt(menu="")
+
+        assert '\n1. Extract "favorite_dishes":\n    a. Locate' in prompt
+
+    def test_prompt_token_report_covers_every_state(self):
+        out = StringIO()
+        call_command("prompt_token_report", stdout=out)
+
+        lines = out.getvalue().splitlines()
+        assert len(lines) == len(state_registry) + 1
+        for line in lines[1:]:
+            _, _, source, compiled, _, request = line.split()
+            assert int(compiled) < int(source) < int(request) + int(source)
+
+
+class FakeClient:
+    def chat(self, *, model, messages, **kwargs):
+        return {
+            "content": "Welcome to Cosmos! How are you?",
+            "model": model,
+            "usage": {
+                "prompt_tokens": 1200,
+                "prompt_tokens_details": {"cached_tokens": 1024},
+            },
+        }
+
+
+class TestPromptLayout(TestCase):
+    def setUp(self):
+        self.session = DialogSession(customer_id=0, messages=[])
+        prompt_cache_counters.reset()
+        self.addCleanup(prompt_cache_counters.reset)
+
+    @override_settings(RESTAURANT_PROMPT_LAYOUT="prefix")
+    def test_prefix_layout_puts_shared_sections_first(self):
+        order = ReplyOrderState(self.session).system_prompt(menu="- Soup: Hot")
+        persona = CustomerRole().persona_messages.split("\n")[1].strip()
+
+        assert order.startswith(f"# Role\n{persona}")
+        assert order.index("# Restaurant Menu") < order.index("# Task")
+
+        # Per-call values (the random day status) go after the static rules
+        day_reply = ReplyGreetingState(self.session).system_prompt()
+        assert day_reply.index("# Strict Rules") < day_reply.index("# Task")
+
+        favorites = AnswerFavoritesState(self.session).system_prompt()
+        shared = favorites[: favorites.index("\n\n# Task")]
+        assert order.startswith(shared)
+        assert day_reply.startswith(shared)
+
+    def test_inline_layout_keeps_authored_order(self):
+        order = ReplyOrderState(self.session).system_prompt(menu="- Soup: Hot")
+
+        assert order.index("# Task") < order.index("# Restaurant Menu")
+
+    def test_cached_tokens_recorded_per_state(self):
+        state = GreetingState(self.session, use_pool=False)
+        state.role._client = FakeClient()
+
+        state.generate()
+        state.generate()
+
+        totals = prompt_cache_counters.snapshot()[("greeting", "gpt-4o")]
+        assert totals["calls"] == 2
+        assert totals["cached_tokens"] == 2048
+        assert totals["hit_rate"] == 1024 / 1200
@@ -0,0 +1,117 @@
+import random
+
+from django.test import TestCase
+
+from apps.restaurant.fsm.routing import ANY_STATE
+from apps.restaurant.fsm.routing import ModelRouter
+from apps.restaurant.fsm.routing import model_router
+from apps.restaurant.fsm.states import ReplyGreetingState
+from apps.restaurant.models import DialogSession
+from apps.restaurant.roles.customer import CustomerRole
+
+
+class FakeClient:
+    def __init__(self, replies):
+        self.replies = replies
+        self.models = []
+
+    def chat(self, *, model, **kwargs):
+        self.models.append(model)
+        return {"content": self.replies[model], "model": model}
+
+
+def warm(router, state, model, seconds, ok=True, count=5):
+    for _ in range(count):
+        router.observe(state, model, seconds, ok)
+
+
+class TestModelRouter(TestCase):
+    def router(self, **kwargs):
+        return ModelRouter(
+            {"greeting": ["mini", "large"], ANY_STATE: ["large"]},
+            min_samples=5,
+            explore_rate=0.0,
+            rng=random.Random(0),
+            **kwargs,
+        )
+
+    def test_states_without_candidates_keep_the_role_model(self):
+        assert ModelRouter().choose("greeting") is None
+        assert self.router().choose("analyze") == "large"
+
+    def test_warms_candidates_in_order(self):
+        router = self.router()
+
+        assert router.choose("greeting") == "mini"
+        warm(router, "greeting", "mini", 1.0, ok=False)
+        assert router.choose("greeting") == "large"
+
+    def test_fastest_model_within_the_failure_slo_wins(self):
+        router = self.router(max_failure_rate=0.2)
+        warm(router, "greeting", "mini", 0.4)
+        warm(router, "greeting", "large", 1.5)
+        assert router.choose("greeting") == "mini"
+
+        # Failures push the fast model over the SLO
+        warm(router, "greeting", "mini", 0.4, ok=False, count=2)
+        assert router.choose("greeting") == "large"
+
+    def test_least_failing_model_when_none_meets_the_slo(self):
+        router = self.router(max_failure_rate=0.0)
+        warm(router, "greeting", "mini", 0.4, ok=False)
+        warm(router, "greeting", "large", 1.5, ok=False, count=2)
+        warm(router, "greeting", "large", 1.5, count=3)
+
+        assert router.choose("greeting") == "large"
+
+    def test_rolling_window_forgets_old_calls(self):
+        router = self.router(window=5)
+        warm(router, "greeting", "mini", 9.0, ok=False)
+        warm(router, "greeting", "mini", 0.2)
+
+        assert router.snapshot() == [
+            {
+                "state": "greeting",
+                "model": "mini",
+                "count": 5,
+                "p50": 0.2,
+                "p95": 0.2,
+                "failure_rate": 0.0,
+            }
+        ]
+
+    def test_exploration_tries_other_candidates(self):
+        router = self.router()
+        router.explore_rate = 1.0
+        warm(router, "greeting", "mini", 0.4)
+        warm(router, "greeting", "large", 1.5)
+
+        assert router.choose("greeting") == "large"
+
+
+class TestStateRouting(TestCase):
+    def setUp(self):
+        model_router.configure(
+            {"day_reply": ["mini", "large"]}, min_samples=2, explore_rate=0.0
+        )
+        self.addCleanup(model_router.configure, None)
+
+    def test_validation_failures_shift_traffic(self):
+        client = FakeClient(
+            {
+                "mini": "Pretty good, and yours?",
+                "large": "Pretty good, thank you.",
+            }
+        )
+        state = ReplyGreetingState(
+            DialogSession(customer_id=0, messages=[]), CustomerRole(client=client)
+        )
+
+        for _ in range(3):
+            state.generate_validated()
+
+        # The first dialog's retries already move on to the other model
+        assert client.models == ["mini", "mini", "large", "large", "large"]
+        stats = {row["model"]: row for row in model_router.snapshot()}
+        assert stats["mini"]["failure_rate"] == 1.0
+        assert stats["large"]["count"] == 3
@@ -0,0 +1,60 @@
+# ruff: noqa: E501
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+
+from apps.restaurant.fsm.scheduler import DialogScheduler
+from apps.restaurant.models.dialog_session import DialogSession
+from apps.restaurant.roles.base import RestaurantRole
+from core.auth.utils.factories import UserFactory
+
+ANALYSIS = '{"dietary_preference":"vegan","confidence_percent":90,"evidence":"plant-based order","ordered_dishes":["Vegan Ramen"],"favorite_dishes":["tofu"]}'
+
+
+def fake_reply(*, messages, response_format=None, **kwargs):
+    if response_format == "json":
+        return ANALYSIS
+    if "Greeting new customers" in messages[0]["content"]:
+        return "Welcome to Cosmos! How has your day been?"
+    return "That sounds lovely, thank you for sharing."
+
+
+class TestDialogScheduler(TestCase):
+    async def test_scheduler_completes_all_sessions(self):
+        user = await sync_to_async(UserFactory)()
+        customer_id = await sync_to_async(lambda: user.customer.id)()
+        sessions = [
+            await DialogSession.objects.acreate(customer_id=customer_id)
+            for _ in range(3)
+        ]
+
+        with patch.object(
+            RestaurantRole, "achat", new_callable=AsyncMock, side_effect=fake_reply
+        ) as mock_achat:
+            scheduler = DialogScheduler(concurrency=2, state_concurrency=1)
+            stats = await scheduler.run(sessions)
+
+        assert stats.completed == 3
+        assert stats.failed == 0
+        assert stats.transitions[DialogSession.CustomerOrderState.INIT] == 3
+        assert mock_achat.await_count == 21
+        async for session in DialogSession.objects.filter(
+            id__in=[s.id for s in sessions]
+        ):
+            assert session.state == DialogSession.CustomerOrderState.ANALYZE
+            assert len(session.messages) == 6
+
+    async def test_scheduler_reports_failed_sessions(self):
+        session = await DialogSession.objects.acreate(customer_id=0)
+
+        with patch.object(
+            RestaurantRole, "achat", new_callable=AsyncMock, return_value="No question"
+        ):
+            stats = await DialogScheduler(concurrency=1).run([session])
+
+        assert stats.completed == 0
+        assert stats.failed == 1
+        await session.arefresh_from_db()
+        assert session.state == DialogSession.CustomerOrderState.INIT
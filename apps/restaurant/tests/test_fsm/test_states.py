@@ -0,0 +1,156 @@
+# ruff: noqa: E501
+from concurrent.futures import Future
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.restaurant.fsm.counters import attempt_counters
+from apps.restaurant.fsm.machine import DialogStateMachine
+from apps.restaurant.fsm.states import GreetingState
+from apps.restaurant.fsm.states import ReplyGreetingState
+from apps.restaurant.models.dialog_session import DialogSession
+from apps.restaurant.roles.base import RestaurantRole
+from core.auth.utils.factories import UserFactory
+
+
+class TestStateRegeneration(TestCase):
+    def setUp(self):
+        attempt_counters.reset()
+
+    def test_regenerates_until_output_is_valid(self):
+        outputs = [
+            "Welcome to Cosmos!",
+            "Welcome to Cosmos! How has your day been?",
+        ]
+        with patch.object(RestaurantRole, "chat", side_effect=outputs) as mock_chat:
+            session = DialogSession.objects.create(customer_id=0)
+            machine = DialogStateMachine.from_session(session)
+
+            assert machine.safe_trigger("start_greeting")
+
+        session.refresh_from_db()
+        assert session.messages[0]["content"] == outputs[1]
+        assert mock_chat.call_count == 2
+        assert attempt_counters.snapshot()[GreetingState.state] == {
+            "attempts": {2: 1},
+            "exhausted": 0,
+        }
+
+    def test_stops_after_max_attempts(self):
+        session = DialogSession(customer_id=0, messages=[])
+        state = ReplyGreetingState(session)
+        with patch.object(
+            RestaurantRole, "chat", return_value="How are you?"
+        ) as mock_chat:
+            output, ok = state.generate_validated()
+
+        assert not ok
+        assert state.attempts == state.max_attempts
+        assert mock_chat.call_count == state.max_attempts
+        assert attempt_counters.snapshot()[ReplyGreetingState.state]["exhausted"] == 1
+
+    def test_bumps_temperature_per_retry(self):
+        session = DialogSession(customer_id=0, messages=[])
+        state = ReplyGreetingState(session)
+        state.temperature_step = 0.25
+        with patch.object(
+            RestaurantRole, "chat", return_value="How are you?"
+        ) as mock_chat:
+            state.generate_validated(temperature=0.5)
+
+        temperatures = [call.kwargs["temperature"] for call in mock_chat.call_args_list]
+        assert temperatures == [0.5, 0.75, 1.0]
+
+    def test_respects_wall_clock_budget(self):
+        session = DialogSession(customer_id=0, messages=[])
+        state = ReplyGreetingState(session)
+        state.attempt_budget = 0
+        with patch.object(
+            RestaurantRole, "chat", return_value="How are you?"
+        ) as mock_chat:
+            _, ok = state.generate_validated()
+
+        assert not ok
+        assert mock_chat.call_count == 1
+
+
+FAVORITES = '{"favorite_dishes":["sushi","pasta","falafel"]}'
+ANALYSIS = '{"dietary_preference":"non-vegetarian","confidence_percent":90,"evidence":"sushi","ordered_dishes":[],"favorite_dishes":["sushi"]}'
+
+
+def dispatch_reply(*, messages, response_format=None, **kwargs):
+    system_prompt = messages[0]["content"]
+    if "Find all phrases" in system_prompt:
+        return FAVORITES
+    if response_format == "json":
+        return ANALYSIS
+    if "Greeting new customers" in system_prompt:
+        return "Welcome to Cosmos! How has your day been?"
+    return "That sounds lovely, thank you for sharing."
+
+
+@override_settings(RESTAURANT_FSM_SIDE_TASKS=True)
+class TestSideTasks(TestCase):
+    def test_analysis_merges_precomputed_favorites(self):
+        user = UserFactory()
+        with patch.object(
+            RestaurantRole, "chat", side_effect=dispatch_reply
+        ) as mock_chat:
+            session = DialogSession.objects.create(customer_id=user.customer.id)
+            DialogStateMachine.run_to_completion(session)
+
+        session.refresh_from_db()
+        assert session.analysis_result["favorite_dishes"] == [
+            "sushi",
+            "pasta",
+            "falafel",
+        ]
+        analysis_call = mock_chat.call_args_list[-1]
+        assert analysis_call.kwargs["response_format"] == "json"
+        prompt = analysis_call.kwargs["messages"][-1]["content"]
+        assert "Customer's Favorite Dishes:" in prompt
+        assert mock_chat.call_count == 8
+
+    def test_analysis_falls_back_when_side_task_fails(self):
+        def failing_favorites(**kwargs):
+            if "Find all phrases" in kwargs["messages"][0]["content"]:
+                return "not json"
+            return dispatch_reply(**kwargs)
+
+        user = UserFactory()
+        with patch.object(RestaurantRole, "chat", side_effect=failing_favorites):
+            session = DialogSession.objects.create(customer_id=user.customer.id)
+            DialogStateMachine.run_to_completion(session)
+
+        session.refresh_from_db()
+        assert session.state == DialogSession.CustomerOrderState.ANALYZE
+        assert session.analysis_result["favorite_dishes"] == ["sushi"]
+
+    def test_side_tasks_are_awaited_outside_the_transaction(self):
+        depths = []
+
+        class RecordingFuture(Future):
+            def result(self, timeout=None):
+                depths.append(len(connection.atomic_blocks))
+                return super().result(timeout)
+
+        future = RecordingFuture()
+        future.set_result(["sushi", "pasta"])
+        session = DialogSession.objects.create(
+            customer_id=UserFactory().customer.id,
+            state=DialogSession.CustomerOrderState.ORDER_REPLY,
+            customer_favorite_text="I love sushi and pasta.",
+            customer_order_text="Just water.",
+        )
+        machine = DialogStateMachine(session)
+        machine.side_results["favorite_dishes"] = (future, 1.0)
+        outer = len(connection.atomic_blocks)
+
+        with patch.object(RestaurantRole, "chat", side_effect=dispatch_reply):
+            assert machine.safe_trigger("run_analysis")
+
+        assert depths == [outer]
+        session.refresh_from_db()
+        assert session.analysis_result["favorite_dishes"] == ["sushi", "pasta"]
@@ -0,0 +1,82 @@
+from django.test import TestCase
+
+from apps.restaurant.roles.context import DialogContextBuilder
+from apps.restaurant.roles.context import extract_facts
+from apps.restaurant.roles.customer import CustomerRole
+from apps.restaurant.roles.waiter import WaiterRole
+from libs.clients.llm_client.tokens import REPLY_PRIMER
+from libs.clients.llm_client.tokens import count_message_tokens
+
+OPENING = [
+    {"role": "waiter", "content": "Welcome to Cosmos! How has your day been?"},
+    {
+        "role": "customer",
+        "content": "It was a rough day and I am exhausted. Work went wrong twice.",
+    },
+    {"role": "waiter", "content": "Could you share your top 3 favorite foods?"},
+    {
+        "role": "customer",
+        "content": "I love sushi, pasta and falafel. They all remind me of travel.",
+    },
+]
+
+
+def long_dialog(turns: int) -> list[dict]:
+    dialog = list(OPENING)
+    for i in range(turns):
+        dialog.append({"role": "waiter", "content": f"Anything else for you, {i}?"})
+        dialog.append(
+            {
+                "role": "customer",
+                "content": f"Just some more water please, round {i}. Thank you!",
+            }
+        )
+    return dialog
+
+
+class TestDialogContextBuilder(TestCase):
+    def test_short_dialog_is_replayed_verbatim(self):
+        role = WaiterRole(context_tokens=1000)
+
+        messages = role.build_context([], OPENING)
+
+        assert [m["content"] for m in messages] == [m["content"] for m in OPENING]
+
+    def test_older_turns_compacted_into_facts(self):
+        compacted = DialogContextBuilder(token_budget=120).compact(long_dialog(20))
+
+        assert compacted.recent[-1]["content"].endswith("round 19. Thank you!")
+        assert len(compacted.recent) >= 2
+        assert len(compacted.recent) < 44
+
+    def test_facts_keep_mood_and_favorites(self):
+        facts = extract_facts(OPENING)
+
+        assert facts == [
+            "Customer's day: bad",
+            "Customer's favorite foods: I love sushi, pasta and falafel. "
+            "They all remind me of travel.",
+        ]
+
+    def test_order_reply_is_not_read_as_a_day_mood(self):
+        facts = extract_facts(
+            [
+                {"role": "waiter", "content": "What would you like to order today?"},
+                {"role": "customer", "content": "The Roast Duck, please."},
+            ]
+        )
+
+        assert facts == ["Customer said: The Roast Duck, please."]
+
+    def test_prompt_size_stays_flat(self):
+        role = CustomerRole(context_tokens=200)
+
+        def size(turns: int) -> int:
+            return count_message_tokens(role.build_context([], long_dialog(turns)))
+
+        assert size(10) <= 200 + REPLY_PRIMER
+        assert size(200) <= 200 + REPLY_PRIMER
+        messages = role.build_context([], long_dialog(200))
+        assert messages[0]["role"] == "developer"
+        assert messages[0]["content"].startswith("Earlier in this conversation:")
+        assert "Customer's day: bad" in messages[0]["content"]
@@ -0,0 +1,111 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.restaurant.fsm.states import ReplyGreetingState
+from apps.restaurant.models import DialogSession
+from apps.restaurant.roles.base import GenerationAborted
+from apps.restaurant.roles.customer import CustomerRole
+from apps.restaurant.serializers.output_validate import StreamGuard
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.sent = []
+        self.closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.sent.append(chunk)
+            yield chunk
+
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.close()
+
+    def result(self):
+        return {"content": "".join(self.sent), "usage": None}
+
+
+class FakeStreamingClient:
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.streams = []
+
+    def chat(self, **kwargs):
+        raise AssertionError("guarded calls should stream")
+
+    def stream_chat(self, **kwargs):
+        stream = FakeStream(self.replies.pop(0))
+        self.streams.append(stream)
+        return stream
+
+    async def astream_chat(self, **kwargs):
+        return self.stream_chat(**kwargs)
+
+
+class TestStreamGuard(TestCase):
+    def test_question_mark_is_a_certain_violation(self):
+        guard = StreamGuard(forbid_question_mark=True)
+
+        assert guard.feed("Great, thanks") is None
+        assert guard.feed("! And you?") == "text should not contain question marks"
+
+    def test_newline_needs_text_on_both_sides(self):
+        guard = StreamGuard(forbid_newline=True)
+
+        assert guard.feed("\n  Fine, thanks.") is None
+        assert guard.feed("\n \n") is None
+        assert guard.feed(" Really.") == "text should be single line"
+
+    def test_only_context_rules_that_can_fail_early_build_a_guard(self):
+        assert StreamGuard.from_context({"forbid_wrapped_quotes": True}) is None
+        assert StreamGuard.from_context({"forbid_newline": True}).forbid_newline
+
+
+class TestStreamingChat(TestCase):
+    def test_violation_cancels_the_stream(self):
+        client = FakeStreamingClient(["Fine", ", and you", "?", " I am hungry."])
+        role = CustomerRole(client=client)
+
+        with self.assertRaises(GenerationAborted) as aborted:
+            role.chat(messages=[], stream_guard=StreamGuard(forbid_question_mark=True))
+
+        assert aborted.exception.text == "Fine, and you?"
+        assert client.streams[0].sent == ["Fine", ", and you", "?"]
+        assert client.streams[0].closed
+
+    def test_async_stream_keeps_valid_reply(self):
+        client = FakeStreamingClient(["Fine,", " thanks.\n"])
+        role = CustomerRole(client=client)
+
+        text = async_to_sync(role.achat)(
+            messages=[], stream_guard=StreamGuard(forbid_newline=True)
+        )
+
+        assert text == "Fine, thanks.\n"
+        assert role.last_result["content"] == text
+        assert client.streams[0].closed
+
+    @override_settings(RESTAURANT_LLM_STREAMING=True)
+    def test_aborted_reply_is_retried(self):
+        client = FakeStreamingClient(
+            ["It was good", ", and yours?", " Tell me!"],
+            ["It was ", "a lovely day."],
+        )
+        state = ReplyGreetingState(
+            DialogSession(customer_id=0, messages=[]), CustomerRole(client=client)
+        )
+
+        output, ok = state.generate_validated()
+
+        assert (output, ok) == ("It was a lovely day.", True)
+        assert state.attempts == 2
+        assert client.streams[0].sent == ["It was good", ", and yours?"]
@@ -0,0 +1,106 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.restaurant.models import DialogSession
+from apps.restaurant.models import Dish
+from apps.restaurant.services.batch_analysis import analyze_sessions
+from core.auth.utils.factories import UserFactory
+from libs.clients.llm_client.local_batch import LocalBatchServer
+from libs.clients.llm_client.local_batch import echo_completion
+from libs.clients.llm_client.providers.openai_client import OpenAIClient
+
+OrderState = DialogSession.CustomerOrderState
+
+
+def analyze(body):
+    order = body["messages"][-1]["content"]
+    if "unreadable" in order:
+        return echo_completion({**body, "messages": [{"content": "not json"}]})
+    ordered = ["Roast Duck"] if "Roast Duck" in order else []
+    analysis = {
+        "dietary_preference": "non-vegetarian" if ordered else "unknown",
+        "confidence_percent": 100 if ordered else 0,
+        "evidence": "Roast Duck -> non-vegetarian" if ordered else "",
+        "ordered_dishes": ordered,
+        "favorite_dishes": ["sushi"],
+    }
+    return echo_completion({**body, "messages": [{"content": json.dumps(analysis)}]})
+
+
+class TestBatchAnalysis(TestCase):
+    def setUp(self):
+        Dish.objects.create(name="Roast Duck", description="Duck", ingredients=["duck"])
+        self.server = LocalBatchServer(analyze).start()
+        self.addCleanup(self.server.stop)
+        self.client = OpenAIClient(api_key="test", base_url=self.server.base_url)
+        self.customer = UserFactory().customer
+
+    def create_session(self, state, order_text):
+        return DialogSession.objects.create(
+            customer=self.customer,
+            state=state,
+            customer_favorite_text="I love sushi.",
+            customer_order_text=order_text,
+        )
+
+    def test_results_are_persisted_like_live_analysis(self):
+        pending = self.create_session(OrderState.ORDER_REPLY, "The Roast Duck, please.")
+        done = self.create_session(OrderState.ANALYZE, "Just water.")
+        broken = self.create_session(OrderState.ANALYZE, "Something unreadable.")
+
+        stats = analyze_sessions(
+            DialogSession.objects.order_by("id"), self.client, poll_interval=0
+        )
+
+        assert (stats.submitted, stats.analyzed, stats.invalid) == (3, 2, 1)
+        pending.refresh_from_db()
+        assert pending.state == OrderState.ANALYZE
+        assert pending.analysis_result["ordered_dishes"] == ["Roast Duck"]
+        done.refresh_from_db()
+        assert done.analysis_result["dietary_preference"] == "unknown"
+        broken.refresh_from_db()
+        assert broken.analysis_result == {}
+        self.customer.refresh_from_db()
+        assert self.customer.favorite_dishes == ["sushi"]
+
+    def test_sessions_are_split_into_jobs(self):
+        for _ in range(3):
+            self.create_session(OrderState.ANALYZE, "The Roast Duck, please.")
+
+        stats = analyze_sessions(
+            DialogSession.objects.order_by("id"),
+            self.client,
+            batch_size=2,
+            poll_interval=0,
+        )
+
+        assert stats.analyzed == 3
+        assert len(self.server.batches) == 2
+
+    def test_command_analyzes_selected_sessions(self):
+        session = self.create_session(OrderState.ORDER_REPLY, "The Roast Duck, please.")
+        self.create_session(OrderState.ASK_ORDER, "")
+        out = StringIO()
+
+        call_command("batch_analyze", "--dry-run", stdout=out)
+        with patch(
+            "apps.restaurant.management.commands.batch_analyze.get_llm_client",
+            return_value=self.client,
+        ):
+            call_command(
+                "batch_analyze",
+                "--session",
+                str(session.id),
+                "--poll-interval",
+                "0.01",
+                stdout=out,
+            )
+
+        assert "sessions to analyze: 1" in out.getvalue()
+        assert "analyzed=1" in out.getvalue()
+        session.refresh_from_db()
+        assert session.state == OrderState.ANALYZE
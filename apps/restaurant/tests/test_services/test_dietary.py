@@ -0,0 +1,146 @@
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.test import override_settings
+
+from apps.restaurant.fsm.side_tasks import FavoritesExtractionTask
+from apps.restaurant.fsm.states import AnalyzeState
+from apps.restaurant.models import DialogSession
+from apps.restaurant.models import Dish
+from apps.restaurant.roles.base import RestaurantRole
+from apps.restaurant.services.dietary import preclassify
+from apps.restaurant.services.menu import MenuSnapshot
+
+SNAPSHOT = MenuSnapshot(
+    version="test",
+    order_menu="",
+    analysis_menu="",
+    dishes=(
+        ("Roast Duck", ("duck", "orange sauce")),
+        ("Vegan Ramen", ("noodles", "tofu", "vegan broth")),
+        ("Vegetable Omelette", ("egg", "vegetables")),
+        ("Roasted Seasonal Veggies", ("seasonal vegetables", "garlic")),
+        ("Grilled Portobello Steak", ("portobello", "olive oil")),
+        ("Veggie Burger", ("plant-based patty", "bun", "vegan mayo")),
+    ),
+)
+
+
+def classify(favorite_text, order_text, favorite_dishes=()):
+    return preclassify(
+        SNAPSHOT,
+        favorite_text=favorite_text,
+        order_text=order_text,
+        favorite_dishes=list(favorite_dishes),
+    )
+
+
+class TestPreclassify(TestCase):
+    def test_meat_dish_in_order_is_non_vegetarian(self):
+        result = classify(
+            "I love salads and soups.",
+            "I'll have the Roast Duck and Roasted Seasonal Veggies.",
+            ["salads", "soups"],
+        )
+
+        assert result["dietary_preference"] == "non-vegetarian"
+        assert result["confidence_percent"] == 100
+        assert result["ordered_dishes"] == ["Roast Duck", "Roasted Seasonal Veggies"]
+        assert result["favorite_dishes"] == ["salads", "soups"]
+        assert "Roast Duck" in result["evidence"]
+
+    def test_declared_vegan_with_vegan_order(self):
+        result = classify(
+            "I'm a strict vegan and love tofu.", "The Vegan Ramen, please."
+        )
+
+        assert result["dietary_preference"] == "vegan"
+        assert result["ordered_dishes"] == ["Vegan Ramen"]
+
+    def test_ambiguous_dialogs_fall_back(self):
+        # Sushi may or may not be fish; nothing settles the preference
+        assert (
+            classify(
+                "I love sushi for freshness, pasta for rich sauces, and falafel.",
+                "I'll have Roasted Seasonal Veggies and Mushroom Risotto.",
+            )
+            is None
+        )
+        # Declared vegan but orders eggs
+        assert classify("I'm vegan.", "Vegetable Omelette please.") is None
+        # Declared vegetarian but mentions meat
+        assert classify("I'm vegetarian, though I miss bacon.", "Vegan Ramen") is None
+        # Plant-based versions of meat or dairy words
+        assert classify("I adore vegan cheese and mock chicken.", "Vegan Ramen") is None
+
+    def test_avoided_foods_are_not_evidence(self):
+        assert classify("I never eat chicken or fish.", "Vegan Ramen") is None
+        assert (
+            classify("I love salads.", "Grilled Tofu Salad, no fish sauce please")
+            is None
+        )
+        assert classify("I'm allergic to shrimp.", "Vegan Ramen") is None
+        assert (
+            classify(
+                "I love salads.",
+                "I don't want the Roast Duck, I'll have the Roasted Seasonal Veggies.",
+            )
+            is None
+        )
+        # "I don't eat meat" stays a declaration
+        assert classify("I don't eat meat.", "Vegan Ramen")["dietary_preference"] == (
+            "vegetarian"
+        )
+
+    def test_meat_mentioned_only_in_text_is_below_the_threshold(self):
+        result = classify("I love bacon.", "Roasted Seasonal Veggies please.")
+
+        assert result["dietary_preference"] == "non-vegetarian"
+        assert result["confidence_percent"] < 90
+
+    def test_dish_names_are_not_read_as_ingredients(self):
+        assert classify("I love curries.", "Grilled Portobello Steak please.") is None
+        assert classify("I'm vegan.", "Veggie Burger please.") is None
+
+
+@override_settings(
+    RESTAURANT_DIETARY_PRECLASSIFIER={"ENABLED": True, "MIN_CONFIDENCE": 90}
+)
+class TestAnalyzeStatePreclassifier(TestCase):
+    def setUp(self):
+        Dish.objects.create(name="Roast Duck", description="Duck", ingredients=["duck"])
+        self.session = DialogSession.objects.create(
+            customer_id=0,
+            customer_favorite_text="I love sushi and ramen.",
+            customer_order_text="The Roast Duck, please.",
+        )
+
+    def analyze_state(self):
+        state = AnalyzeState(self.session)
+        state.partials[FavoritesExtractionTask.name] = ["sushi", "ramen"]
+        return state
+
+    def test_confident_result_skips_the_llm(self):
+        with patch.object(RestaurantRole, "chat") as mock_chat:
+            output, ok = self.analyze_state().generate_validated()
+
+        assert ok
+        mock_chat.assert_not_called()
+        assert output["dietary_preference"] == "non-vegetarian"
+        assert output["favorite_dishes"] == ["sushi", "ramen"]
+
+    @override_settings(
+        RESTAURANT_DIETARY_PRECLASSIFIER={"ENABLED": True, "MIN_CONFIDENCE": 101}
+    )
+    def test_low_confidence_falls_back_to_llm(self):
+        analysis = (
+            '{"dietary_preference":"non-vegetarian","confidence_percent":90,'
+            '"evidence":"duck","ordered_dishes":["Roast Duck"],'
+            '"favorite_dishes":["sushi","ramen"]}'
+        )
+        with patch.object(RestaurantRole, "chat", return_value=analysis) as mock_chat:
+            output, ok = self.analyze_state().generate_validated()
+
+        assert ok
+        mock_chat.assert_called_once()
+        assert output["confidence_percent"] == 90
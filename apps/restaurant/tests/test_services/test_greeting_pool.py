@@ -0,0 +1,96 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from apps.restaurant.fsm.machine import DialogStateMachine
+from apps.restaurant.fsm.states import GreetingState
+from apps.restaurant.models import DialogSession
+from apps.restaurant.models import PooledGreeting
+from apps.restaurant.roles.base import RestaurantRole
+from apps.restaurant.services.greeting_pool import GreetingPool
+
+GREETING = "Welcome to Cosmos! How has your day been?"
+
+
+class TestGreetingPool(TestCase):
+    def setUp(self):
+        self.pool = GreetingPool(
+            low_watermark=1, high_watermark=3, background_refill=False
+        )
+
+    def test_pop_never_reuses_greetings(self):
+        self.pool.push("key", ["first?", "second?"])
+
+        assert self.pool.pop("key") == "first?"
+        assert self.pool.pop("key") == "second?"
+        assert self.pool.pop("key") is None
+        assert self.pool.pop("other") is None
+
+    def test_refill_tops_up_to_high_watermark(self):
+        prompt_key = GreetingState.live().prompt_key()
+        self.pool.push(prompt_key, [GREETING])
+
+        with patch.object(RestaurantRole, "chat", return_value=GREETING) as mock_chat:
+            added = self.pool.refill(GreetingState.live)
+
+        assert added == 2
+        assert mock_chat.call_count == 2
+        assert self.pool.size(prompt_key) == 3
+
+    def test_low_watermark_check(self):
+        pool = GreetingPool(low_watermark=2, high_watermark=3)
+        pool.push("key", ["first?"])
+        assert pool.is_low("key")
+
+        pool.push("key", ["second?"])
+        assert not pool.is_low("key")
+
+    def test_one_background_refill_per_host(self):
+        lock_path = Path(tempfile.mkdtemp()) / "refill.lock"
+        pool = GreetingPool(
+            low_watermark=1,
+            high_watermark=3,
+            background_refill=True,
+            lock_path=lock_path,
+        )
+        # Another worker holds the refill lock
+        other = GreetingPool(lock_path=lock_path)._try_lock()
+
+        with patch("apps.restaurant.services.greeting_pool.threading.Thread") as thread:
+            pool.maybe_refill("key", GreetingState.live)
+        thread.assert_not_called()
+
+        os.close(other)
+        with patch("apps.restaurant.services.greeting_pool.threading.Thread") as thread:
+            pool.maybe_refill("key", GreetingState.live)
+        thread.assert_called_once()
+        os.close(thread.call_args.kwargs["args"][1])
+
+    def test_greeting_state_serves_from_pool(self):
+        prompt_key = GreetingState.live().prompt_key()
+        self.pool.push(prompt_key, ["Hello there, how is your day going?"])
+
+        with (
+            patch(
+                "apps.restaurant.fsm.states.get_greeting_pool", return_value=self.pool
+            ),
+            patch.object(RestaurantRole, "chat", return_value=GREETING) as mock_chat,
+        ):
+            session = DialogSession.objects.create(customer_id=0)
+            machine = DialogStateMachine.from_session(session)
+            assert machine.safe_trigger("start_greeting")
+
+            second = DialogSession.objects.create(customer_id=0)
+            assert DialogStateMachine.from_session(second).safe_trigger(
+                "start_greeting"
+            )
+
+        session.refresh_from_db()
+        second.refresh_from_db()
+        assert session.messages[0]["content"] == "Hello there, how is your day going?"
+        assert second.messages[0]["content"] == GREETING
+        mock_chat.assert_called_once()
+        assert not PooledGreeting.objects.exists()
@@ -0,0 +1,63 @@
+from django.test import TestCase
+
+from apps.restaurant.fsm.counters import prompt_cache_counters
+from apps.restaurant.fsm.states import AnalyzeState
+from apps.restaurant.models import DialogSession
+from apps.restaurant.roles.analyze import AnalyzeDialogRole
+from libs.clients.llm_client.caching import CachingLLMClient
+
+ANALYSIS = (
+    '{"dietary_preference":"unknown","confidence_percent":0,"evidence":"",'
+    '"ordered_dishes":[],"favorite_dishes":[]}'
+)
+
+
+class ScriptedClient:
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def chat(self, *, model, messages, **kwargs):
+        self.calls += 1
+        return {
+            "content": self.replies.pop(0),
+            "model": model,
+            "usage": {"prompt_tokens": 100, "completion_tokens": 10},
+        }
+
+
+class TestAnalysisCache(TestCase):
+    def setUp(self):
+        self.upstream = ScriptedClient("not json", ANALYSIS)
+        self.client = CachingLLMClient(self.upstream, validated_only=True)
+        self.session = DialogSession.objects.create(
+            customer_id=0,
+            customer_favorite_text="I love soup.",
+            customer_order_text="Just water.",
+        )
+        prompt_cache_counters.reset()
+        self.addCleanup(prompt_cache_counters.reset)
+
+    def analyze(self):
+        state = AnalyzeState(self.session, AnalyzeDialogRole(client=self.client))
+        return state.generate_validated()
+
+    def test_invalid_output_is_retried_upstream_not_replayed(self):
+        output, ok = self.analyze()
+
+        assert ok
+        assert output["dietary_preference"] == "unknown"
+        assert self.upstream.calls == 2
+
+        # Only the validated reply was cached
+        _, ok = self.analyze()
+        assert ok
+        assert self.upstream.calls == 2
+
+    def test_cache_hits_do_not_count_as_provider_usage(self):
+        self.analyze()
+        self.analyze()
+
+        (totals,) = prompt_cache_counters.snapshot().values()
+        assert totals["calls"] == self.upstream.calls == 2
+        assert totals["prompt_tokens"] == 200
@@ -0,0 +1,111 @@
+from django.test import TestCase
+
+from apps.restaurant.fsm.states import AnalyzeState
+from apps.restaurant.fsm.states import ReplyOrderState
+from apps.restaurant.models import DialogSession
+from apps.restaurant.models import Dish
+from apps.restaurant.scripts import init_dishes_data
+from apps.restaurant.services.menu import MenuCache
+from apps.restaurant.services.menu import current_menu_version
+from apps.restaurant.services.menu import menu_index
+
+
+class TestMenuCache(TestCase):
+    def setUp(self):
+        self.cache = MenuCache()
+        Dish.objects.create(
+            name="Veggie Burger",
+            description="Plant-based patty",
+            ingredients=["plant-based patty", "bun"],
+        )
+
+    def test_snapshot_served_from_memory_until_version_changes(self):
+        snapshot = self.cache.get()
+        assert snapshot.order_menu == "- Veggie Burger: Plant-based patty"
+        assert snapshot.analysis_menu == (
+            "- Veggie Burger, Plant-based patty, ['plant-based patty', 'bun']"
+        )
+
+        with self.assertNumQueries(1):
+            assert self.cache.get() is snapshot
+
+    def test_dish_save_and_delete_invalidate_snapshot(self):
+        first = self.cache.get()
+        dish = Dish.objects.create(name="Roast Duck", description="Crispy duck")
+        second = self.cache.get()
+        assert second.version != first.version
+        assert "- Roast Duck: Crispy duck" in second.order_menu
+
+        dish.delete()
+        assert "Roast Duck" not in self.cache.get().order_menu
+
+    def test_bulk_loader_bumps_version(self):
+        before = self.cache.get()
+        init_dishes_data.run()
+
+        assert current_menu_version() != before.version
+        assert "Garden Fresh Salad" in self.cache.get().order_menu
+
+    def test_states_build_prompts_from_snapshot(self):
+        session = DialogSession.objects.create(customer_id=0)
+
+        assert "- Veggie Burger: Plant-based patty" in (
+            ReplyOrderState(session).system_prompt()
+        )
+        assert "- Veggie Burger, Plant-based patty" in (
+            AnalyzeState(session).system_prompt()
+        )
+
+
+class TestMenuIndex(TestCase):
+    def setUp(self):
+        for name in ["Roast Duck", "Mushroom Risotto", "Chicken Fried Rice"]:
+            Dish.objects.create(name=name, description=name)
+        self.index = menu_index(MenuCache().get())
+
+    def test_extract_in_order_of_mention(self):
+        text = "One mushroom-risotto, the ROAST DUCK and more mushroom risotto."
+
+        assert self.index.extract(text) == ["Mushroom Risotto", "Roast Duck"]
+
+    def test_reconcile_corrects_llm_list(self):
+        ordered = self.index.reconcile(
+            ["chicken fried rice", "Pad Thai", "roast duck", "Roast Duck"]
+        )
+
+        assert ordered == ["Chicken Fried Rice", "Roast Duck"]
+
+    def test_reconcile_does_not_add_mentioned_dishes(self):
+        session = DialogSession.objects.create(
+            customer_id=0,
+            customer_order_text=(
+                "I was tempted by the Roast Duck, but I'll have the Mushroom Risotto."
+            ),
+        )
+        state = AnalyzeState(session)
+        state.menu_snapshot = MenuCache().get()
+
+        output, ok = state.validate_output(
+            '{"dietary_preference":"unknown","confidence_percent":0,'
+            '"evidence":"","ordered_dishes":["Mushroom Risotto"],'
+            '"favorite_dishes":[]}'
+        )
+
+        assert ok
+        assert output["ordered_dishes"] == ["Mushroom Risotto"]
+
+    def test_analyze_output_checked_against_menu(self):
+        session = DialogSession.objects.create(
+            customer_id=0, customer_order_text="Roast Duck and Mushroom Risotto"
+        )
+        state = AnalyzeState(session)
+        state.menu_snapshot = MenuCache().get()
+
+        output, ok = state.validate_output(
+            '{"dietary_preference":"non-vegetarian","confidence_percent":100,'
+            '"evidence":"duck","ordered_dishes":["roast duck","Duck"],'
+            '"favorite_dishes":[]}'
+        )
+
+        assert ok
+        assert output["ordered_dishes"] == ["Roast Duck"]
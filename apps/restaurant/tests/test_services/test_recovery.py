@@ -0,0 +1,110 @@
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.restaurant.models import DialogSession
+from apps.restaurant.roles.base import RestaurantRole
+from apps.restaurant.services.recovery import claim_session
+from apps.restaurant.services.recovery import claim_stalled_sessions
+from apps.restaurant.services.recovery import resume_sessions
+from apps.restaurant.services.recovery import stalled_sessions
+from apps.restaurant.tests.test_fsm.test_scheduler import fake_reply
+from core.auth.utils.factories import UserFactory
+
+OrderState = DialogSession.CustomerOrderState
+
+
+def create_session(state: str, age: timedelta, **kwargs) -> DialogSession:
+    session = DialogSession.objects.create(state=state, **kwargs)
+    DialogSession.objects.filter(id=session.id).update(updated_at=timezone.now() - age)
+    session.refresh_from_db()
+    return session
+
+
+class TestStalledSessionRecovery(TestCase):
+    def test_finds_only_old_non_terminal_sessions(self):
+        stalled = create_session(OrderState.GREETING, timedelta(hours=1), customer_id=0)
+        create_session(OrderState.GREETING, timedelta(seconds=5), customer_id=0)
+        create_session(OrderState.ANALYZE, timedelta(hours=1), customer_id=0)
+        # Possibly still queued for a scheduler run
+        create_session(OrderState.INIT, timedelta(hours=1), customer_id=0)
+
+        found = list(stalled_sessions(timedelta(minutes=10)))
+
+        assert found == [stalled]
+
+    def test_claim_is_exclusive(self):
+        session = create_session(
+            OrderState.ASK_ORDER, timedelta(hours=1), customer_id=0
+        )
+        stale_copy = DialogSession.objects.get(id=session.id)
+
+        assert claim_session(session)
+        assert not claim_session(stale_copy)
+        assert claim_stalled_sessions(timedelta(minutes=10)) == []
+
+    def test_claims_the_batch_with_one_update(self):
+        for _ in range(3):
+            create_session(OrderState.GREETING, timedelta(hours=1), customer_id=0)
+
+        with CaptureQueriesContext(connection) as queries:
+            claimed = claim_stalled_sessions(timedelta(minutes=10), limit=2)
+
+        updates = [q for q in queries if q["sql"].startswith("UPDATE")]
+        assert len(updates) == 1
+        assert len(claimed) == 2
+        assert all(session.resume_attempts == 1 for session in claimed)
+        assert stalled_sessions(timedelta(minutes=10)).count() == 1
+
+    @override_settings(RESTAURANT_DIALOG_MAX_RESUME_ATTEMPTS=2)
+    def test_gives_up_on_a_session_that_never_progresses(self):
+        session = create_session(
+            OrderState.ASK_ORDER, timedelta(hours=1), customer_id=0
+        )
+
+        for _ in range(2):
+            assert claim_stalled_sessions(timedelta(0)) == [session]
+
+        assert claim_stalled_sessions(timedelta(0)) == []
+        out = StringIO()
+        call_command("resume_stalled_dialogs", "--dry-run", stdout=out)
+        assert "sessions past the resume limit: 1" in out.getvalue()
+
+    def test_command_dry_run_reports_count(self):
+        create_session(OrderState.DAY_REPLY, timedelta(hours=1), customer_id=0)
+        out = StringIO()
+
+        call_command("resume_stalled_dialogs", "--dry-run", stdout=out)
+
+        assert "stalled sessions: 1" in out.getvalue()
+
+    async def test_resumes_claimed_sessions_to_completion(self):
+        user = await sync_to_async(UserFactory)()
+        customer_id = await sync_to_async(lambda: user.customer.id)()
+        session = await sync_to_async(create_session)(
+            OrderState.GREETING,
+            timedelta(hours=1),
+            customer_id=customer_id,
+            messages=[{"role": "assistant", "content": "Welcome! How is your day?"}],
+        )
+        claimed = await sync_to_async(claim_stalled_sessions)(timedelta(minutes=10))
+
+        with patch.object(
+            RestaurantRole, "achat", new_callable=AsyncMock, side_effect=fake_reply
+        ):
+            stats = await resume_sessions(claimed, concurrency=2)
+
+        assert [s.id for s in claimed] == [session.id]
+        assert stats.completed == 1
+        await session.arefresh_from_db()
+        assert session.state == OrderState.ANALYZE
+        assert session.resume_attempts == 0
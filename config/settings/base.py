@@ -224,3 +224,121 @@ SIMPLE_JWT = {
 # ------------------------------------------------------------------------------
 LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+# RESTAURANT
+# ------------------------------------------------------------------------------
+# Pre-generated greetings served by GreetingState before a live LLM call.
+RESTAURANT_GREETING_POOL = {
+    "ENABLED": env.bool("RESTAURANT_GREETING_POOL_ENABLED", default=True),
+    "LOW_WATERMARK": env.int("RESTAURANT_GREETING_POOL_LOW_WATERMARK", default=20),
+    "HIGH_WATERMARK": env.int("RESTAURANT_GREETING_POOL_HIGH_WATERMARK", default=100),
+    # Refill in a background thread when a pop drops below the low watermark,
+    # one thread per host at a time; by default `manage.py refill_greeting_pool
+    # --loop` keeps the pool topped up instead
+    "BACKGROUND_REFILL": env.bool("RESTAURANT_GREETING_POOL_REFILL", default=False),
+    # Refill lock file; defaults to one in the system temp directory
+    "LOCK_PATH": env.str("RESTAURANT_GREETING_POOL_LOCK_PATH", default=""),
+}
+# "inline" keeps each state's prompt section order; "prefix" puts the persona
+# and menu first so provider prefix caching can reuse them across sessions.
+RESTAURANT_PROMPT_LAYOUT = env.str("RESTAURANT_PROMPT_LAYOUT", default="inline")
+# Estimated-token budget for dialog turns replayed to the roles; older turns
+# are compacted into facts once a dialog outgrows it.
+RESTAURANT_DIALOG_CONTEXT_TOKENS = env.int(
+    "RESTAURANT_DIALOG_CONTEXT_TOKENS", default=1500
+)
+# Resumes of a stalled dialog without progress before recovery gives up on it.
+RESTAURANT_DIALOG_MAX_RESUME_ATTEMPTS = env.int(
+    "RESTAURANT_DIALOG_MAX_RESUME_ATTEMPTS", default=3
+)
+# Connection pool of the process-wide LLM client shared by every role.
+# TIMEOUT (seconds) is unset by default, keeping the provider SDK's own.
+RESTAURANT_LLM_POOL = {
+    "MAX_CONNECTIONS": env.int("RESTAURANT_LLM_POOL_MAX_CONNECTIONS", default=100),
+    "MAX_KEEPALIVE_CONNECTIONS": env.int(
+        "RESTAURANT_LLM_POOL_MAX_KEEPALIVE_CONNECTIONS", default=20
+    ),
+    "KEEPALIVE_EXPIRY": env.float("RESTAURANT_LLM_POOL_KEEPALIVE_EXPIRY", default=30.0),
+    "TIMEOUT": env.float("RESTAURANT_LLM_TIMEOUT", default=None),
+}
+# Host-wide LLM quota shared by every worker through a file-locked token
+# bucket; calls wait for capacity. 0 leaves a dimension unlimited.
+RESTAURANT_LLM_RATE_LIMIT = {
+    "REQUESTS_PER_MINUTE": env.int("RESTAURANT_LLM_REQUESTS_PER_MINUTE", default=0),
+    "TOKENS_PER_MINUTE": env.int("RESTAURANT_LLM_TOKENS_PER_MINUTE", default=0),
+    # Capacity a burst may use at once, in seconds of quota
+    "BURST_SECONDS": env.float("RESTAURANT_LLM_RATE_LIMIT_BURST_SECONDS", default=10.0),
+    # Bucket file; defaults to one in the system temp directory
+    "PATH": env.str("RESTAURANT_LLM_RATE_LIMIT_PATH", default=""),
+}
+# Retries of transient LLM errors (timeouts, 429, 5xx) with full-jitter
+# exponential backoff; Retry-After is honored and DEADLINE bounds the total.
+RESTAURANT_LLM_RETRY = {
+    "MAX_ATTEMPTS": env.int("RESTAURANT_LLM_RETRY_MAX_ATTEMPTS", default=3),
+    "BASE_DELAY": env.float("RESTAURANT_LLM_RETRY_BASE_DELAY", default=0.5),
+    "MAX_DELAY": env.float("RESTAURANT_LLM_RETRY_MAX_DELAY", default=20.0),
+    "DEADLINE": env.float("RESTAURANT_LLM_RETRY_DEADLINE", default=60.0),
+}
+# Fail LLM calls fast after FAILURE_THRESHOLD consecutive transient errors,
+# probing the provider again every RESET_TIMEOUT seconds.
+RESTAURANT_LLM_CIRCUIT_BREAKER = {
+    "ENABLED": env.bool("RESTAURANT_LLM_CIRCUIT_BREAKER_ENABLED", default=True),
+    "FAILURE_THRESHOLD": env.int(
+        "RESTAURANT_LLM_CIRCUIT_BREAKER_FAILURE_THRESHOLD", default=5
+    ),
+    "RESET_TIMEOUT": env.float(
+        "RESTAURANT_LLM_CIRCUIT_BREAKER_RESET_TIMEOUT", default=30.0
+    ),
+}
+# Offline batch jobs (manage.py batch_analyze). They count against the
+# provider's batch quota, not RESTAURANT_LLM_RATE_LIMIT; MAX_REQUESTS caps the
+# requests per job (the provider's limit is 50,000).
+RESTAURANT_LLM_BATCH = {
+    "MAX_REQUESTS": env.int("RESTAURANT_LLM_BATCH_MAX_REQUESTS", default=50_000),
+    "POLL_INTERVAL": env.float("RESTAURANT_LLM_BATCH_POLL_INTERVAL", default=30.0),
+    "TIMEOUT": env.float("RESTAURANT_LLM_BATCH_TIMEOUT", default=24 * 3600.0),
+}
+# Cache for temperature-0 LLM calls (dialog analysis). PATH adds a SQLite
+# second tier shared by every worker on the host.
+RESTAURANT_LLM_CACHE = {
+    "ENABLED": env.bool("RESTAURANT_LLM_CACHE_ENABLED", default=True),
+    "MAX_ENTRIES": env.int("RESTAURANT_LLM_CACHE_MAX_ENTRIES", default=1024),
+    "TTL": env.float("RESTAURANT_LLM_CACHE_TTL", default=24 * 3600.0),
+    "PATH": env.str("RESTAURANT_LLM_CACHE_PATH", default=""),
+}
+# Share one upstream call among identical concurrent temperature-0 calls
+# (single flight), e.g. a burst of analyses of the same dialog text.
+RESTAURANT_LLM_COALESCE = env.bool("RESTAURANT_LLM_COALESCE", default=True)
+# Rule-based dietary classification that settles unambiguous dialogs before
+# the LLM analysis; results below MIN_CONFIDENCE fall back to the LLM.
+RESTAURANT_DIETARY_PRECLASSIFIER = {
+    "ENABLED": env.bool("RESTAURANT_DIETARY_PRECLASSIFIER_ENABLED", default=False),
+    "MIN_CONFIDENCE": env.int(
+        "RESTAURANT_DIETARY_PRECLASSIFIER_MIN_CONFIDENCE", default=90
+    ),
+}
+# Opt-in: stream replies of states with single-line or no-question rules and
+# cancel the request as soon as the partial reply breaks them.
+RESTAURANT_LLM_STREAMING = env.bool("RESTAURANT_LLM_STREAMING", default=False)
+# Per-state model routing. CANDIDATES maps state values ("*" for the others)
+# to models, most preferred first, e.g. {"greeting": ["gpt-4o-mini", "gpt-4o"]};
+# the fastest model within MAX_FAILURE_RATE over the last WINDOW calls wins.
+RESTAURANT_MODEL_ROUTER = {
+    "CANDIDATES": env.json("RESTAURANT_MODEL_ROUTER_CANDIDATES", default={}),
+    "MAX_FAILURE_RATE": env.float(
+        "RESTAURANT_MODEL_ROUTER_MAX_FAILURE_RATE", default=0.1
+    ),
+    "WINDOW": env.int("RESTAURANT_MODEL_ROUTER_WINDOW", default=200),
+    "MIN_SAMPLES": env.int("RESTAURANT_MODEL_ROUTER_MIN_SAMPLES", default=20),
+    "EXPLORE_RATE": env.float("RESTAURANT_MODEL_ROUTER_EXPLORE_RATE", default=0.05),
+}
+# Run background side tasks (e.g. favorites extraction) alongside later states.
+# Results only reach states driven by the same DialogStateMachine, such as
+# run_to_completion; a machine built per trigger pays for the call and drops it.
+RESTAURANT_FSM_SIDE_TASKS = env.bool("RESTAURANT_FSM_SIDE_TASKS", default=False)
+# Dotted paths of exporters receiving every FSM transition latency sample,
+# e.g. "apps.restaurant.fsm.instrumentation.JsonLinesExporter", which writes
+# the logs/fsm_latency.jsonl file `manage.py fsm_latency_report` reads.
+RESTAURANT_FSM_METRICS_EXPORTERS = env.list(
+    "RESTAURANT_FSM_METRICS_EXPORTERS", default=[]
+)
@@ -23,3 +23,9 @@ DATABASES = {
 INSTALLED_APPS = [*INSTALLED_APPS, "core.tests"]  # noqa: F405
 
 SHOW_API_DOCS = True
+
+RESTAURANT_GREETING_POOL = {
+    **RESTAURANT_GREETING_POOL,  # noqa: F405
+    "BACKGROUND_REFILL": False,
+}
+RESTAURANT_FSM_SIDE_TASKS = False
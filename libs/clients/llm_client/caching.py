@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+from typing import Protocol
+
+from libs.clients.llm_client.interface import ChatMessage
+from libs.clients.llm_client.interface import ChatResult
+from libs.clients.llm_client.interface import LLMClient
+
+
+def request_key(
+    *,
+    model: str,
+    messages: list[ChatMessage],
+    temperature: float | None = None,
+    top_p: float | None = None,
+    max_tokens: int | None = None,
+    response_format: str | None = None,
+    extra: dict[str, Any] | None = None,
+) -> str:
+    """Stable hash of everything that determines a chat completion."""
+    canonical = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_tokens": max_tokens,
+            "response_format": response_format,
+            "extra": extra,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CacheStore(Protocol):
+    """Second cache tier shared between processes."""
+
+    def get(self, key: str) -> ChatResult | None: ...
+
+    def set(self, key: str, result: ChatResult, ttl: float) -> None: ...
+
+
+class SQLiteCacheStore:
+    """``CacheStore`` in a local SQLite file, shared by workers on one host."""
+
+    def __init__(
+        self, path: str | Path, *, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.path = str(path)
+        self._clock = clock
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections may not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> ChatResult | None:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT result FROM llm_cache WHERE key = ? AND expires_at > ?",
+                (key, self._clock()),
+            )
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, result: ChatResult, ttl: float) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, result, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(result, default=str), self._clock() + ttl),
+            )
+
+
+class CachingLLMClient(LLMClient):
+    """``LLMClient`` wrapper caching deterministic chat completions.
+
+    Only calls made with ``temperature=0`` are cached; anything else is
+    passed straight through. Results live in an in-memory LRU of
+    ``max_entries`` for ``ttl`` seconds and, when a ``store`` is given, in
+    that shared second tier as well. Errors are never cached, and hits are
+    returned with ``cached`` set.
+
+    With ``validated_only`` a fresh result is not cached until the caller
+    passes it to ``confirm``, so output that fails the caller's validation
+    is requested again rather than replayed for ``ttl``.
+
+    ``achat`` and ``aconfirm`` reach the ``store`` from a worker thread, so
+    its disk I/O and locking do not block the event loop.
+    """
+
+    def __init__(
+        self,
+        client: LLMClient,
+        *,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        store: CacheStore | None = None,
+        validated_only: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self._client = client
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.validated_only = validated_only
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, ChatResult]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def is_deterministic(temperature: float | None) -> bool:
+        return temperature == 0
+
+    def lookup(self, key: str) -> ChatResult | None:
+        found = self._lookup_memory(key)
+        if found is not None or self.store is None:
+            return self._count(key, found, from_store=False)
+        return self._count(key, self.store.get(key), from_store=True)
+
+    async def alookup(self, key: str) -> ChatResult | None:
+        found = self._lookup_memory(key)
+        if found is not None or self.store is None:
+            return self._count(key, found, from_store=False)
+        result = await asyncio.to_thread(self.store.get, key)
+        return self._count(key, result, from_store=True)
+
+    def _lookup_memory(self, key: str) -> ChatResult | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, result = entry
+            if expires_at > self._clock():
+                self._entries.move_to_end(key)
+                return result
+            del self._entries[key]
+            return None
+
+    def _count(
+        self, key: str, result: ChatResult | None, *, from_store: bool
+    ) -> ChatResult | None:
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        if from_store:
+            self._remember(key, result)
+        return {**result, "cached": True}
+
+    def save(self, key: str, result: ChatResult) -> None:
+        self._remember(key, result)
+        if self.store is not None:
+            self.store.set(key, result, self.ttl)
+
+    async def asave(self, key: str, result: ChatResult) -> None:
+        self._remember(key, result)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.set, key, result, self.ttl)
+
+    def _remember(self, key: str, result: ChatResult) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def confirm(self, result: ChatResult, **kwargs: Any) -> None:
+        """Cache ``result`` of a ``chat(**kwargs)`` call that passed the
+        caller's validation; only needed with ``validated_only``.
+        """
+        if result.get("cached") or not self.validated_only:
+            return
+        if self.is_deterministic(kwargs.get("temperature")):
+            self.save(request_key(**kwargs), result)
+
+    async def aconfirm(self, result: ChatResult, **kwargs: Any) -> None:
+        if result.get("cached") or not self.validated_only:
+            return
+        if self.is_deterministic(kwargs.get("temperature")):
+            await self.asave(request_key(**kwargs), result)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def chat(self, **kwargs: Any) -> ChatResult:  # type: ignore[override]
+        if not self.is_deterministic(kwargs.get("temperature")):
+            return self._client.chat(**kwargs)
+        key = request_key(**kwargs)
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+        result = self._client.chat(**kwargs)
+        if not self.validated_only:
+            self.save(key, result)
+        return result
+
+    async def achat(self, **kwargs: Any) -> ChatResult:
+        achat = getattr(self._client, "achat", None)
+        if not self.is_deterministic(kwargs.get("temperature")):
+            if achat is None:
+                return await asyncio.to_thread(self._client.chat, **kwargs)
+            return await achat(**kwargs)
+        key = request_key(**kwargs)
+        cached = await self.alookup(key)
+        if cached is not None:
+            return cached
+        if achat is None:
+            result = await asyncio.to_thread(self._client.chat, **kwargs)
+        else:
+            result = await achat(**kwargs)
+        if not self.validated_only:
+            await self.asave(key, result)
+        return result
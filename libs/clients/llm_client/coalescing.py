@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any
+from weakref import WeakKeyDictionary
+
+from libs.clients.llm_client.caching import request_key
+from libs.clients.llm_client.interface import ChatResult
+from libs.clients.llm_client.interface import LLMClient
+
+
+class CoalescingLLMClient(LLMClient):
+    """``LLMClient`` wrapper sharing one upstream call among identical
+    concurrent requests (single flight).
+
+    The first caller with a given ``request_key`` makes the call; callers
+    with the same key that arrive while it is in flight wait for it and
+    receive a copy of its ``ChatResult`` with ``cached`` set, or its error.
+    Nothing is kept once the call finishes, so this only removes duplicate
+    concurrent calls; pair it with ``CachingLLMClient`` to reuse results
+    over time.
+
+    Threads coalesce with threads, and ``achat`` callers with callers on the
+    same event loop. Like the cache, only ``temperature=0`` calls are
+    coalesced: sampled calls are expected to differ, so they pass through.
+    """
+
+    def __init__(self, client: LLMClient) -> None:
+        self._client = client
+        self._lock = threading.Lock()
+        self._flights: dict[str, Future[ChatResult]] = {}
+        self._async_flights: WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Task[ChatResult]]
+        ] = WeakKeyDictionary()
+        self.calls = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def is_deterministic(temperature: float | None) -> bool:
+        return temperature == 0
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights) + sum(
+                len(flights) for flights in self._async_flights.values()
+            )
+
+    def chat(self, **kwargs: Any) -> ChatResult:  # type: ignore[override]
+        if not self.is_deterministic(kwargs.get("temperature")):
+            return self._client.chat(**kwargs)
+        key = request_key(**kwargs)
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return {**flight.result(), "cached": True}
+        try:
+            result = self._client.chat(**kwargs)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._flights[key]
+
+    async def achat(self, **kwargs: Any) -> ChatResult:
+        if not self.is_deterministic(kwargs.get("temperature")):
+            return await self._upstream_achat(**kwargs)
+        key = request_key(**kwargs)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flights = self._async_flights.setdefault(loop, {})
+            task = flights.get(key)
+            leader = task is None
+            if leader:
+                task = flights[key] = loop.create_task(self._upstream_achat(**kwargs))
+                task.add_done_callback(lambda _: self._land(flights, key))
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        # Shielded so a cancelled caller does not cancel the others' call
+        result = await asyncio.shield(task)
+        return dict(result) if leader else {**result, "cached": True}
+
+    async def _upstream_achat(self, **kwargs: Any) -> ChatResult:
+        achat = getattr(self._client, "achat", None)
+        if achat is None:
+            return await asyncio.to_thread(self._client.chat, **kwargs)
+        return await achat(**kwargs)
+
+    def _land(self, flights: dict[str, asyncio.Task[ChatResult]], key: str) -> None:
+        with self._lock:
+            flights.pop(key, None)
@@ -14,3 +14,8 @@ class LLMHTTPError(BaseError):
 class LLMInvalidResponseError(BaseError):
     code: int = 22
     message: str = "LLM invalid response"
+
+
+class LLMCircuitOpenError(BaseError):
+    code: int = 23
+    message: str = "LLM provider unavailable, circuit open"
@@ -1,5 +1,8 @@
+from collections.abc import AsyncIterator
+from collections.abc import Iterator
 from typing import Any
 from typing import Literal
+from typing import NamedTuple
 from typing import Protocol
 from typing import TypedDict
 
@@ -19,6 +22,9 @@ class ChatResult(TypedDict, total=False):
     finish_reason: str | None
     usage: dict[str, Any] | None
     raw: dict[str, Any] | None
+    # Set on results replayed without a provider call of their own, e.g. a
+    # cache hit; their ``usage`` was already billed to the original call.
+    cached: bool
 
 
 class LLMClient(Protocol):
@@ -50,3 +56,117 @@ class LLMClient(Protocol):
             LLMInvalidResponseError: when the provider returns malformed data.
         """
         ...
+
+
+class ChatStream(Protocol):
+    """Text deltas of a streaming chat completion.
+
+    Iterating yields the content deltas as they arrive. ``close`` cancels the
+    request early; ``result`` normalizes whatever was received so far.
+    """
+
+    def __iter__(self) -> Iterator[str]: ...
+
+    def close(self) -> None: ...
+
+    def result(self) -> ChatResult: ...
+
+
+class StreamingLLMClient(LLMClient, Protocol):
+    """``LLMClient`` that can also stream a chat completion."""
+
+    def stream_chat(
+        self,
+        *,
+        model: str,
+        messages: list[ChatMessage],
+        temperature: float | None = None,
+        top_p: float | None = None,
+        max_tokens: int | None = None,
+        response_format: Literal["text", "json"] | None = None,
+        extra: dict[str, Any] | None = None,
+    ) -> ChatStream:
+        """Start a streaming chat completion; raises like ``chat``."""
+        ...
+
+
+class AsyncLLMClient(Protocol):
+    """Protocol for LLM clients usable without blocking an event loop.
+
+    ``achat`` takes the same arguments as ``LLMClient.chat``, returns the
+    same ``ChatResult`` and raises the same errors.
+    """
+
+    async def achat(
+        self,
+        *,
+        model: str,
+        messages: list[ChatMessage],
+        temperature: float | None = None,
+        top_p: float | None = None,
+        max_tokens: int | None = None,
+        response_format: Literal["text", "json"] | None = None,
+        extra: dict[str, Any] | None = None,
+    ) -> ChatResult:
+        """Create a non-streaming chat completion, see ``LLMClient.chat``."""
+        ...
+
+
+class AsyncChatStream(Protocol):
+    """Async counterpart of ``ChatStream``, cancelled with ``aclose``."""
+
+    def __aiter__(self) -> AsyncIterator[str]: ...
+
+    async def aclose(self) -> None: ...
+
+    def result(self) -> ChatResult: ...
+
+
+class AsyncStreamingLLMClient(AsyncLLMClient, Protocol):
+    """``AsyncLLMClient`` that can also stream a chat completion."""
+
+    async def astream_chat(
+        self,
+        *,
+        model: str,
+        messages: list[ChatMessage],
+        temperature: float | None = None,
+        top_p: float | None = None,
+        max_tokens: int | None = None,
+        response_format: Literal["text", "json"] | None = None,
+        extra: dict[str, Any] | None = None,
+    ) -> AsyncChatStream:
+        """Start a streaming chat completion; raises like ``achat``."""
+        ...
+
+
+class BatchRequest(NamedTuple):
+    """One chat completion of a batch job."""
+
+    custom_id: str
+    # Keyword arguments of ``LLMClient.chat``
+    chat_kwargs: dict[str, Any]
+
+
+class BatchLLMClient(LLMClient, Protocol):
+    """``LLMClient`` that can also run many chat completions as one offline
+    batch job, at batch pricing and under the provider's batch quotas.
+    """
+
+    def chat_batch(
+        self,
+        requests: list[BatchRequest],
+        *,
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600.0,
+    ) -> dict[str, ChatResult | Exception]:
+        """Submit ``requests``, wait for the job and map its results.
+
+        Returns a ``ChatResult`` or the error of every request, by
+        ``custom_id``; requests the job did not finish are missing.
+
+        Raises:
+            LLMHTTPError: when the job fails as a whole or does not finish
+                within ``timeout`` seconds.
+        """
+        ...
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+
+# Answers one chat completion body with (status code, response body)
+Responder = Callable[[dict[str, Any]], tuple[int, dict[str, Any]]]
+
+
+def echo_completion(body: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+    """Completion repeating the last message, like a trivial model would."""
+    return 200, {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", ""),
+        "choices": [
+            {
+                "index": 0,
+                "message": {
+                    "role": "assistant",
+                    "content": body["messages"][-1]["content"],
+                },
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+class LocalBatchServer:
+    """Stand-in for the provider's Files and Batch APIs, on localhost.
+
+    Serves just what ``OpenAIClient.chat_batch`` uses: file upload and
+    download, batch creation and retrieval. A job reports ``in_progress``
+    for ``polls_until_done`` retrievals, then runs every request through
+    ``respond`` and completes, writing successes to the output file and
+    other statuses to the error file as the real API does.
+
+        with LocalBatchServer() as server:
+            client = OpenAIClient(api_key="test", base_url=server.base_url)
+    """
+
+    def __init__(
+        self, respond: Responder = echo_completion, *, polls_until_done: int = 1
+    ) -> None:
+        self.respond = respond
+        self.polls_until_done = polls_until_done
+        self.files: dict[str, bytes] = {}
+        self.batches: dict[str, dict[str, Any]] = {}
+        self._polls: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _BatchHandler)
+        self._server.batch_server = self  # type: ignore[attr-defined]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/v1"
+
+    def start(self) -> LocalBatchServer:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> LocalBatchServer:
+        return self.start()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.stop()
+
+    def add_file(self, content: bytes, purpose: str, filename: str) -> dict[str, Any]:
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self.files[file_id] = content
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    def create_batch(self, params: dict[str, Any]) -> dict[str, Any]:
+        batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": params["endpoint"],
+            "completion_window": params["completion_window"],
+            "input_file_id": params["input_file_id"],
+            "created_at": int(time.time()),
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        with self._lock:
+            self.batches[batch_id] = batch
+            self._polls[batch_id] = 0
+        return batch
+
+    def retrieve_batch(self, batch_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch is None or batch["status"] in ("finalizing", "completed"):
+                return batch
+            self._polls[batch_id] += 1
+            if self._polls[batch_id] <= self.polls_until_done:
+                batch["status"] = "in_progress"
+                return batch
+            # Concurrent polls see the job finalizing while this one runs it
+            batch["status"] = "finalizing"
+            content = self.files[batch["input_file_id"]]
+        output, errors = self._run(content)
+        file_ids = {
+            key: self.add_file(
+                "\n".join(lines).encode(), "batch_output", f"{key}.jsonl"
+            )["id"]
+            for key, lines in (("output_file_id", output), ("error_file_id", errors))
+            if lines
+        }
+        with self._lock:
+            batch.update(file_ids)
+            batch["request_counts"] = {
+                "total": len(output) + len(errors),
+                "completed": len(output),
+                "failed": len(errors),
+            }
+            batch["status"] = "completed"
+        return batch
+
+    def _run(self, content: bytes) -> tuple[list[str], list[str]]:
+        output: list[str] = []
+        errors: list[str] = []
+        for line in content.decode().splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            status, body = self.respond(request["body"])
+            item = {
+                "id": f"batch_req_{uuid.uuid4().hex[:12]}",
+                "custom_id": request["custom_id"],
+                "response": {"status_code": status, "body": body},
+                "error": None,
+            }
+            (output if status == 200 else errors).append(json.dumps(item))
+        return output, errors
+
+
+class _BatchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def batch_server(self) -> LocalBatchServer:
+        return self.server.batch_server  # type: ignore[attr-defined]
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/v1/files":
+            fields = _multipart_fields(self.headers["Content-Type"], body)
+            filename, content = fields["file"]
+            self._send_json(
+                200,
+                self.batch_server.add_file(
+                    content, fields["purpose"][1].decode(), filename or "upload"
+                ),
+            )
+        elif self.path == "/v1/batches":
+            self._send_json(200, self.batch_server.create_batch(json.loads(body)))
+        else:
+            self._send_json(404, {"error": {"message": f"no route {self.path}"}})
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 3 and parts[:2] == ["v1", "batches"]:
+            batch = self.batch_server.retrieve_batch(parts[2])
+            if batch is not None:
+                self._send_json(200, batch)
+                return
+        elif len(parts) == 4 and parts[:2] == ["v1", "files"] and parts[3] == "content":
+            content = self.batch_server.files.get(parts[2])
+            if content is not None:
+                self._send(200, "application/octet-stream", content)
+                return
+        self._send_json(404, {"error": {"message": f"no route {self.path}"}})
+
+    def _send_json(self, status: int, body: dict[str, Any]) -> None:
+        self._send(status, "application/json", json.dumps(body).encode())
+
+    def _send(self, status: int, content_type: str, data: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def _multipart_fields(
+    content_type: str, body: bytes
+) -> dict[str, tuple[str | None, bytes]]:
+    # (filename, content) of every part of a multipart/form-data body
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+    )
+    return {
+        part.get_param("name", header="content-disposition"): (
+            part.get_filename(),
+            part.get_payload(decode=True),
+        )
+        for part in message.iter_parts()
+    }
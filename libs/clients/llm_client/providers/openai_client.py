@@ -1,31 +1,85 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
+import threading
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
 from typing import Any
+from weakref import WeakKeyDictionary
 
+import httpx
 from openai import APIConnectionError
 from openai import APIError
 from openai import APITimeoutError
+from openai import AsyncOpenAI
 from openai import AuthenticationError
 from openai import BadRequestError
+from openai import DefaultAsyncHttpxClient
+from openai import DefaultHttpxClient
+from openai import InternalServerError
 from openai import OpenAI
 from openai import OpenAIError
 from openai import RateLimitError
+from openai.types.chat import ChatCompletion
 
 from libs.clients.llm_client.exceptions import LLMClientError
 from libs.clients.llm_client.exceptions import LLMHTTPError
 from libs.clients.llm_client.exceptions import LLMInvalidResponseError
+from libs.clients.llm_client.interface import AsyncLLMClient
+from libs.clients.llm_client.interface import BatchLLMClient
+from libs.clients.llm_client.interface import BatchRequest
 from libs.clients.llm_client.interface import ChatMessage
 from libs.clients.llm_client.interface import ChatResult
-from libs.clients.llm_client.interface import LLMClient
+from libs.clients.llm_client.rate_limit import RateLimiter
+from libs.clients.llm_client.rate_limit import estimate_call_tokens
+from libs.clients.llm_client.retry import CircuitBreaker
+from libs.clients.llm_client.retry import RetryPolicy
+from libs.clients.llm_client.tokens import count_tokens
 
+# Provider errors worth retrying: timeouts, dropped connections, 429 and 5xx
+RETRYABLE_ERRORS: tuple[type[Exception], ...] = (
+    APIConnectionError,
+    RateLimitError,
+    InternalServerError,
+)
+_MAPPED_ERRORS = (LLMClientError, LLMHTTPError, LLMInvalidResponseError)
 
-class OpenAIClient(LLMClient):
-    """Minimal OpenAI adapter implementing the LLMClient protocol.
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Batch job statuses after which the job no longer changes
+BATCH_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# The SDK's own pool defaults
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=1000, max_keepalive_connections=100, keepalive_expiry=5.0
+)
+
+
+class OpenAIClient(BatchLLMClient, AsyncLLMClient):
+    """Minimal OpenAI adapter implementing the LLMClient, AsyncLLMClient and
+    BatchLLMClient protocols.
 
     - Uses SDK (openai>=2.x) to perform chat.completions.create
     - Normalizes response to ChatResult
     - Maps provider exceptions to project-level errors
+    - ``achat`` runs the same request on an ``AsyncOpenAI`` client, sharing
+      the payload, error mapping and result normalization of ``chat``
+    - ``stream_chat``/``astream_chat`` stream the completion so callers can
+      cancel it early
+    - Keeps one keep-alive connection pool per sync/async client, bounded by
+      ``limits``; share instances through ``client_registry``
+    - Waits for ``rate_limiter`` capacity before sending each request
+    - Retries transient errors as ``retry_policy`` says and fails fast while
+      ``circuit_breaker`` is open (``LLMCircuitOpenError``)
+    - ``chat_batch`` runs many completions as one Batch API job; batch jobs
+      have their own provider quotas, so they bypass ``rate_limiter`` and
+      ``circuit_breaker``
     """
 
     def __init__(
@@ -35,14 +89,110 @@ class OpenAIClient(LLMClient):
         base_url: str | None = None,
         default_model: str | None = None,
         timeout: float | None = None,
+        limits: httpx.Limits | None = None,
+        rate_limiter: RateLimiter | None = None,
+        retry_policy: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
     ) -> None:
         # Fallback to environment variables when not provided
         api_key = api_key or os.getenv("OPENAI_API_KEY")
         base_url = base_url or os.getenv("OPENAI_BASE_URL")
 
-        # Instantiate OpenAI client; SDK will raise if api_key missing when required
-        self._client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout)
+        self._api_key = api_key
+        self._base_url = base_url
+        self._timeout = timeout
         self._default_model = default_model
+        self.limits = limits or DEFAULT_LIMITS
+        self.rate_limiter = rate_limiter
+        # Retries happen here rather than in the SDK, see ``_create``
+        self.retry_policy = retry_policy or RetryPolicy(retry_on=RETRYABLE_ERRORS)
+        self.circuit_breaker = circuit_breaker
+        self._requests_lock = threading.Lock()
+        self._requests = 0
+        # SDK clients dropped by ``reset_after_fork``, see there
+        self._inherited: list[Any] = []
+        self._client = self._new_client()
+        # httpx async pools belong to the event loop that opened them
+        self._async_lock = threading.Lock()
+        self._async_clients: WeakKeyDictionary[
+            asyncio.AbstractEventLoop, AsyncOpenAI
+        ] = WeakKeyDictionary()
+
+    def _new_client(self) -> OpenAI:
+        # Instantiate OpenAI client; SDK will raise if api_key missing when required
+        return OpenAI(
+            api_key=self._api_key,
+            base_url=self._base_url,
+            timeout=self._timeout,
+            max_retries=0,
+            http_client=DefaultHttpxClient(
+                limits=self.limits,
+                event_hooks={"request": [self._count_request]},
+            ),
+        )
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """``AsyncOpenAI`` client of the running event loop.
+
+        Created lazily so sync-only callers never open an async pool; every
+        call on one loop shares its pool, so an ASGI worker keeps many
+        requests in flight over a few kept-alive connections.
+        """
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            with self._async_lock:
+                client = self._async_clients.get(loop)
+                if client is None:
+                    client = self._async_clients[loop] = AsyncOpenAI(
+                        api_key=self._api_key,
+                        base_url=self._base_url,
+                        timeout=self._timeout,
+                        max_retries=0,
+                        http_client=DefaultAsyncHttpxClient(
+                            limits=self.limits,
+                            event_hooks={"request": [self._acount_request]},
+                        ),
+                    )
+        return client
+
+    def _count_request(self, request: httpx.Request) -> None:
+        with self._requests_lock:
+            self._requests += 1
+
+    async def _acount_request(self, request: httpx.Request) -> None:
+        self._count_request(request)
+
+    def reset_after_fork(self) -> None:
+        """Give a forked child its own connection pools.
+
+        The inherited SDK clients share sockets with the parent, so they are
+        kept referenced rather than closed: closing (or garbage collecting)
+        them in the child could end the parent's connections.
+        """
+        self._inherited.append((self._client, dict(self._async_clients)))
+        self._requests_lock = threading.Lock()
+        self._requests = 0
+        self._client = self._new_client()
+        self._async_lock = threading.Lock()
+        self._async_clients = WeakKeyDictionary()
+
+    def pool_stats(self) -> dict[str, Any]:
+        """Requests sent and connections held by this client's pools."""
+        connections = _pool_connections(self._client)
+        with self._async_lock:
+            async_clients = list(self._async_clients.values())
+        for client in async_clients:
+            connections += _pool_connections(client)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {
+            "requests": self._requests,
+            "connections": len(connections),
+            "idle_connections": idle,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+        }
 
     def chat(  # type: ignore[override]
         self,
@@ -55,6 +205,353 @@ class OpenAIClient(LLMClient):
         response_format: str | None = None,
         extra: dict[str, Any] | None = None,
     ) -> ChatResult:
+        payload = self._build_payload(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            extra=extra,
+        )
+        resp, estimated = self._create(payload)
+        return self._settle(estimated, self._to_chat_result(resp, model))
+
+    async def achat(
+        self,
+        *,
+        model: str,
+        messages: list[ChatMessage],
+        temperature: float | None = None,
+        top_p: float | None = None,
+        max_tokens: int | None = None,
+        response_format: str | None = None,
+        extra: dict[str, Any] | None = None,
+    ) -> ChatResult:
+        payload = self._build_payload(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            extra=extra,
+        )
+        resp, estimated = await self._acreate(payload)
+        return await self._asettle(estimated, self._to_chat_result(resp, model))
+
+    def stream_chat(
+        self,
+        *,
+        model: str,
+        messages: list[ChatMessage],
+        temperature: float | None = None,
+        top_p: float | None = None,
+        max_tokens: int | None = None,
+        response_format: str | None = None,
+        extra: dict[str, Any] | None = None,
+    ) -> OpenAIChatStream:
+        payload = self._build_stream_payload(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            extra=extra,
+        )
+        stream, estimated = self._create(payload)
+        return OpenAIChatStream(
+            stream,
+            model,
+            settle=lambda result: self._settle_stream(estimated, payload, result),
+        )
+
+    async def astream_chat(
+        self,
+        *,
+        model: str,
+        messages: list[ChatMessage],
+        temperature: float | None = None,
+        top_p: float | None = None,
+        max_tokens: int | None = None,
+        response_format: str | None = None,
+        extra: dict[str, Any] | None = None,
+    ) -> AsyncOpenAIChatStream:
+        payload = self._build_stream_payload(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            top_p=top_p,
+            max_tokens=max_tokens,
+            response_format=response_format,
+            extra=extra,
+        )
+        stream, estimated = await self._acreate(payload)
+        return AsyncOpenAIChatStream(
+            stream,
+            model,
+            settle=lambda result: self._asettle_stream(estimated, payload, result),
+        )
+
+    def _create(self, payload: dict[str, Any]) -> tuple[Any, int]:
+        """Make the call with retries; returns the response and the tokens
+        reserved for the attempt that succeeded, to settle against its usage.
+
+        Every attempt takes its own rate limiter reservation; a failed one
+        gets its tokens back.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._before_attempt()
+            estimated = 0
+            try:
+                estimated = self._wait_for_capacity(payload)
+                with self._map_errors():
+                    response = self._client.chat.completions.create(**payload)
+                return self._after_success(response), estimated
+            except _MAPPED_ERRORS as e:
+                self._refund(estimated)
+                delay = self._retry_delay(e, attempt, started)
+                if delay is None:
+                    raise
+            except BaseException:
+                # Cancelled or interrupted: never leave the probe slot taken
+                self._abandon_attempt()
+                raise
+            time.sleep(delay)
+
+    async def _acreate(self, payload: dict[str, Any]) -> tuple[Any, int]:
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            self._before_attempt()
+            estimated = 0
+            try:
+                estimated = await self._await_capacity(payload)
+                with self._map_errors():
+                    response = await self.async_client.chat.completions.create(
+                        **payload
+                    )
+                return self._after_success(response), estimated
+            except _MAPPED_ERRORS as e:
+                await self._arefund(estimated)
+                delay = self._retry_delay(e, attempt, started)
+                if delay is None:
+                    raise
+            except BaseException:
+                # Cancelled or interrupted: never leave the probe slot taken
+                self._abandon_attempt()
+                raise
+            await asyncio.sleep(delay)
+
+    def _before_attempt(self) -> None:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_call()
+
+    def _abandon_attempt(self) -> None:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_abandoned()
+
+    def _after_success(self, response: Any) -> Any:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success()
+        return response
+
+    def _retry_delay(
+        self, error: Exception, attempt: int, started: float
+    ) -> float | None:
+        # Decided on the provider error the mapped one was raised from
+        cause = error.__cause__ or error
+        if self.circuit_breaker is not None:
+            if isinstance(cause, self.retry_policy.retry_on):
+                self.circuit_breaker.record_failure()
+            else:
+                # Says nothing about the provider's health (e.g. a bad
+                # request); only hand a half-open probe slot back
+                self.circuit_breaker.record_abandoned()
+        return self.retry_policy.next_delay(
+            cause, attempt, time.monotonic() - started, _retry_after(cause)
+        )
+
+    def _wait_for_capacity(self, payload: dict[str, Any]) -> int:
+        if self.rate_limiter is None:
+            return 0
+        estimated = self._estimate_tokens(payload)
+        self.rate_limiter.acquire(estimated)
+        return estimated
+
+    async def _await_capacity(self, payload: dict[str, Any]) -> int:
+        if self.rate_limiter is None:
+            return 0
+        estimated = self._estimate_tokens(payload)
+        await self.rate_limiter.aacquire(estimated)
+        return estimated
+
+    @staticmethod
+    def _estimate_tokens(payload: dict[str, Any]) -> int:
+        return estimate_call_tokens(
+            payload["messages"], payload["model"] or "", payload.get("max_tokens")
+        )
+
+    def _refund(self, estimated: int) -> None:
+        if self.rate_limiter is not None and estimated:
+            self.rate_limiter.settle(estimated, 0)
+
+    async def _arefund(self, estimated: int) -> None:
+        if self.rate_limiter is not None and estimated:
+            await self.rate_limiter.asettle(estimated, 0)
+
+    def _settle(self, estimated: int, result: ChatResult) -> ChatResult:
+        actual = (result.get("usage") or {}).get("total_tokens")
+        if self.rate_limiter is not None and actual is not None:
+            self.rate_limiter.settle(estimated, actual)
+        return result
+
+    async def _asettle(self, estimated: int, result: ChatResult) -> ChatResult:
+        actual = (result.get("usage") or {}).get("total_tokens")
+        if self.rate_limiter is not None and actual is not None:
+            await self.rate_limiter.asettle(estimated, actual)
+        return result
+
+    @staticmethod
+    def _streamed_tokens(payload: dict[str, Any], result: ChatResult) -> int:
+        # A stream closed before its final chunk reports no usage; charge the
+        # prompt and the text received so far
+        actual = (result.get("usage") or {}).get("total_tokens")
+        if actual is not None:
+            return actual
+        model = payload["model"] or ""
+        return estimate_call_tokens(
+            payload["messages"],
+            model,
+            completion_tokens=count_tokens(result["content"], model),
+        )
+
+    def _settle_stream(
+        self, estimated: int, payload: dict[str, Any], result: ChatResult
+    ) -> None:
+        if self.rate_limiter is not None:
+            self.rate_limiter.settle(estimated, self._streamed_tokens(payload, result))
+
+    async def _asettle_stream(
+        self, estimated: int, payload: dict[str, Any], result: ChatResult
+    ) -> None:
+        if self.rate_limiter is not None:
+            await self.rate_limiter.asettle(
+                estimated, self._streamed_tokens(payload, result)
+            )
+
+    def chat_batch(
+        self,
+        requests: list[BatchRequest],
+        *,
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600.0,
+    ) -> dict[str, ChatResult | Exception]:
+        batch_id = self.submit_batch(requests)
+        return self.batch_results(
+            self.wait_batch(batch_id, poll_interval=poll_interval, timeout=timeout)
+        )
+
+    def submit_batch(self, requests: list[BatchRequest]) -> str:
+        """Upload ``requests`` as a JSONL file and start a batch job on it;
+        returns the job id.
+        """
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": request.custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": self._build_payload(**request.chat_kwargs),
+                }
+            )
+            for request in requests
+        ]
+        with self._map_errors():
+            input_file = self._client.files.create(
+                file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch"
+            )
+            batch = self._client.batches.create(
+                input_file_id=input_file.id,
+                endpoint=BATCH_ENDPOINT,
+                completion_window="24h",
+            )
+        return batch.id
+
+    def wait_batch(
+        self,
+        batch_id: str,
+        *,
+        poll_interval: float = 30.0,
+        timeout: float = 24 * 3600.0,
+    ) -> Any:
+        """Poll the job until it reaches a final status; returns the job.
+
+        Transient errors while polling are retried on the next poll.
+        """
+        deadline = time.monotonic() + timeout
+        status = "unknown"
+        while True:
+            try:
+                with self._map_errors():
+                    batch = self._client.batches.retrieve(batch_id)
+                status = batch.status
+                if status in BATCH_FINAL_STATUSES:
+                    return batch
+            except LLMHTTPError as e:
+                if not isinstance(e.__cause__, RETRYABLE_ERRORS):
+                    raise
+            if time.monotonic() + poll_interval > deadline:
+                raise LLMHTTPError(
+                    f"batch {batch_id} still {status} after {timeout:.0f}s"
+                )
+            time.sleep(poll_interval)
+
+    def batch_results(self, batch: Any) -> dict[str, ChatResult | Exception]:
+        """Results of a finished job by ``custom_id``.
+
+        Expired or cancelled jobs return what they completed; requests
+        without a result are missing from the mapping.
+        """
+        if batch.status == "failed":
+            errors = getattr(getattr(batch, "errors", None), "data", None) or []
+            reasons = "; ".join(str(getattr(e, "message", e)) for e in errors)
+            raise LLMHTTPError(f"batch {batch.id} failed: {reasons or 'no reason'}")
+        results: dict[str, ChatResult | Exception] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            with self._map_errors():
+                content = self._client.files.content(file_id).text
+            for line in content.splitlines():
+                if line.strip():
+                    item = json.loads(line)
+                    results[item["custom_id"]] = _batch_item_result(item)
+        return results
+
+    def _build_stream_payload(self, **kwargs: Any) -> dict[str, Any]:
+        payload = self._build_payload(**kwargs)
+        payload["stream"] = True
+        # The final chunk then carries the usage, as non-streaming calls do
+        payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    def _build_payload(
+        self,
+        *,
+        model: str,
+        messages: list[ChatMessage],
+        temperature: float | None = None,
+        top_p: float | None = None,
+        max_tokens: int | None = None,
+        response_format: str | None = None,
+        extra: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
         # Prepare parameters for OpenAI SDK
         payload: dict[str, Any] = {
             "model": model or self._default_model,
@@ -70,21 +567,28 @@ class OpenAIClient(LLMClient):
             payload["response_format"] = {"type": "json_object"}
         if extra:
             payload.update(extra)
+        return payload
 
+    @staticmethod
+    @contextmanager
+    def _map_errors() -> Iterator[None]:
         try:
-            resp = self._client.chat.completions.create(**payload)
+            yield
+        except (BadRequestError, AuthenticationError) as e:
+            # Client side configuration/params issue; checked first as both
+            # are ``APIError`` subclasses
+            raise LLMClientError(str(e)) from e
         except (APITimeoutError, APIConnectionError, RateLimitError, APIError) as e:
             # Transport / server side issues
             raise LLMHTTPError(str(e)) from e
-        except (BadRequestError, AuthenticationError) as e:
-            # Client side configuration/params issue
-            raise LLMClientError(str(e)) from e
         except OpenAIError as e:
             # Any other provider-specific error
             raise LLMInvalidResponseError(str(e)) from e
         except Exception as e:  # Safety net
             raise LLMClientError(str(e)) from e
 
+    @staticmethod
+    def _to_chat_result(resp: Any, model: str) -> ChatResult:
         # Extract first choice content safely
         content = ""
         finish_reason: str | None = None
@@ -100,22 +604,7 @@ class OpenAIClient(LLMClient):
             ) from None
 
         # Usage metrics
-        usage_obj = getattr(resp, "usage", None)
-        usage: dict[str, Any] | None = None
-        if usage_obj is not None:
-            try:
-                if hasattr(usage_obj, "model_dump"):
-                    usage = usage_obj.model_dump()
-                elif hasattr(usage_obj, "to_dict"):
-                    usage = usage_obj.to_dict()
-                else:
-                    usage = {
-                        k: getattr(usage_obj, k)
-                        for k in ("prompt_tokens", "completion_tokens", "total_tokens")
-                        if hasattr(usage_obj, k)
-                    }
-            except Exception:
-                usage = None
+        usage = _usage_dict(getattr(resp, "usage", None))
 
         model_id = getattr(resp, "model", model)
         try:
@@ -130,3 +619,161 @@ class OpenAIClient(LLMClient):
             usage=usage,
             raw=raw_min,
         )
+
+
+def _retry_after(error: BaseException) -> float | None:
+    """Seconds the provider asked to wait, from ``Retry-After(-Ms)`` headers."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _batch_item_result(item: dict[str, Any]) -> ChatResult | Exception:
+    """``ChatResult`` of one batch output line, or the error it reports."""
+    response = item.get("response") or {}
+    status = response.get("status_code")
+    body = response.get("body") or {}
+    if item.get("error") or status != 200:
+        error = item.get("error") or body.get("error") or {}
+        message = error.get("message") or f"batch request failed with {status}"
+        if status is not None and 400 <= status < 500 and status != 429:
+            return LLMClientError(message)
+        return LLMHTTPError(message)
+    try:
+        return OpenAIClient._to_chat_result(
+            ChatCompletion.model_validate(body), body.get("model", "")
+        )
+    except (ValueError, LLMInvalidResponseError) as e:
+        return LLMInvalidResponseError(str(e))
+
+
+def _pool_connections(sdk_client: Any) -> list[Any]:
+    # httpx exposes no pool API; read httpcore's pool behind the transport
+    try:
+        return list(sdk_client._client._transport._pool.connections)
+    except AttributeError:
+        return []
+
+
+def _usage_dict(usage_obj: Any) -> dict[str, Any] | None:
+    if usage_obj is None:
+        return None
+    try:
+        if hasattr(usage_obj, "model_dump"):
+            return usage_obj.model_dump()
+        if hasattr(usage_obj, "to_dict"):
+            return usage_obj.to_dict()
+        return {
+            k: getattr(usage_obj, k)
+            for k in ("prompt_tokens", "completion_tokens", "total_tokens")
+            if hasattr(usage_obj, k)
+        }
+    except Exception:
+        return None
+
+
+class _StreamAccumulator:
+    """Collects the chunks of a streamed completion into a ``ChatResult``."""
+
+    def __init__(self, model: str) -> None:
+        self._parts: list[str] = []
+        self._model = model
+        self._id: str | None = None
+        self._finish_reason: str | None = None
+        self._usage: dict[str, Any] | None = None
+
+    def absorb(self, chunk: Any) -> str:
+        self._id = getattr(chunk, "id", None) or self._id
+        self._model = getattr(chunk, "model", None) or self._model
+        usage = _usage_dict(getattr(chunk, "usage", None))
+        if usage is not None:
+            self._usage = usage
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            return ""
+        choice = choices[0]
+        self._finish_reason = getattr(choice, "finish_reason", None) or (
+            self._finish_reason
+        )
+        text = getattr(getattr(choice, "delta", None), "content", None) or ""
+        self._parts.append(text)
+        return text
+
+    def result(self) -> ChatResult:
+        return ChatResult(
+            content="".join(self._parts),
+            model=self._model,
+            finish_reason=self._finish_reason,
+            usage=self._usage,
+            raw={"id": self._id},
+        )
+
+
+class OpenAIChatStream(_StreamAccumulator):
+    """``ChatStream`` over an SDK ``Stream``; ``close`` drops the connection
+    and passes the result so far to ``settle``, once.
+    """
+
+    def __init__(
+        self,
+        stream: Any,
+        model: str,
+        settle: Callable[[ChatResult], None] | None = None,
+    ) -> None:
+        super().__init__(model)
+        self._stream = stream
+        self._settle = settle
+
+    def __iter__(self) -> Iterator[str]:
+        with OpenAIClient._map_errors():
+            for chunk in self._stream:
+                text = self.absorb(chunk)
+                if text:
+                    yield text
+
+    def close(self) -> None:
+        self._stream.close()
+        settle, self._settle = self._settle, None
+        if settle is not None:
+            settle(self.result())
+
+
+class AsyncOpenAIChatStream(_StreamAccumulator):
+    """Async counterpart of ``OpenAIChatStream``."""
+
+    def __init__(
+        self,
+        stream: Any,
+        model: str,
+        settle: Callable[[ChatResult], Awaitable[None]] | None = None,
+    ) -> None:
+        super().__init__(model)
+        self._stream = stream
+        self._settle = settle
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        with OpenAIClient._map_errors():
+            async for chunk in self._stream:
+                text = self.absorb(chunk)
+                if text:
+                    yield text
+
+    async def aclose(self) -> None:
+        await self._stream.close()
+        settle, self._settle = self._settle, None
+        if settle is not None:
+            await settle(self.result())
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import os
+import struct
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+from typing import Protocol
+
+from libs.clients.llm_client.interface import ChatMessage
+from libs.clients.llm_client.tokens import count_message_tokens
+
+
+class BucketLevels(NamedTuple):
+    requests: float
+    tokens: float
+    # Wall-clock time of the last update, comparable across processes
+    updated: float
+
+
+class BucketStore(Protocol):
+    """Holds the bucket levels; ``update`` is atomic across its users."""
+
+    def update(
+        self,
+        change: Callable[[BucketLevels | None], tuple[BucketLevels, float]],
+    ) -> float: ...
+
+
+class MemoryBucketStore:
+    """``BucketStore`` for the threads of one process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._levels: BucketLevels | None = None
+
+    def update(
+        self,
+        change: Callable[[BucketLevels | None], tuple[BucketLevels, float]],
+    ) -> float:
+        with self._lock:
+            self._levels, wait = change(self._levels)
+        return wait
+
+
+class FileBucketStore:
+    """``BucketStore`` in a small file shared by every worker on the host.
+
+    Each update opens the file and holds an exclusive ``flock`` while it
+    reads and rewrites the levels, so it is safe across processes, threads
+    and forks alike.
+    """
+
+    _FORMAT = struct.Struct("<ddd")
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = str(path)
+
+    def update(
+        self,
+        change: Callable[[BucketLevels | None], tuple[BucketLevels, float]],
+    ) -> float:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            data = os.pread(fd, self._FORMAT.size, 0)
+            levels = (
+                BucketLevels(*self._FORMAT.unpack(data))
+                if len(data) == self._FORMAT.size
+                else None
+            )
+            levels, wait = change(levels)
+            os.pwrite(fd, self._FORMAT.pack(*levels), 0)
+            return wait
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+
+class RateLimiter:
+    """Token bucket over requests and estimated tokens per minute.
+
+    Both buckets refill continuously at their per-minute rate and hold at
+    most ``burst_seconds`` worth of it. ``reserve`` takes its share at once,
+    letting a bucket go into debt, and returns how long the caller must wait
+    for that debt to refill: concurrent callers queue up in the order they
+    reserved and are admitted at the sustained rate instead of bursting into
+    provider 429s. A limit of 0 leaves that dimension unlimited.
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        burst_seconds: float = 10.0,
+        store: BucketStore | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        if burst_seconds <= 0:
+            raise ValueError("burst_seconds must be positive")
+        self.requests_per_second = requests_per_minute / 60
+        self.tokens_per_second = tokens_per_minute / 60
+        self.request_capacity = max(1.0, self.requests_per_second * burst_seconds)
+        self.token_capacity = self.tokens_per_second * burst_seconds
+        self.store = store or MemoryBucketStore()
+        self._clock = clock
+
+    def reserve(self, tokens: int = 0, requests: int = 1) -> float:
+        """Take capacity for a call; returns the seconds to wait before it."""
+        tokens = self._charge(tokens)
+        return self.store.update(lambda levels: self._take(levels, requests, tokens))
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct a reservation once the call reports its real token usage."""
+        extra = self._charge(actual) - self._charge(estimated)
+        self.store.update(lambda levels: self._take(levels, 0, extra))
+
+    async def asettle(self, estimated: int, actual: int) -> None:
+        await asyncio.to_thread(self.settle, estimated, actual)
+
+    def _charge(self, tokens: int) -> int:
+        # A call larger than the bucket only waits for a full one
+        if self.token_capacity:
+            return min(tokens, int(self.token_capacity))
+        return tokens
+
+    def acquire(self, tokens: int = 0) -> float:
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        # The store may lock and read a file; only the wait runs on the loop
+        wait = await asyncio.to_thread(self.reserve, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def _take(
+        self, levels: BucketLevels | None, requests: int, tokens: int
+    ) -> tuple[BucketLevels, float]:
+        now = self._clock()
+        if levels is None:
+            levels = BucketLevels(self.request_capacity, self.token_capacity, now)
+        elapsed = max(0.0, now - levels.updated)
+        request_level, request_wait = self._drain(
+            levels.requests,
+            requests,
+            elapsed * self.requests_per_second,
+            self.requests_per_second,
+            self.request_capacity,
+        )
+        token_level, token_wait = self._drain(
+            levels.tokens,
+            tokens,
+            elapsed * self.tokens_per_second,
+            self.tokens_per_second,
+            self.token_capacity,
+        )
+        return (
+            BucketLevels(request_level, token_level, now),
+            max(request_wait, token_wait),
+        )
+
+    @staticmethod
+    def _drain(
+        level: float, amount: float, refill: float, rate: float, capacity: float
+    ) -> tuple[float, float]:
+        if not rate:
+            return 0.0, 0.0
+        # Refunds (negative amounts) never overfill the bucket either
+        level = min(capacity, min(capacity, level + refill) - amount)
+        return level, max(0.0, -level / rate)
+
+
+def estimate_call_tokens(
+    messages: list[ChatMessage],
+    model: str = "",
+    max_tokens: int | None = None,
+    completion_tokens: int = 256,
+) -> int:
+    """Tokens a call is charged before it runs: the prompt plus ``max_tokens``,
+    or ``completion_tokens`` when unset.
+    """
+    completion = completion_tokens if max_tokens is None else max_tokens
+    return count_message_tokens(messages, model) + completion
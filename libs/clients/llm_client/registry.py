@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections.abc import Callable
+from typing import Any
+from typing import NamedTuple
+
+from libs.clients.llm_client.providers.openai_client import OpenAIClient
+
+
+class ClientKey(NamedTuple):
+    provider: str
+    base_url: str
+    # Hash rather than the key itself, so stats and logs never show it
+    api_key_hash: str
+    timeout: float | None
+
+
+def api_key_hash(api_key: str | None) -> str:
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+class ClientRegistry:
+    """Process-wide provider clients, one per ``ClientKey``.
+
+    Sharing a client shares its keep-alive connection pool, so calls after
+    the first skip the TCP and TLS handshakes, and one rate limiter and
+    circuit breaker cover every caller. After ``os.fork`` (e.g. gunicorn
+    with ``preload_app``) every client rebuilds its pools in the child, see
+    ``OpenAIClient.reset_after_fork``.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._clients: dict[ClientKey, Any] = {}
+
+    def get(self, key: ClientKey, factory: Callable[[], Any]) -> Any:
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._clients[key] = factory()
+        return client
+
+    def openai(
+        self,
+        *,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        timeout: float | None = None,
+        build_options: Callable[[], dict[str, Any]] | None = None,
+        **options: Any,
+    ) -> OpenAIClient:
+        """Shared ``OpenAIClient``; ``options`` (pool ``limits``,
+        ``rate_limiter``, ``retry_policy``, ``circuit_breaker``) only apply
+        when the client is created. ``build_options`` returns more of them
+        and is only called then, so callers that build the options on every
+        lookup do not throw them away.
+        """
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        base_url = base_url or os.getenv("OPENAI_BASE_URL")
+        key = ClientKey("openai", base_url or "", api_key_hash(api_key), timeout)
+
+        def factory() -> OpenAIClient:
+            built = build_options() if build_options is not None else {}
+            return OpenAIClient(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=timeout,
+                **options,
+                **built,
+            )
+
+        return self.get(key, factory)
+
+    def stats(self) -> list[dict[str, Any]]:
+        with self._lock:
+            clients = list(self._clients.items())
+        return [
+            {
+                "provider": key.provider,
+                "base_url": key.base_url,
+                "timeout": key.timeout,
+                **client.pool_stats(),
+            }
+            for key, client in clients
+        ]
+
+    def after_fork(self) -> None:
+        # The parent's lock may have been held by another thread at fork time
+        self._lock = threading.Lock()
+        for client in self._clients.values():
+            client.reset_after_fork()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+client_registry = ClientRegistry()
+os.register_at_fork(after_in_child=client_registry.after_fork)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from dataclasses import field
+
+from libs.clients.llm_client.exceptions import LLMCircuitOpenError
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """When and how long to wait before retrying a failed provider call.
+
+    Errors of the ``retry_on`` classes are retried up to ``max_attempts``
+    calls in total. Waits use full jitter, a uniform draw from zero up to
+    ``base_delay * 2 ** retry`` capped at ``max_delay``, so clients that
+    failed together do not retry together. A ``Retry-After`` the provider
+    sent is waited out in full. No retry starts if it could not begin
+    before ``deadline`` seconds from the first attempt.
+    """
+
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    deadline: float | None = 60.0
+    retry_on: tuple[type[BaseException], ...] = ()
+    rng: random.Random = field(default_factory=random.Random, compare=False)
+
+    def backoff(self, retry: int) -> float:
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+    def next_delay(
+        self,
+        error: BaseException,
+        attempt: int,
+        elapsed: float,
+        retry_after: float | None = None,
+    ) -> float | None:
+        """Seconds to wait before retrying after ``attempt`` failed with
+        ``error``, or ``None`` to give up.
+        """
+        if not isinstance(error, self.retry_on) or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt - 1)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if self.deadline is not None and elapsed + delay >= self.deadline:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """Fails calls fast while the provider keeps failing.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    ``before_call`` raises ``LLMCircuitOpenError`` for ``reset_timeout``
+    seconds. Then a single probe call is let through: its success closes
+    the circuit; its failure, or any other exit such as cancellation,
+    opens it for another ``reset_timeout``.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            if (
+                self._state == self.OPEN
+                and self._clock() - self._opened_at >= self.reset_timeout
+            ):
+                # This caller is the probe; others keep failing fast
+                self._state = self.HALF_OPEN
+                return
+        raise LLMCircuitOpenError()
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if (
+                self._state == self.HALF_OPEN
+                or self._failures >= self.failure_threshold
+            ):
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def record_abandoned(self) -> None:
+        """A call ended without an outcome, e.g. it was cancelled.
+
+        An abandoned probe re-opens the circuit so the next probe can run
+        after ``reset_timeout``; other calls leave the state as it is.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def reset(self) -> None:
+        self.record_success()
@@ -0,0 +1,74 @@
+from django.test import TestCase
+
+from libs.clients.llm_client.exceptions import LLMClientError
+from libs.clients.llm_client.exceptions import LLMHTTPError
+from libs.clients.llm_client.interface import BatchRequest
+from libs.clients.llm_client.local_batch import LocalBatchServer
+from libs.clients.llm_client.local_batch import echo_completion
+from libs.clients.llm_client.providers.openai_client import OpenAIClient
+from libs.clients.llm_client.rate_limit import RateLimiter
+
+
+def respond(body):
+    if body["model"] == "unknown":
+        return 400, {"error": {"message": "unknown model"}}
+    return echo_completion(body)
+
+
+class TestChatBatch(TestCase):
+    def setUp(self):
+        self.server = LocalBatchServer(respond, polls_until_done=2).start()
+        self.addCleanup(self.server.stop)
+        self.client = OpenAIClient(api_key="test", base_url=self.server.base_url)
+
+    def request(self, custom_id, content, model="m"):
+        return BatchRequest(
+            custom_id,
+            {
+                "model": model,
+                "messages": [{"role": "user", "content": content}],
+                "temperature": 0,
+                "response_format": "json",
+            },
+        )
+
+    def test_results_are_mapped_back_by_custom_id(self):
+        results = self.client.chat_batch(
+            [
+                self.request("a", "first"),
+                self.request("b", "second"),
+                self.request("c", "third", model="unknown"),
+            ],
+            poll_interval=0,
+        )
+
+        assert results["a"]["content"] == "first"
+        assert results["b"]["content"] == "second"
+        assert results["b"]["model"] == "m"
+        assert results["b"]["usage"]["total_tokens"] == 2
+        assert isinstance(results["c"], LLMClientError)
+        assert "unknown model" in str(results["c"])
+
+    def test_the_job_carries_full_chat_payloads(self):
+        batch_id = self.client.submit_batch([self.request("a", "hi")])
+        batch = self.server.batches[batch_id]
+        lines = self.server.files[batch["input_file_id"]].decode().splitlines()
+
+        assert batch["endpoint"] == "/v1/chat/completions"
+        assert '"response_format": {"type": "json_object"}' in lines[0]
+        assert '"custom_id": "a"' in lines[0]
+
+    def test_unfinished_job_times_out(self):
+        self.server.polls_until_done = 100
+        batch_id = self.client.submit_batch([self.request("a", "hi")])
+
+        with self.assertRaises(LLMHTTPError):
+            self.client.wait_batch(batch_id, poll_interval=0.01, timeout=0.05)
+
+    def test_batches_bypass_the_live_rate_limiter(self):
+        limiter = RateLimiter(requests_per_minute=60, clock=lambda: 1000.0)
+        self.client.rate_limiter = limiter
+
+        self.client.chat_batch([self.request("a", "hi")], poll_interval=0)
+
+        assert limiter.store._levels is None
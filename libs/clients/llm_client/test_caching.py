@@ -0,0 +1,138 @@
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+from django.test import TestCase
+
+from libs.clients.llm_client.caching import CachingLLMClient
+from libs.clients.llm_client.caching import SQLiteCacheStore
+from libs.clients.llm_client.caching import request_key
+
+MESSAGES = [{"role": "system", "content": "Analyze"}, {"role": "user", "content": "hi"}]
+
+
+class CountingClient:
+    def __init__(self):
+        self.calls = 0
+
+    def chat(self, *, model, messages, **kwargs):
+        self.calls += 1
+        return {"content": f"reply {self.calls}", "model": model}
+
+
+class ThreadRecordingStore(SQLiteCacheStore):
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get(self, key):
+        self.threads.append(threading.get_ident())
+        return super().get(key)
+
+    def set(self, key, result, ttl):
+        self.threads.append(threading.get_ident())
+        super().set(key, result, ttl)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CachingLLMClientTest(TestCase):
+    def setUp(self):
+        self.inner = CountingClient()
+        self.clock = FakeClock()
+        self.client = CachingLLMClient(
+            self.inner, max_entries=2, ttl=60, clock=self.clock
+        )
+
+    def test_request_key_covers_every_option(self):
+        base = request_key(model="gpt", messages=MESSAGES, temperature=0)
+
+        assert base == request_key(model="gpt", messages=MESSAGES, temperature=0)
+        assert base != request_key(model="gpt", messages=MESSAGES, temperature=0.5)
+        assert base != request_key(
+            model="gpt", messages=MESSAGES, temperature=0, response_format="json"
+        )
+        assert base != request_key(model="gpt", messages=MESSAGES[::-1], temperature=0)
+
+    def test_only_deterministic_calls_are_cached(self):
+        first = self.client.chat(model="gpt", messages=MESSAGES, temperature=0)
+        second = self.client.chat(model="gpt", messages=MESSAGES, temperature=0)
+        assert second == {**first, "cached": True}
+        assert "cached" not in first
+        assert self.inner.calls == 1
+
+        self.client.chat(model="gpt", messages=MESSAGES, temperature=0.7)
+        self.client.chat(model="gpt", messages=MESSAGES, temperature=None)
+        assert self.inner.calls == 3
+
+    def test_validated_only_caches_confirmed_results(self):
+        client = CachingLLMClient(self.inner, validated_only=True, clock=self.clock)
+
+        first = client.chat(model="gpt", messages=MESSAGES, temperature=0)
+        client.chat(model="gpt", messages=MESSAGES, temperature=0)
+        assert self.inner.calls == 2
+
+        client.confirm(first, model="gpt", messages=MESSAGES, temperature=0)
+        hit = client.chat(model="gpt", messages=MESSAGES, temperature=0)
+        assert hit == {**first, "cached": True}
+        assert self.inner.calls == 2
+
+    def test_lru_eviction_and_ttl(self):
+        for model in ("a", "b", "a", "c"):
+            self.client.chat(model=model, messages=MESSAGES, temperature=0)
+        assert self.inner.calls == 3
+
+        # "b" was least recently used when "c" arrived
+        self.client.chat(model="b", messages=MESSAGES, temperature=0)
+        assert self.inner.calls == 4
+
+        self.clock.now += 61
+        self.client.chat(model="b", messages=MESSAGES, temperature=0)
+        assert self.inner.calls == 5
+
+    def test_async_chat_uses_same_cache(self):
+        self.client.chat(model="gpt", messages=MESSAGES, temperature=0)
+
+        result = asyncio.run(
+            self.client.achat(model="gpt", messages=MESSAGES, temperature=0)
+        )
+
+        assert result["content"] == "reply 1"
+        assert self.inner.calls == 1
+
+    def test_sqlite_store_is_shared_between_clients(self):
+        path = Path(tempfile.mkdtemp()) / "llm_cache.sqlite3"
+        first = CachingLLMClient(self.inner, store=SQLiteCacheStore(path))
+        second = CachingLLMClient(self.inner, store=SQLiteCacheStore(path))
+
+        first.chat(model="gpt", messages=MESSAGES, temperature=0)
+        result = second.chat(model="gpt", messages=MESSAGES, temperature=0)
+
+        assert result["content"] == "reply 1"
+        assert self.inner.calls == 1
+        assert second.hits == 1
+
+    def test_async_calls_reach_the_store_off_the_event_loop(self):
+        store = ThreadRecordingStore(Path(tempfile.mkdtemp()) / "llm_cache.sqlite3")
+        client = CachingLLMClient(self.inner, store=store, validated_only=True)
+        other = CachingLLMClient(self.inner, store=store)
+        kwargs = {"model": "gpt", "messages": MESSAGES, "temperature": 0}
+
+        async def run():
+            result = await client.achat(**kwargs)
+            await client.aconfirm(result, **kwargs)
+            hit = await other.achat(**kwargs)
+            return hit, threading.get_ident()
+
+        hit, loop_thread = asyncio.run(run())
+
+        assert hit == {"content": "reply 1", "model": "gpt", "cached": True}
+        assert len(store.threads) == 3
+        assert loop_thread not in store.threads
@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.test import TestCase
+
+from libs.clients.llm_client.coalescing import CoalescingLLMClient
+
+MESSAGES = [{"role": "system", "content": "Analyze"}, {"role": "user", "content": "hi"}]
+
+
+class GatedClient:
+    """Counts calls and holds each one until ``release`` is set."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self.fail = False
+
+    def chat(self, *, model, messages, **kwargs):
+        self.calls += 1
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {"content": f"reply {self.calls}", "model": model}
+
+    async def achat(self, *, model, messages, **kwargs):
+        self.calls += 1
+        while not self.release.is_set():
+            await asyncio.sleep(0.01)
+        return {"content": f"reply {self.calls}", "model": model}
+
+
+class CoalescingLLMClientTest(TestCase):
+    def setUp(self):
+        self.inner = GatedClient()
+        self.client = CoalescingLLMClient(self.inner)
+
+    def chat_in_threads(self, count, **kwargs):
+        with ThreadPoolExecutor(count) as pool:
+            futures = [
+                pool.submit(self.client.chat, model="m", messages=MESSAGES, **kwargs)
+                for _ in range(count)
+            ]
+            # Every caller is either in flight or waiting on the flight
+            while self.client.calls + self.client.coalesced < count:
+                time.sleep(0.01)
+            self.inner.release.set()
+            return [future.exception() or future.result() for future in futures]
+
+    def test_concurrent_identical_calls_share_one_upstream_call(self):
+        results = self.chat_in_threads(4, temperature=0)
+
+        assert self.inner.calls == 1
+        assert [r["content"] for r in results] == ["reply 1"] * 4
+        # Only the caller that made the call reports its usage
+        assert sum(not r.get("cached") for r in results) == 1
+        assert (self.client.calls, self.client.coalesced) == (1, 3)
+        assert self.client.in_flight == 0
+
+    def test_errors_reach_every_waiting_caller(self):
+        self.inner.fail = True
+
+        results = self.chat_in_threads(3, temperature=0)
+
+        assert self.inner.calls == 1
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert self.client.in_flight == 0
+
+    def test_sampled_calls_are_not_coalesced(self):
+        self.inner.release.set()
+
+        self.client.chat(model="m", messages=MESSAGES, temperature=0.7)
+        self.client.chat(model="m", messages=MESSAGES, temperature=0.7)
+
+        assert self.inner.calls == 2
+        assert self.client.calls == 0
+
+    def test_async_callers_on_one_loop_share_the_call(self):
+        async def run():
+            calls = [
+                self.client.achat(model="m", messages=MESSAGES, temperature=0)
+                for _ in range(3)
+            ]
+            other = self.client.achat(model="other", messages=MESSAGES, temperature=0)
+            asyncio.get_running_loop().call_later(0.05, self.inner.release.set)
+            return await asyncio.gather(*calls, other)
+
+        results = asyncio.run(run())
+
+        assert self.inner.calls == 2
+        assert [r["model"] for r in results] == ["m", "m", "m", "other"]
+        assert self.client.coalesced == 2
+        assert self.client.in_flight == 0
+
+    def test_a_cancelled_waiter_does_not_cancel_the_call(self):
+        async def run():
+            first = asyncio.ensure_future(
+                self.client.achat(model="m", messages=MESSAGES, temperature=0)
+            )
+            second = asyncio.ensure_future(
+                self.client.achat(model="m", messages=MESSAGES, temperature=0)
+            )
+            await asyncio.sleep(0.01)
+            first.cancel()
+            self.inner.release.set()
+            return await second
+
+        result = asyncio.run(run())
+
+        assert result["content"] == "reply 1"
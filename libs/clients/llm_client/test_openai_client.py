@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from libs.clients.llm_client.exceptions import LLMClientError
+from libs.clients.llm_client.providers.openai_client import OpenAIClient
+from libs.clients.llm_client.rate_limit import RateLimiter
+from libs.clients.llm_client.rate_limit import estimate_call_tokens
+from libs.clients.llm_client.tokens import count_tokens
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        # Scripted failures queued by the test, e.g. (503, {}) or (429, headers)
+        failures = getattr(self.server, "failures", [])
+        headers = {}
+        if failures:
+            status, headers = failures.pop(0)
+            body = {"error": {"message": "try again"}}
+        elif request["model"] == "unknown":
+            status, body = 400, {"error": {"message": "unknown model"}}
+        else:
+            status, body = (
+                200,
+                {
+                    "id": "chatcmpl-1",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": request["model"],
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": request["messages"][-1]["content"],
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 3,
+                        "completion_tokens": 1,
+                        "total_tokens": 4,
+                    },
+                },
+            )
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def chunk(text="", usage=None):
+    choice = SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=None)
+    return SimpleNamespace(
+        id="chatcmpl-1", model="m", usage=usage, choices=[choice] if text else []
+    )
+
+
+class SdkStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+
+class TestAsyncOpenAIClient(TestCase):
+    def setUp(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), ChatHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.client = OpenAIClient(
+            api_key="test", base_url=f"http://127.0.0.1:{server.server_port}/v1"
+        )
+
+    def test_concurrent_calls_share_the_loop_pool(self):
+        async def run():
+            results = await asyncio.gather(
+                *(
+                    self.client.achat(
+                        model="m", messages=[{"role": "user", "content": str(i)}]
+                    )
+                    for i in range(5)
+                )
+            )
+            return results, self.client.async_client
+
+        results, loop_client = asyncio.run(run())
+
+        assert [r["content"] for r in results] == ["0", "1", "2", "3", "4"]
+        assert results[0]["usage"]["prompt_tokens"] == 3
+        assert self.client.pool_stats()["requests"] == 5
+        # A new event loop gets its own pool
+        _, other_client = asyncio.run(run())
+        assert other_client is not loop_client
+
+    def test_errors_map_like_chat(self):
+        messages = [{"role": "user", "content": "hi"}]
+
+        with self.assertRaises(LLMClientError):
+            self.client.chat(model="unknown", messages=messages)
+        with self.assertRaises(LLMClientError):
+            asyncio.run(self.client.achat(model="unknown", messages=messages))
+
+    def test_rate_limiter_is_charged_the_reported_usage(self):
+        limiter = RateLimiter(tokens_per_minute=600, clock=lambda: 1000.0)
+        self.client.rate_limiter = limiter
+
+        self.client.chat(model="m", messages=[{"role": "user", "content": "hi"}])
+
+        assert limiter.store._levels.tokens == limiter.token_capacity - 4
+
+    def test_streams_are_settled_when_closed(self):
+        limiter = RateLimiter(tokens_per_minute=6000, clock=lambda: 1000.0)
+        self.client.rate_limiter = limiter
+        messages = [{"role": "user", "content": "hi"}]
+        usage = SimpleNamespace(prompt_tokens=3, completion_tokens=2, total_tokens=5)
+        chunks = [chunk("Fine,"), chunk(" thanks."), chunk(usage=usage)]
+        sdk_completions = self.client._client.chat.completions
+
+        with patch.object(sdk_completions, "create", return_value=SdkStream(chunks)):
+            stream = self.client.stream_chat(model="m", messages=messages)
+            list(stream)
+            stream.close()
+            assert limiter.store._levels.tokens == limiter.token_capacity - 5
+
+            # Aborted before the usage chunk: the prompt and the text so far
+            stream = self.client.stream_chat(model="m", messages=messages)
+            next(iter(stream))
+            stream.close()
+            stream.close()
+
+        charged = estimate_call_tokens(
+            messages, "m", completion_tokens=count_tokens("Fine,", "m")
+        )
+        assert limiter.store._levels.tokens == limiter.token_capacity - 5 - charged
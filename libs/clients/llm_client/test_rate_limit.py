@@ -0,0 +1,116 @@
+import asyncio
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.test import TestCase
+
+from libs.clients.llm_client.rate_limit import FileBucketStore
+from libs.clients.llm_client.rate_limit import MemoryBucketStore
+from libs.clients.llm_client.rate_limit import RateLimiter
+from libs.clients.llm_client.rate_limit import estimate_call_tokens
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ThreadRecordingStore(MemoryBucketStore):
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def update(self, change):
+        self.threads.append(threading.get_ident())
+        return super().update(change)
+
+
+class TestRateLimiter(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_requests_beyond_the_burst_are_spaced_out(self):
+        limiter = RateLimiter(
+            requests_per_minute=60, burst_seconds=2.0, clock=self.clock
+        )
+
+        assert [limiter.reserve() for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+        self.clock.now += 10
+        assert limiter.reserve() == 0.0
+
+    def test_tokens_are_settled_against_usage(self):
+        limiter = RateLimiter(
+            tokens_per_minute=600, burst_seconds=10.0, clock=self.clock
+        )
+
+        assert limiter.reserve(80) == 0.0
+        assert limiter.reserve(80) == 6.0
+        # The second call only used 20 of its 80 tokens
+        limiter.settle(80, 20)
+        assert limiter.reserve(0) == 0.0
+
+    def test_async_calls_keep_store_updates_off_the_event_loop(self):
+        store = ThreadRecordingStore()
+        limiter = RateLimiter(tokens_per_minute=600, store=store, clock=self.clock)
+
+        async def run():
+            await limiter.aacquire(80)
+            await limiter.asettle(80, 20)
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+
+        assert len(store.threads) == 2
+        assert loop_thread not in store.threads
+
+    def test_calls_larger_than_the_bucket_wait_for_a_full_one(self):
+        limiter = RateLimiter(tokens_per_minute=60, burst_seconds=5.0, clock=self.clock)
+
+        assert limiter.reserve(1000) == 0.0
+        assert limiter.reserve(1) == 1.0
+
+    def test_estimate_includes_the_completion(self):
+        messages = [{"role": "user", "content": "hello"}]
+
+        assert (
+            estimate_call_tokens(messages, max_tokens=50)
+            - estimate_call_tokens(messages, completion_tokens=0)
+            == 50
+        )
+
+
+class TestFileBucketStore(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / "bucket"
+        self.clock = FakeClock()
+
+    def limiter(self):
+        return RateLimiter(
+            requests_per_minute=60,
+            burst_seconds=1.0,
+            store=FileBucketStore(self.path),
+            clock=self.clock,
+        )
+
+    def test_workers_share_one_bucket(self):
+        first, second = self.limiter(), self.limiter()
+
+        assert first.reserve() == 0.0
+        assert second.reserve() == 1.0
+        assert first.reserve() == 2.0
+
+    def test_forked_worker_draws_from_the_same_bucket(self):
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - child
+            os._exit(int(self.limiter().reserve() != 0.0))
+        _, status = os.waitpid(pid, 0)
+
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert self.limiter().reserve() == 1.0
@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import httpx
+from django.test import TestCase
+
+from libs.clients.llm_client.registry import ClientRegistry
+
+COMPLETION = {
+    "id": "chatcmpl-1",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "test-model",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": "Hello!"},
+            "finish_reason": "stop",
+        }
+    ],
+}
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps the connection open between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestClientRegistry(TestCase):
+    def setUp(self):
+        self.registry = ClientRegistry()
+
+    def test_clients_are_shared_per_key(self):
+        client = self.registry.openai(api_key="a", base_url="http://llm.test/v1")
+
+        assert self.registry.openai(api_key="a", base_url="http://llm.test/v1") is (
+            client
+        )
+        assert self.registry.openai(api_key="b", base_url="http://llm.test/v1") is not (
+            client
+        )
+        assert (
+            self.registry.openai(api_key="a", base_url="http://llm.test/v1", timeout=5)
+            is not client
+        )
+
+    def test_options_are_built_once_per_client(self):
+        built = []
+
+        def build_options():
+            built.append(1)
+            return {"limits": httpx.Limits(max_connections=7)}
+
+        client = self.registry.openai(
+            api_key="a", base_url="http://llm.test/v1", build_options=build_options
+        )
+        again = self.registry.openai(
+            api_key="a", base_url="http://llm.test/v1", build_options=build_options
+        )
+
+        assert again is client
+        assert len(built) == 1
+        assert client.limits.max_connections == 7
+
+    def test_calls_reuse_pooled_connections(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), CompletionHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = self.registry.openai(
+            api_key="a",
+            base_url=f"http://127.0.0.1:{server.server_port}/v1",
+            limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+        )
+
+        for _ in range(3):
+            result = client.chat(model="test-model", messages=[])
+            assert result["content"] == "Hello!"
+
+        [stats] = self.registry.stats()
+        assert stats["requests"] == 3
+        assert stats["connections"] == 1
+        assert stats["idle_connections"] == 1
+        assert stats["max_connections"] == 4
+
+    def test_forked_child_gets_fresh_pools(self):
+        client = self.registry.openai(api_key="a", base_url="http://llm.test/v1")
+        parent_pool = client._client
+
+        self.registry.after_fork()
+
+        assert client._client is not parent_pool
+        assert client.pool_stats()["requests"] == 0
+        assert self.registry.openai(api_key="a", base_url="http://llm.test/v1") is (
+            client
+        )
+
+    def test_fork_hook_is_registered(self):
+        from libs.clients.llm_client.registry import client_registry
+
+        client = client_registry.openai(api_key="fork", base_url="http://llm.test/v1")
+        self.addCleanup(client_registry.clear)
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover - child
+            os.close(read_fd)
+            fresh = client._client is not client._inherited[-1][0]
+            os.write(write_fd, b"1" if fresh else b"0")
+            os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_fd, "rb") as pipe:
+            assert pipe.read() == b"1"
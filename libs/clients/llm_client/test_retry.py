@@ -0,0 +1,184 @@
+import asyncio
+import random
+import threading
+from http.server import ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.test import TestCase
+from openai import APIConnectionError
+from openai import BadRequestError
+
+from libs.clients.llm_client.exceptions import LLMCircuitOpenError
+from libs.clients.llm_client.exceptions import LLMClientError
+from libs.clients.llm_client.exceptions import LLMHTTPError
+from libs.clients.llm_client.providers.openai_client import RETRYABLE_ERRORS
+from libs.clients.llm_client.providers.openai_client import OpenAIClient
+from libs.clients.llm_client.rate_limit import RateLimiter
+from libs.clients.llm_client.retry import CircuitBreaker
+from libs.clients.llm_client.retry import RetryPolicy
+from libs.clients.llm_client.test_openai_client import ChatHandler
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def connection_error():
+    return APIConnectionError(request=None)
+
+
+class TestRetryPolicy(TestCase):
+    def policy(self, **kwargs):
+        return RetryPolicy(
+            retry_on=(APIConnectionError,), rng=random.Random(0), **kwargs
+        )
+
+    def test_full_jitter_stays_under_the_capped_exponential(self):
+        policy = self.policy(base_delay=1.0, max_delay=5.0)
+
+        for retry, cap in [(0, 1.0), (1, 2.0), (2, 4.0), (6, 5.0)]:
+            delays = [policy.backoff(retry) for _ in range(200)]
+            assert all(0 <= delay <= cap for delay in delays)
+            assert max(delays) > cap / 2
+
+    def test_gives_up_on_other_errors_and_after_the_last_attempt(self):
+        policy = self.policy(max_attempts=3)
+
+        assert policy.next_delay(ValueError(), 1, 0.0) is None
+        assert policy.next_delay(connection_error(), 2, 0.0) is not None
+        assert policy.next_delay(connection_error(), 3, 0.0) is None
+
+    def test_retry_after_is_waited_out_within_the_deadline(self):
+        policy = self.policy(base_delay=0.1, deadline=10.0)
+
+        assert policy.next_delay(connection_error(), 1, 0.0, retry_after=4.0) == 4.0
+        assert policy.next_delay(connection_error(), 1, 7.0, retry_after=4.0) is None
+
+
+class TestCircuitBreaker(TestCase):
+    def test_opens_after_consecutive_failures_and_probes_once(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0, clock=clock)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+
+        with self.assertRaises(LLMCircuitOpenError):
+            breaker.before_call()
+        clock.now = 30.0
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with self.assertRaises(LLMCircuitOpenError):
+            breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+
+        clock.now = 60.0
+        breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_abandoned_probe_reopens_the_circuit(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0, clock=clock)
+        breaker.record_failure()
+        clock.now = 30.0
+        breaker.before_call()
+
+        breaker.record_abandoned()
+
+        assert breaker.state == CircuitBreaker.OPEN
+        clock.now = 60.0
+        breaker.before_call()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+class TestOpenAIClientRetries(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), ChatHandler)
+        self.server.failures = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.breaker = CircuitBreaker(failure_threshold=3)
+        self.client = OpenAIClient(
+            api_key="test",
+            base_url=f"http://127.0.0.1:{self.server.server_port}/v1",
+            retry_policy=RetryPolicy(
+                max_attempts=3, base_delay=0.001, retry_on=RETRYABLE_ERRORS
+            ),
+            circuit_breaker=self.breaker,
+        )
+
+    def test_transient_errors_are_retried(self):
+        self.server.failures += [(503, {}), (429, {"Retry-After": "0"})]
+
+        result = self.client.chat(model="m", messages=MESSAGES)
+
+        assert result["content"] == "hi"
+        assert self.client.pool_stats()["requests"] == 3
+        assert self.breaker.state == CircuitBreaker.CLOSED
+
+    def test_client_errors_are_not_retried(self):
+        with self.assertRaises(Exception) as raised:
+            self.client.chat(model="unknown", messages=MESSAGES)
+
+        assert isinstance(raised.exception.__cause__, BadRequestError)
+        assert self.client.pool_stats()["requests"] == 1
+
+    def test_every_attempt_is_rate_limited(self):
+        limiter = RateLimiter(
+            requests_per_minute=600, tokens_per_minute=6000, clock=lambda: 1000.0
+        )
+        self.client.rate_limiter = limiter
+        self.server.failures += [(503, {}), (503, {})]
+
+        self.client.chat(model="m", messages=MESSAGES)
+
+        levels = limiter.store._levels
+        assert levels.requests == limiter.request_capacity - 3
+        # Failed attempts get their tokens back; the last is charged its usage
+        assert levels.tokens == limiter.token_capacity - 4
+
+    def test_client_errors_do_not_close_the_circuit(self):
+        self.breaker.reset_timeout = 0.0
+        for _ in range(3):
+            self.breaker.record_failure()
+
+        with self.assertRaises(LLMClientError):
+            self.client.chat(model="unknown", messages=MESSAGES)
+
+        assert self.breaker.state == CircuitBreaker.OPEN
+
+    def test_open_circuit_fails_fast(self):
+        self.server.failures += [(503, {})] * 3
+
+        with self.assertRaises(LLMHTTPError):
+            self.client.chat(model="m", messages=MESSAGES)
+        with self.assertRaises(LLMCircuitOpenError):
+            self.client.chat(model="m", messages=MESSAGES)
+        assert self.client.pool_stats()["requests"] == 3
+
+    def test_cancelled_probe_does_not_wedge_the_circuit(self):
+        self.breaker.reset_timeout = 0.0
+        for _ in range(3):
+            self.breaker.record_failure()
+        sdk_completions = self.client._client.chat.completions
+
+        with patch.object(
+            sdk_completions, "create", side_effect=asyncio.CancelledError
+        ):
+            with self.assertRaises(asyncio.CancelledError):
+                self.client.chat(model="m", messages=MESSAGES)
+
+        assert self.breaker.state == CircuitBreaker.OPEN
+        assert self.client.chat(model="m", messages=MESSAGES)["content"] == "hi"
+        assert self.breaker.state == CircuitBreaker.CLOSED
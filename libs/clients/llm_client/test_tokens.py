@@ -0,0 +1,27 @@
+from libs.clients.llm_client.tokens import MESSAGE_OVERHEAD
+from libs.clients.llm_client.tokens import REPLY_PRIMER
+from libs.clients.llm_client.tokens import count_message_tokens
+from libs.clients.llm_client.tokens import count_tokens
+
+
+def test_count_tokens_counts_indentation():
+    text = "Use only English.\nDo NOT ask any questions."
+    indented = "\n        ".join(text.splitlines())
+
+    assert count_tokens("") == 0
+    assert count_tokens(text) > 0
+    assert count_tokens(indented) > count_tokens(text)
+
+
+def test_count_message_tokens_adds_message_overhead():
+    messages = [
+        {"role": "system", "content": "You are a waiter."},
+        {"role": "user", "content": "Hello"},
+    ]
+
+    assert count_message_tokens(messages) == (
+        REPLY_PRIMER
+        + 2 * MESSAGE_OVERHEAD
+        + count_tokens("You are a waiter.")
+        + count_tokens("Hello")
+    )
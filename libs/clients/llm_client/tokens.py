@@ -0,0 +1,55 @@
+import math
+import re
+from functools import lru_cache
+
+from .interface import ChatMessage
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - optional dependency
+    tiktoken = None
+
+# Words, runs of digits, single punctuation marks and whitespace runs roughly
+# follow how BPE tokenizers split English text.
+_PIECES = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]|\s+")
+# Chat formats wrap every message in a few tokens of role markup
+MESSAGE_OVERHEAD = 4
+REPLY_PRIMER = 3
+
+
+@lru_cache(maxsize=32)
+def _encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def _estimate(text: str) -> int:
+    count = 0
+    for piece in _PIECES.findall(text):
+        if piece.isspace():
+            # A single space merges into the next word; newlines and
+            # indentation are tokens of their own
+            count += 0 if piece == " " else max(1, math.ceil(len(piece) / 4))
+        elif piece.isalpha():
+            count += max(1, math.ceil(len(piece) / 4))
+        else:
+            count += 1
+    return count
+
+
+def count_tokens(text: str, model: str = "") -> int:
+    """Token count of ``text``, exact when ``tiktoken`` is installed."""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_encoding(model).encode(text))
+    return _estimate(text)
+
+
+def count_message_tokens(messages: list[ChatMessage], model: str = "") -> int:
+    return REPLY_PRIMER + sum(
+        MESSAGE_OVERHEAD + count_tokens(message["content"], model)
+        for message in messages
+    )
@@ -0,0 +1,4 @@
+from .aho_corasick import AhoCorasick
+from .aho_corasick import normalize_phrase
+
+__all__ = ["AhoCorasick", "normalize_phrase"]
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import deque
+from collections.abc import Iterable
+from collections.abc import Iterator
+from typing import Any
+from typing import NamedTuple
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_phrase(text: str) -> str:
+    """Case-, accent- and punctuation-insensitive form of ``text``.
+
+    "Mushroom Aglio-e-Olio!" and "mushroom aglio e olio" both become
+    "mushroom aglio e olio".
+    """
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+
+class Match(NamedTuple):
+    # Offsets into the normalized text
+    start: int
+    end: int
+    value: Any
+
+
+class AhoCorasick:
+    """Multi-pattern matcher over normalized phrases.
+
+    Patterns and text go through ``normalize_phrase`` and only whole-word
+    matches count, so "ham" does not match inside "hamburger". Building is
+    linear in the total pattern length and a scan is linear in the text
+    length plus the number of matches, however many patterns there are.
+    """
+
+    def __init__(self, patterns: Iterable[tuple[str, Any]]) -> None:
+        # Trie as parallel arrays: child edges, failure link, outputs
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[tuple[int, Any]]] = [[]]
+        self.size = 0
+        for phrase, value in patterns:
+            # Pad with spaces so matches start and end on word boundaries
+            key = f" {normalize_phrase(phrase)} "
+            if key.strip():
+                self._add(key, value)
+                self.size += 1
+        self._link()
+
+    def _add(self, key: str, value: Any) -> None:
+        node = 0
+        for char in key:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = child
+        self._out[node].append((len(key), value))
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def iter_matches(self, text: str) -> Iterator[Match]:
+        """Every (possibly overlapping) match, by end offset.
+
+        Offsets are into ``normalize_phrase(text)``.
+        """
+        padded = f" {normalize_phrase(text)} "
+        node = 0
+        for index, char in enumerate(padded):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._out[node]:
+                # Drop the padding: offsets of the phrase itself
+                start = index - length + 2
+                yield Match(start - 1, index - 1, value)
+
+    def find_all(self, text: str) -> list[Match]:
+        """Leftmost-longest, non-overlapping matches in text order."""
+        matches = sorted(self.iter_matches(text), key=lambda m: (m.start, -m.end))
+        selected: list[Match] = []
+        covered = 0
+        for match in matches:
+            if match.start >= covered:
+                selected.append(match)
+                covered = match.end
+        return selected
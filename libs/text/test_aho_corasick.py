@@ -0,0 +1,43 @@
+from libs.text import AhoCorasick
+from libs.text import normalize_phrase
+
+
+def test_normalize_phrase():
+    assert normalize_phrase("  Mushroom Aglio-e-Olio! ") == "mushroom aglio e olio"
+    assert normalize_phrase("Crème Brûlée") == "creme brulee"
+
+
+def test_matches_whole_words_only():
+    matcher = AhoCorasick([("ham", "ham"), ("egg", "egg")])
+
+    assert [m.value for m in matcher.find_all("A hamburger and eggplant")] == []
+    assert [m.value for m in matcher.find_all("Ham, and EGG.")] == ["ham", "egg"]
+
+
+def test_leftmost_longest_non_overlapping():
+    matcher = AhoCorasick(
+        [
+            ("Fried Rice", "fried"),
+            ("Chicken Fried Rice", "chicken"),
+            ("Rice Pudding", "pudding"),
+        ]
+    )
+    text = "chicken fried rice pudding, then fried rice"
+
+    every = sorted(m.value for m in matcher.iter_matches(text))
+    assert every == ["chicken", "fried", "fried", "pudding"]
+    assert [m.value for m in matcher.find_all(text)] == ["chicken", "fried"]
+
+    first = matcher.find_all(text)[0]
+    assert normalize_phrase(text)[first.start : first.end] == "chicken fried rice"
+
+
+def test_scales_to_large_menus():
+    names = [f"Dish Number {i} Special" for i in range(5000)]
+    matcher = AhoCorasick((name, name) for name in names)
+    text = " ".join(["I'd like", names[4321], "and", names[7], "please"] * 50)
+
+    found = [m.value for m in matcher.find_all(text)]
+    assert matcher.size == 5000
+    assert found[:2] == [names[4321], names[7]]
+    assert len(found) == 100